@@ -3,8 +3,10 @@ import sys
 import json
 import sqlite3
 import hashlib
-import shutil
-import xml.etree.ElementTree as ET
+import time
+import queue
+import threading
+import itertools
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTreeView, QFileSystemModel,
                              QTabWidget, QVBoxLayout, QWidget, QLabel, QMenu,
@@ -12,84 +14,20 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QTreeView, QFileSystemMo
                              QDialog, QLineEdit, QPushButton, QFormLayout, QDialogButtonBox,
                              QInputDialog, QHBoxLayout, QSplitter, QTextEdit, QStatusBar,
                              QFileDialog, QGridLayout, QToolBar, QComboBox, QGroupBox,
-                             QSizePolicy, QFrame, QScrollArea, QTextEdit, QCalendarWidget)
-from PyQt5.QtGui import QFont
-from PyQt5.QtCore import Qt, QModelIndex, QDir, QSize, QSettings, QDate
-
-# Database initialization
-def init_db():
-    conn = sqlite3.connect('file_tree_manager.db')
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Projects table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS projects (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        master_path TEXT NOT NULL,
-        client_name TEXT NOT NULL,
-        delivery_path TEXT NOT NULL,
-        project_comment TEXT DEFAULT '',
-        delivery_date TEXT DEFAULT '',
-        created_by INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (created_by) REFERENCES users (id)
-    )
-    ''')
-    
-    # File attributes table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS file_attributes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER NOT NULL,
-        file_path TEXT NOT NULL,
-        publish_status BOOLEAN DEFAULT FALSE,
-        to_client_status BOOLEAN DEFAULT FALSE,
-        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (project_id) REFERENCES projects (id),
-        UNIQUE(project_id, file_path)
-    )
-    ''')
-    
-    # Default admin user if not exists
-    cursor.execute("SELECT COUNT(*) FROM users")
-    if cursor.fetchone()[0] == 0:
-        password_hash = hashlib.sha256("admin123".encode()).hexdigest()
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", 
-                      ("admin", password_hash))
-    
-    # Create a default project if none exists
-    cursor.execute("SELECT COUNT(*) FROM projects")
-    if cursor.fetchone()[0] == 0:
-        # Create default directories
-        home_dir = QDir.homePath()
-        default_master = os.path.join(home_dir, "FileTreeManager", "DefaultProject")
-        default_delivery = os.path.join(home_dir, "FileTreeManager", "Deliveries")
-        
-        os.makedirs(default_master, exist_ok=True)
-        os.makedirs(default_delivery, exist_ok=True)
-        
-        # Add a sample file
-        with open(os.path.join(default_master, "sample.txt"), "w") as f:
-            f.write("This is a sample file for the default project.")
-        
-        cursor.execute(
-            "INSERT INTO projects (name, master_path, client_name, delivery_path, created_by) VALUES (?, ?, ?, ?, ?)",
-            ("Default Project", default_master, "Default Client", default_delivery, 1)
-        )
-    
-    conn.commit()
-    conn.close()
+                             QSizePolicy, QFrame, QScrollArea, QTextEdit, QCalendarWidget,
+                             QProgressDialog, QProgressBar, QTreeWidget, QTreeWidgetItem, QCheckBox,
+                             QStackedWidget, QFileIconProvider)
+from PyQt5.QtGui import QFont, QImageReader
+from PyQt5.QtNetwork import QLocalSocket
+from PyQt5.QtCore import (Qt, QModelIndex, QAbstractItemModel, QDir, QSize, QSettings, QDate, QObject, QThread,
+                          QTimer, QFileSystemWatcher, QEvent, QBuffer, QIODevice, QUrl, QLocale, pyqtSignal)
+from fileman_core import (init_db, AttributeManager, MetadataCache, PublishedExporter, FileIndex,
+                          AttributeReconciler, collect_client_files, copy_to_delivery, connect_db, METRICS,
+                          PROFILER, profiled, project_template, parse_names, create_hierarchy,
+                          load_project_manifest, ProjectBatchCreator, SidecarWriteError,
+                          AttributeServiceClient, AttributeServiceError, RemoteAttributeManager,
+                          SERVICE_SOCKET, ChangeLog, log_change, SIDECAR_SUFFIX, ThumbnailCache,
+                          THUMBNAIL_CACHE_BYTES, preview_sources, DirectorySizes)
 
 # Initialize database on import
 init_db()
@@ -158,7 +96,7 @@ class LoginWindow(QDialog):
         
     def load_users(self):
         """Load available users into the combo box"""
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("SELECT username FROM users ORDER by username")
         users = cursor.fetchall()
@@ -178,7 +116,7 @@ class LoginWindow(QDialog):
             
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM users WHERE username = ? AND password_hash = ?", 
                      (username, password_hash))
@@ -294,7 +232,7 @@ class UserManagerDialog(QDialog):
         self.setLayout(layout)
         
     def load_users(self):
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("SELECT username FROM users ORDER by username")
         users = cursor.fetchall()
@@ -320,11 +258,11 @@ class UserManagerDialog(QDialog):
             QMessageBox.warning(self, "Error", "Please enter a username")
             return
             
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         if new_password:
-            password_hash = hashlib.sha256(new_password.encode()).hexdigest())
+            password_hash = hashlib.sha256(new_password.encode()).hexdigest()
             cursor.execute("UPDATE users SET username = ?, password_hash = ? WHERE username = ?",
                          (new_username, password_hash, old_username))
         else:
@@ -347,7 +285,7 @@ class UserManagerDialog(QDialog):
             
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         try:
             cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
@@ -374,7 +312,7 @@ class UserManagerDialog(QDialog):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            conn = sqlite3.connect('file_tree_manager.db')
+            conn = connect_db()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM users WHERE username = ?", (username,))
             conn.commit()
@@ -388,7 +326,7 @@ class NewProjectDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Create New Project")
-        self.setFixedSize(500, 550)  # Reduced height since we removed delivery path
+        self.setFixedSize(500, 640)
         self.setup_ui()
         
     def setup_ui(self):
@@ -421,6 +359,17 @@ class NewProjectDialog(QDialog):
         self.delivery_date.setMinimumHeight(30)
         details_layout.addRow("Delivery Date:", self.delivery_date)
         
+        # Filled into the {shot} and {sequence} folders of the template
+        self.shots = QLineEdit()
+        self.shots.setPlaceholderText("e.g. SH0010-SH3000, SH5000")
+        self.shots.setMinimumHeight(30)
+        details_layout.addRow("Shots:", self.shots)
+        
+        self.sequences = QLineEdit()
+        self.sequences.setPlaceholderText("Optional, e.g. SQ010-SQ050")
+        self.sequences.setMinimumHeight(30)
+        details_layout.addRow("Sequences:", self.sequences)
+        
         details_group.setLayout(details_layout)
         layout.addWidget(details_group)
         
@@ -474,110 +423,21 @@ class NewProjectDialog(QDialog):
             "master_path": self.master_path.text(),
             "client_name": self.client_name.text(),
             "comment": self.project_comment.text(),
-            "delivery_date": self.delivery_date.text()
+            "delivery_date": self.delivery_date.text(),
+            "shots": self.shots.text(),
+            "sequences": self.sequences.text()
         }
 
 
-class AttributeManager:
-    """Manages publish/to_client attributes and history tracking"""
-    def __init__(self, master_path):
-        self.master_path = master_path
-    
-    def get_sidecar_path(self, path):
-        """Get path for sidecar JSON file"""
-        return f"{path}.attr.json"
-    
-    def load_data(self, path):
-        """Load attribute data from sidecar file"""
-        sidecar_path = self.get_sidecar_path(path)
-        if os.path.exists(sidecar_path):
-            try:
-                with open(sidecar_path, 'r') as f:
-                    return json.load(f)
-            except:
-                return {"publish": [], "to_client": []}
-        return {"publish": [], "to_client": []}
-    
-    def save_data(self, path, data):
-        """Save attribute data to sidecar file"""
-        sidecar_path = self.get_sidecar_path(path)
-        with open(sidecar_path, 'w') as f:
-            json.dump(data, f, indent=2)
-    
-    def update_attribute(self, path, attribute, value, user):
-        """Update attribute with timestamp history"""
-        data = self.load_data(path)
-        
-        timestamp = datetime.now().isoformat()
-        data[attribute].append({
-            "status": value,
-            "timestamp": timestamp,
-            "user": user
-        })
-        
-        self.save_data(path, data)
-        
-        # Update centralized database
-        conn = sqlite3.connect('file_tree_manager.db')
-        cursor = conn.cursor()
-        
-        # Get project ID from master path
-        cursor.execute("SELECT id FROM projects WHERE master_path = ?", (self.master_path,))
-        project_result = cursor.fetchone()
-        
-        if project_result:
-            project_id = project_result[0]
-            rel_path = os.path.relpath(path, self.master_path)
-            
-            # Check if file exists in database
-            cursor.execute('''
-            SELECT COUNT(*) FROM file_attributes 
-            WHERE project_id = ? AND file_path = ?
-            ''', (project_id, rel_path))
-            
-            if cursor.fetchone()[0] == 0:
-                cursor.execute('''
-                INSERT INTO file_attributes 
-                (project_id, file_path, publish_status, to_client_status) 
-                VALUES (?, ?, ?, ?)
-                ''', (project_id, rel_path, False, False))
-            
-            # Update the attribute
-            if attribute == "publish":
-                cursor.execute('''
-                UPDATE file_attributes SET publish_status = ?, last_updated = CURRENT_TIMESTAMP
-                WHERE file_path = ? AND project_id = ?
-                ''', (value, rel_path, project_id))
-            elif attribute == "to_client":
-                cursor.execute('''
-                UPDATE file_attributes SET to_client_status = ?, last_updated = CURRENT_TIMESTAMP
-                WHERE file_path = ? AND project_id = ?
-                ''', (value, rel_path, project_id))
-                
-        conn.commit()
-        conn.close()
-        
-        return timestamp
-    
-    def get_current_status(self, path, attribute):
-        """Get current status and timestamp for an attribute"""
-        data = self.load_data(path)
-        if data[attribute]:
-            last_entry = data[attribute][-1]
-            return last_entry["status"], last_entry["timestamp"], last_entry.get("user", "Unknown")
-        return False, "", "Unknown"
-    
-    def get_attribute_history(self, path, attribute):
-        """Get complete history of an attribute"""
-        data = self.load_data(path)
-        return data.get(attribute, [])
-
-
 class FileSystemModelWithBadges(QFileSystemModel):
     """Custom file system model that displays attribute badges and hides .json files"""
     def __init__(self, attribute_manager):
         super().__init__()
         self.attribute_manager = attribute_manager
+        # Recursive folder sizes for the Size column, when set
+        self.dir_sizes = None
+        # Status cells computed since the last repaint (with metrics on)
+        self.status_data_calls = 0
         
     def columnCount(self, parent=QModelIndex()):
         return super().columnCount(parent) + 1  # Add one extra column for status
@@ -590,8 +450,11 @@ class FileSystemModelWithBadges(QFileSystemModel):
                 return None
                 
             # Get attribute status
-            publish_status, _, _ = self.attribute_manager.get_current_status(path, "publish")
-            client_status, _, _ = self.attribute_manager.get_current_status(path, "to_client")
+            if METRICS.enabled:
+                self.status_data_calls += 1
+            with METRICS.timed("status_data_seconds"):
+                publish_status, _, _ = self.attribute_manager.get_current_status(path, "publish")
+                client_status, _, _ = self.attribute_manager.get_current_status(path, "to_client")
             
             # Create status text
             status = []
@@ -602,6 +465,10 @@ class FileSystemModelWithBadges(QFileSystemModel):
                 
             return " | ".join(status) if status else "No Status"
             
+        if index.column() == 1 and role == Qt.DisplayRole and self.dir_sizes is not None and self.isDir(index):
+            total = self.dir_sizes.total(self.filePath(index))
+            return "..." if total is None else QLocale.system().formattedDataSize(total)
+        
         if index.column() == 0 and role == Qt.DisplayRole:
             path = self.filePath(index)
             
@@ -628,8 +495,823 @@ class FileSystemModelWithBadges(QFileSystemModel):
         return super().headerData(section, orientation, role)
 
 
+class FilterNode:
+    """Folder or file shown by an AttributeFilterModel"""
+    __slots__ = ("name", "parent", "children", "row", "is_dir", "status")
+    
+    def __init__(self, name, parent, is_dir, status=""):
+        self.name = name
+        self.parent = parent
+        self.children = {}  # By name while building, then a sorted list
+        self.row = 0
+        self.is_dir = is_dir
+        self.status = status
+
+
+# Status column text by (publish, to_client), as in the file tree
+FILTER_STATUS_TEXT = {(False, False): "", (True, False): "Published", (False, True): "To Client",
+                      (True, True): "Published | To Client"}
+
+
+def build_filter_tree(rows):
+    """Tree of the matching entries and their ancestor folders
+    
+    rows are FileIndex.matching_paths tuples. Folders come before files,
+    each sorted by name as in the file tree.
+    """
+    root = FilterNode("", None, True)
+    folders = {'.': root}
+    for rel_path, is_dir, publish, to_client in rows:
+        parent_rel, name = os.path.split(rel_path)
+        parent = folders.get(parent_rel or '.')
+        if parent is None:
+            # Create the missing ancestors, outermost first
+            missing = []
+            while parent is None:
+                missing.append(parent_rel)
+                parent_rel = os.path.dirname(parent_rel)
+                parent = folders.get(parent_rel or '.')
+            for folder_rel in reversed(missing):
+                parent = parent.children.setdefault(os.path.basename(folder_rel),
+                                                    FilterNode(os.path.basename(folder_rel), parent, True))
+                folders[folder_rel] = parent
+        status = FILTER_STATUS_TEXT[publish, to_client]
+        node = parent.children.get(name)
+        if node is None:
+            node = parent.children[name] = FilterNode(name, parent, is_dir)
+            if is_dir:
+                folders[rel_path] = node
+        node.is_dir = is_dir
+        node.status = status
+    
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        node.children = sorted(node.children.values(), key=lambda child: (not child.is_dir, child.name.lower()))
+        for row, child in enumerate(node.children):
+            child.row = row
+            if child.children:
+                stack.append(child)
+            else:
+                child.children = []
+    return root
+
+
+class AttributeFilterModel(QAbstractItemModel):
+    """Read-only tree of the files with an attribute set, and their folders"""
+    HEADERS = ("Name", "Status")
+    
+    def __init__(self, master_path, parent=None):
+        super().__init__(parent)
+        self.master_path = master_path
+        self.root = FilterNode("", None, True)
+        self.icon_provider = QFileIconProvider()
+        self.folder_icon = self.icon_provider.icon(QFileIconProvider.Folder)
+        self.file_icon = self.icon_provider.icon(QFileIconProvider.File)
+    
+    def set_root(self, root):
+        self.beginResetModel()
+        self.root = root
+        self.endResetModel()
+    
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+    
+    def index(self, row, column, parent=QModelIndex()):
+        children = self.node(parent).children
+        if 0 <= row < len(children) and 0 <= column < len(self.HEADERS):
+            return self.createIndex(row, column, children[row])
+        return QModelIndex()
+    
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name if index.column() == 0 else node.status
+        if role == Qt.DecorationRole and index.column() == 0:
+            return self.folder_icon if node.is_dir else self.file_icon
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def filePath(self, index):
+        """Absolute path of an item, like QFileSystemModel.filePath"""
+        names = []
+        node = self.node(index)
+        while node is not self.root and node is not None:
+            names.append(node.name)
+            node = node.parent
+        return os.path.join(self.master_path, *reversed(names))
+    
+    def count_rows(self, limit):
+        """Number of items, counting no further than limit"""
+        count = 0
+        stack = [self.root]
+        while stack and count < limit:
+            node = stack.pop()
+            count += len(node.children)
+            stack.extend(node.children)
+        return count
+
+
+class AttributeFilterWorker(QObject):
+    """Builds attribute filter trees from the file index off the GUI thread"""
+    built = pyqtSignal(int, object, int)
+    failed = pyqtSignal(int, str)
+    
+    def __init__(self, file_index, project_id):
+        super().__init__()
+        self.file_index = file_index
+        self.project_id = project_id
+    
+    def build(self, generation, attribute):
+        """Emit built(generation, root, match count), with a None root if the project is not indexed"""
+        try:
+            if self.project_id not in self.file_index.indexed_project_ids():
+                self.built.emit(generation, None, 0)
+                return
+            with METRICS.timed("attribute_filter_seconds"):
+                rows = self.file_index.matching_paths(self.project_id, attribute)
+                root = build_filter_tree(rows)
+        except sqlite3.Error as e:
+            self.failed.emit(generation, str(e))
+            return
+        self.built.emit(generation, root, len(rows))
+
+
+def render_thumbnail(path):
+    """PNG bytes of an image scaled to fit ThumbnailLoader.SIZE, or None if Qt cannot read it"""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > ThumbnailLoader.SIZE or size.height() > ThumbnailLoader.SIZE):
+        # Lets JPEG decode at the reduced size
+        reader.setScaledSize(size.scaled(ThumbnailLoader.SIZE, ThumbnailLoader.SIZE, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class ThumbnailLoader(QObject):
+    """Makes thumbnails through a ThumbnailCache in a pool of threads
+    
+    Files and folders can be requested; a folder stands for the first
+    frames of its sequences and its single images (see preview_sources).
+    Repeated requests are merged and clicks go ahead of prefetches.
+    Results arrive in the GUI thread as ready(path, thumbnail path, or ""
+    if the file cannot be previewed) and listed(folder, files).
+    """
+    ready = pyqtSignal(str, str)
+    listed = pyqtSignal(str, list)
+    
+    CLICK = 0
+    PREFETCH = 1
+    SIZE = 256
+    WORKERS = 2
+    # Files of one folder previewed at most
+    FOLDER_LIMIT = 64
+    
+    extensions = None
+    
+    def __init__(self, cache, workers=WORKERS, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.queue = queue.PriorityQueue()
+        self.pending = {}  # (path, is_dir) -> best priority queued
+        self.lock = threading.Lock()
+        self.order = itertools.count()
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+    
+    @classmethod
+    def preview_extensions(cls):
+        """Lowercase extensions of the image formats Qt can read, with the dot"""
+        if cls.extensions is None:
+            cls.extensions = {'.' + bytes(name).decode().lower() for name in QImageReader.supportedImageFormats()}
+        return cls.extensions
+    
+    @classmethod
+    def can_preview(cls, path):
+        return os.path.splitext(path)[1].lower() in cls.preview_extensions()
+    
+    def request(self, path, priority=CLICK, is_dir=False):
+        key = (path, is_dir)
+        with self.lock:
+            if self.pending.get(key, priority + 1) <= priority:
+                return  # Already queued at least as urgently
+            self.pending[key] = priority
+        self.queue.put((priority, next(self.order), key))
+    
+    def prefetch(self, dir_path):
+        """Make the thumbnails of a folder ahead of clicks"""
+        self.request(dir_path, self.PREFETCH, is_dir=True)
+    
+    def run(self):
+        while True:
+            priority, _, key = self.queue.get()
+            if key is None:
+                return
+            with self.lock:
+                if self.pending.get(key) != priority:
+                    continue  # Done already, or queued again more urgently
+                del self.pending[key]
+            path, is_dir = key
+            try:
+                if is_dir:
+                    sources = preview_sources(path, self.preview_extensions(), self.FOLDER_LIMIT)
+                    for source in sources:
+                        self.request(source, priority)
+                    self.listed.emit(path, sources)
+                else:
+                    self.ready.emit(path, self.cache.get(path, render_thumbnail) or "")
+            except (OSError, sqlite3.Error):
+                if not is_dir:
+                    self.ready.emit(path, "")
+    
+    def stop(self):
+        """Drop queued requests and wait for the running ones"""
+        for _ in self.threads:
+            self.queue.put((-1, next(self.order), None))
+        for thread in self.threads:
+            thread.join()
+
+
+class ExportWorker(QObject):
+    """Runs a PublishedExporter off the GUI thread and reports progress"""
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str, int)
+    failed = pyqtSignal(str)
+    
+    # Minimum delay between progress signals, in seconds
+    PROGRESS_INTERVAL = 0.1
+    
+    def __init__(self, exporter, dir_path):
+        super().__init__()
+        self.exporter = exporter
+        self.dir_path = dir_path
+        self.last_progress = 0.0
+        
+    def report_progress(self, dirs_scanned, files_matched):
+        now = time.monotonic()
+        if now - self.last_progress >= self.PROGRESS_INTERVAL:
+            self.last_progress = now
+            self.progress.emit(dirs_scanned, files_matched)
+        
+    @profiled("export_worker")
+    def run(self):
+        try:
+            xml_file_path, file_count = self.exporter.export(self.dir_path, self.report_progress)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(xml_file_path or "", file_count)
+
+
+class IndexWorker(QObject):
+    """Rebuilds the file index of several projects off the GUI thread"""
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, file_index, projects):
+        super().__init__()
+        self.file_index = file_index
+        self.projects = projects
+        
+    def run(self):
+        total = 0
+        try:
+            for project_id, name, master_path in self.projects:
+                count = self.file_index.rebuild_project(project_id, name, master_path, AttributeManager(master_path),
+                                                        lambda count: self.progress.emit(name, count))
+                if count is None:
+                    break  # Cancelled
+                total += count
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(total)
+
+
+class SearchResultsDialog(QDialog):
+    """Non-modal list of file index search results"""
+    file_activated = pyqtSignal(int, str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search Results")
+        self.resize(900, 500)
+        
+        layout = QVBoxLayout()
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        
+        self.results_tree = QTreeWidget()
+        self.results_tree.setHeaderLabels(["Project", "Path", "Type", "Size", "Date Modified", "Status"])
+        self.results_tree.setRootIsDecorated(False)
+        self.results_tree.setColumnWidth(0, 150)
+        self.results_tree.setColumnWidth(1, 400)
+        self.results_tree.itemDoubleClicked.connect(self.on_item_double_clicked)
+        layout.addWidget(self.results_tree)
+        
+        self.setLayout(layout)
+        
+    def show_results(self, text, results, elapsed_ms):
+        self.results_tree.clear()
+        for result in results:
+            status = []
+            if result['publish']:
+                status.append("Published")
+            if result['to_client']:
+                status.append("To Client")
+            item = QTreeWidgetItem([
+                result['project'],
+                result['path'],
+                result['kind'],
+                "" if result['is_dir'] else str(result['size']),
+                datetime.fromtimestamp(result['mtime']).strftime("%Y-%m-%d %H:%M"),
+                " | ".join(status) if status else "No Status"
+            ])
+            item.setData(0, Qt.UserRole, result['project_id'])
+            self.results_tree.addTopLevelItem(item)
+        self.summary_label.setText(f"{len(results)} results for '{text}' in {elapsed_ms:.0f} ms")
+        self.show()
+        self.raise_()
+        
+    def on_item_double_clicked(self, item, column):
+        self.file_activated.emit(item.data(0, Qt.UserRole), item.text(1))
+
+
+class MetricsDialog(QDialog):
+    """Debug panel showing the hot-path counters and timing histograms"""
+    CALL_BUCKETS = (0, 10, 50, 100, 500, 1000, 5000, 10000)
+    REFRESH_MS = 1000
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Metrics")
+        self.resize(900, 500)
+        
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+        self.enabled_check = QCheckBox("Collect metrics")
+        self.enabled_check.setChecked(METRICS.enabled)
+        self.enabled_check.toggled.connect(self.set_enabled)
+        controls.addWidget(self.enabled_check)
+        controls.addStretch()
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        controls.addWidget(reset_btn)
+        dump_btn = QPushButton("Save...")
+        dump_btn.clicked.connect(self.dump)
+        controls.addWidget(dump_btn)
+        layout.addLayout(controls)
+        
+        self.metrics_tree = QTreeWidget()
+        self.metrics_tree.setHeaderLabels(["Metric", "Count", "Total", "Mean", "p50", "p95", "Max"])
+        self.metrics_tree.setRootIsDecorated(False)
+        self.metrics_tree.setColumnWidth(0, 280)
+        layout.addWidget(self.metrics_tree)
+        self.setLayout(layout)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+        self.refresh()
+        
+    def set_enabled(self, enabled):
+        METRICS.enabled = enabled
+        
+    def reset(self):
+        METRICS.reset()
+        self.refresh()
+        
+    @staticmethod
+    def format_value(name, value):
+        if name.endswith("_seconds"):
+            return f"{value * 1000:.2f} ms"
+        return f"{value:g}"
+        
+    def refresh(self):
+        snapshot = METRICS.snapshot()
+        self.metrics_tree.clear()
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            self.metrics_tree.addTopLevelItem(QTreeWidgetItem([
+                name, str(histogram["count"])] + [self.format_value(name, histogram[key])
+                                                 for key in ("sum", "mean", "p50", "p95", "max")]))
+        counters = snapshot["counters"]
+        for name, value in sorted(counters.items()):
+            self.metrics_tree.addTopLevelItem(QTreeWidgetItem([name, f"{value:g}"]))
+        # Delivery throughput from its byte and time counters
+        if counters.get("delivery_copy_seconds_total"):
+            rate = counters.get("delivery_bytes_total", 0) / counters["delivery_copy_seconds_total"]
+            self.metrics_tree.addTopLevelItem(QTreeWidgetItem(["delivery throughput", f"{rate / 1e6:.1f} MB/s"]))
+            
+    def dump(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "fileman_metrics.json",
+                                              "JSON (*.json);;Prometheus text (*.prom)")
+        if not path:
+            return
+        try:
+            METRICS.dump(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to save metrics: {str(e)}")
+
+
+class IndexSyncWorker(QObject):
+    """Applies folder changes to the file index off the GUI thread"""
+    synced = pyqtSignal(list)
+    
+    def __init__(self, file_index, project_id, master_path, attribute_manager):
+        super().__init__()
+        self.file_index = file_index
+        self.project_id = project_id
+        self.master_path = master_path
+        self.attribute_manager = attribute_manager
+        
+    def sync(self, dir_paths):
+        if self.project_id not in self.file_index.indexed_project_ids():
+            return  # Nothing to keep current until the first full index
+        try:
+            changes = self.file_index.sync_dirs(self.project_id, self.master_path, dir_paths, self.attribute_manager)
+        except sqlite3.OperationalError:
+            return  # Index busy (e.g. a rebuild); the next poll retries via the folder mtimes
+        if changes:
+            self.synced.emit(changes)
+        
+    def poll(self):
+        try:
+            changed = self.file_index.changed_dirs(self.project_id, self.master_path)
+        except sqlite3.OperationalError:
+            return
+        if changed:
+            self.sync(changed)
+
+
+class DirSizeWorker(QObject):
+    """Computes recursive folder sizes with a DirectorySizes off the GUI thread"""
+    computed = pyqtSignal(str)
+    
+    def __init__(self, dir_sizes, master_path):
+        super().__init__()
+        self.dir_sizes = dir_sizes
+        self.master_path = master_path
+        self.loaded = False
+    
+    def compute(self, dir_paths):
+        if not self.loaded:
+            self.dir_sizes.load(self.master_path)
+            self.loaded = True
+        for dir_path in dir_paths:
+            try:
+                total = self.dir_sizes.compute(dir_path)
+            except sqlite3.OperationalError:
+                continue  # Index database busy; the folder is computed again on its next change
+            if total is not None:
+                self.computed.emit(dir_path)
+    
+    def invalidate(self, dir_paths, relist):
+        for dir_path in dir_paths:
+            self.dir_sizes.invalidate(dir_path, relist)
+
+
+class ChangeTracker(QObject):
+    """Keeps the file index of one project current as files change on disk
+    
+    The project root, its top-level folders and every folder loaded in the
+    tree are watched with QFileSystemWatcher (inotify on Linux) and synced
+    shortly after they change. All other indexed folders are covered by a
+    periodic poll that stats them and only lists those whose mtime changed.
+    Changes are applied by an IndexSyncWorker and re-emitted as
+    changes_detected([(change, path[, new_path]), ...]).
+    """
+    changes_detected = pyqtSignal(list)
+    sync_requested = pyqtSignal(list)
+    poll_requested = pyqtSignal()
+    
+    # inotify watches are a per-user kernel resource shared by all apps
+    MAX_WATCHED_DIRS = 2000
+    SYNC_DELAY_MS = 500
+    POLL_INTERVAL_MS = 60000
+    
+    def __init__(self, file_index, project_id, master_path, attribute_manager, parent=None):
+        super().__init__(parent)
+        self.master_path = master_path
+        self.pending_dirs = set()
+        
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setSingleShot(True)
+        self.sync_timer.setInterval(self.SYNC_DELAY_MS)
+        self.sync_timer.timeout.connect(self.flush)
+        
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self.poll_requested)
+        
+        self.worker = IndexSyncWorker(file_index, project_id, master_path, attribute_manager)
+        self.thread = QThread(self)
+        self.worker.moveToThread(self.thread)
+        self.sync_requested.connect(self.worker.sync)
+        self.poll_requested.connect(self.worker.poll)
+        self.worker.synced.connect(self.changes_detected)
+        
+    def start(self):
+        self.watch(self.master_path)
+        try:
+            with os.scandir(self.master_path) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        self.watch(entry.path)
+        except OSError:
+            pass
+        self.thread.start()
+        self.poll_timer.start()
+        
+    def stop(self):
+        self.poll_timer.stop()
+        self.sync_timer.stop()
+        self.thread.quit()
+        self.thread.wait()
+        
+    def watch(self, dir_path):
+        """Watch a folder for changes, within the watch budget"""
+        if len(self.watcher.directories()) < self.MAX_WATCHED_DIRS:
+            self.watcher.addPath(dir_path)
+        
+    def on_directory_changed(self, dir_path):
+        self.pending_dirs.add(dir_path)
+        self.sync_timer.start()
+        
+    def flush(self):
+        dir_paths = sorted(self.pending_dirs, key=lambda path: path.count(os.sep))
+        self.pending_dirs.clear()
+        self.sync_requested.emit(dir_paths)
+
+
+class BatchProjectWorker(QObject):
+    """Runs a ProjectBatchCreator off the GUI thread"""
+    progress = pyqtSignal(int, int, dict)
+    finished = pyqtSignal(list)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, creator, projects):
+        super().__init__()
+        self.creator = creator
+        self.projects = projects
+        
+    @profiled("batch_create_projects")
+    def run(self):
+        try:
+            results = self.creator.create(self.projects, lambda done, total, result: self.progress.emit(done, total, result))
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(results)
+
+
+class BatchProjectDialog(QDialog):
+    """Creates the projects of a manifest and reports timing and failures"""
+    def __init__(self, manifest_path, projects, user_id, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Create Projects - {os.path.basename(manifest_path)}")
+        self.resize(900, 500)
+        self.results = []
+        self.setup_ui(len(projects))
+        
+        self.worker = BatchProjectWorker(ProjectBatchCreator(user_id), projects)
+        self.thread = QThread(self)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.start_time = time.perf_counter()
+        self.thread.start()
+        
+    def setup_ui(self, total):
+        layout = QVBoxLayout()
+        
+        self.summary_label = QLabel(f"Creating {total} projects...")
+        layout.addWidget(self.summary_label)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, total)
+        layout.addWidget(self.progress_bar)
+        
+        self.results_tree = QTreeWidget()
+        self.results_tree.setHeaderLabels(["Project", "Folder", "Items Created", "Time", "Status"])
+        self.results_tree.setRootIsDecorated(False)
+        self.results_tree.setColumnWidth(0, 160)
+        self.results_tree.setColumnWidth(1, 380)
+        layout.addWidget(self.results_tree)
+        
+        self.close_btn = QPushButton("Close")
+        self.close_btn.setEnabled(False)
+        self.close_btn.clicked.connect(self.accept)
+        layout.addWidget(self.close_btn)
+        
+        self.setLayout(layout)
+        
+    def on_progress(self, done, total, result):
+        self.progress_bar.setValue(done)
+        self.summary_label.setText(f"Created folders for {done} of {total} projects...")
+        
+    def on_finished(self, results):
+        self.thread.quit()
+        self.thread.wait()
+        self.results = results
+        elapsed = time.perf_counter() - self.start_time
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        
+        for result in results:
+            self.results_tree.addTopLevelItem(QTreeWidgetItem([
+                result["name"] or "-",
+                result["project_dir"],
+                str(result["created"]),
+                f"{result['seconds']:.2f} s",
+                result["error"] or "Created"
+            ]))
+        failed = sum(1 for result in results if result["error"])
+        self.summary_label.setText(f"{len(results) - failed} projects created, {failed} failed in {elapsed:.1f} s")
+        self.close_btn.setEnabled(True)
+        
+    def on_failed(self, error):
+        self.thread.quit()
+        self.thread.wait()
+        self.summary_label.setText(f"Project creation failed: {error}")
+        self.close_btn.setEnabled(True)
+        
+    def done(self, result):
+        # Projects half created on close would miss their database rows
+        if self.thread.isRunning():
+            return
+        super().done(result)
+
+
+class ReconcileWorker(QObject):
+    """Runs an AttributeReconciler check off the GUI thread"""
+    finished = pyqtSignal(list)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, reconciler):
+        super().__init__()
+        self.reconciler = reconciler
+        
+    def run(self):
+        try:
+            divergences = self.reconciler.check()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if divergences is not None:
+            self.finished.emit(divergences)
+
+
+class ReconcileDialog(QDialog):
+    """Reports sidecar/database divergences for a project and repairs them"""
+    KIND_LABELS = {
+        'mismatch': "Sidecar and database differ",
+        'missing_row': "Missing database row",
+        'orphan_row': "Database row without sidecar",
+        'corrupt': "Unreadable sidecar"
+    }
+    
+    def __init__(self, project_id, project_name, master_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Reconcile Attributes - {project_name}")
+        self.resize(900, 500)
+        self.reconciler = AttributeReconciler(project_id, master_path)
+        self.divergences = []
+        self.setup_ui()
+        
+        self.worker = ReconcileWorker(self.reconciler)
+        self.thread = QThread(self)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(self.on_check_finished)
+        self.worker.failed.connect(self.on_check_failed)
+        self.start_time = time.perf_counter()
+        self.thread.start()
+        
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        
+        self.summary_label = QLabel("Scanning sidecars...")
+        layout.addWidget(self.summary_label)
+        
+        self.results_tree = QTreeWidget()
+        self.results_tree.setHeaderLabels(["Problem", "Path", "Sidecar", "Database"])
+        self.results_tree.setRootIsDecorated(False)
+        self.results_tree.setColumnWidth(0, 200)
+        self.results_tree.setColumnWidth(1, 450)
+        layout.addWidget(self.results_tree)
+        
+        button_layout = QHBoxLayout()
+        self.repair_btn = QPushButton("Repair Database")
+        self.repair_btn.setEnabled(False)
+        self.repair_btn.clicked.connect(self.repair)
+        button_layout.addWidget(self.repair_btn)
+        
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
+        
+    @staticmethod
+    def format_state(state):
+        if state is None:
+            return "-"
+        status = []
+        if state[0]:
+            status.append("Published")
+        if state[1]:
+            status.append("To Client")
+        return " | ".join(status) if status else "No Status"
+        
+    def on_check_finished(self, divergences):
+        self.thread.quit()
+        self.thread.wait()
+        self.divergences = divergences
+        elapsed = time.perf_counter() - self.start_time
+        
+        for divergence in divergences:
+            self.results_tree.addTopLevelItem(QTreeWidgetItem([
+                self.KIND_LABELS[divergence['kind']],
+                divergence['path'],
+                self.format_state(divergence['sidecar']),
+                self.format_state(divergence['database'])
+            ]))
+        self.summary_label.setText(f"{len(divergences)} divergences found in {elapsed:.1f} s")
+        self.repair_btn.setEnabled(any(d['kind'] != 'corrupt' for d in divergences))
+        
+    def on_check_failed(self, error):
+        self.thread.quit()
+        self.thread.wait()
+        self.summary_label.setText(f"Reconcile failed: {error}")
+        
+    def repair(self):
+        try:
+            repaired = self.reconciler.repair(self.divergences)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Error", f"Failed to repair attributes: {str(e)}")
+            return
+        self.repair_btn.setEnabled(False)
+        self.summary_label.setText(f"{repaired} database rows repaired from sidecars")
+        
+    def done(self, result):
+        # Stop a running check at its next folder or chunk instead of waiting for all of it
+        self.reconciler.cancel()
+        self.thread.quit()
+        self.thread.wait()
+        super().done(result)
+
+
 class ProjectTab(QWidget):
     """Represents a project tab with file tree and attributes"""
+    filter_requested = pyqtSignal(int, str)
+    sizes_requested = pyqtSignal(list)
+    sizes_invalidated = pyqtSignal(list, bool)
+    
+    # Attribute filters offered under the tree, by label
+    FILTER_ATTRIBUTES = {"Published": "publish", "To Client": "to_client"}
+    # Delay coalescing the changes that rebuild an active filter
+    FILTER_REFRESH_MS = 300
+    # Filtered trees with fewer items than this open fully expanded
+    FILTER_EXPAND_LIMIT = 2000
+    # Thumbnails shown in the details of a folder
+    FOLDER_PREVIEWS = 4
+    
     def __init__(self, project_id, project_name, master_path, client_name, delivery_path, username, parent=None):
         super().__init__(parent)
         self.project_id = project_id
@@ -638,8 +1320,21 @@ class ProjectTab(QWidget):
         self.client_name = client_name
         self.delivery_path = delivery_path
         self.username = username
-        self.attribute_manager = AttributeManager(master_path)
+        self.metadata_cache = self.create_metadata_cache()
+        self.attribute_manager = self.create_attribute_manager()
         self.settings = QSettings("FileTreeManager", "ProjectState")
+        self.thumbnail_loader = ThumbnailLoader(self.create_thumbnail_cache(), parent=self)
+        self.thumbnail_loader.ready.connect(self.on_thumbnail_ready)
+        self.thumbnail_loader.listed.connect(self.on_thumbnails_listed)
+        self.thumbnails = {}  # Source path -> thumbnail path, "" when it has none
+        self.folder_previews = {}  # Folder -> files previewed for it
+        self.details_path = None
+        self.details_sources = set()
+        self.export_thread = None
+        self.export_worker = None
+        self.export_progress = None
+        self.service_socket = None
+        self.filter_generation = 0
         
         # Load project details from database
         self.load_project_details()
@@ -650,9 +1345,80 @@ class ProjectTab(QWidget):
         # Restore tree state
         self.restore_tree_state()
         
+        # Live badge updates from the attribute service
+        if isinstance(self.attribute_manager, RemoteAttributeManager):
+            self.subscribe_to_service()
+        
+    @staticmethod
+    def create_metadata_cache():
+        """Metadata cache with the TTLs saved under FileTreeManager/MetadataCache
+        
+        "ttl" is the default in seconds and "mount_ttls" maps mount points to
+        their own TTL, e.g. a longer one for a slow SMB share.
+        """
+        settings = QSettings("FileTreeManager", "MetadataCache")
+        ttl = float(settings.value("ttl", 1.0))
+        mount_ttls = {mount: float(value) for mount, value in (settings.value("mount_ttls") or {}).items()}
+        return MetadataCache(ttl, mount_ttls)
+        
+    @staticmethod
+    def create_thumbnail_cache():
+        """Thumbnail cache with the location and size saved under FileTreeManager/Thumbnails
+        
+        "cache_dir" defaults to ~/FileTreeManager/thumbnail_cache and
+        "max_mb" bounds its size.
+        """
+        settings = QSettings("FileTreeManager", "Thumbnails")
+        max_bytes = int(float(settings.value("max_mb", THUMBNAIL_CACHE_BYTES / (1024 * 1024))) * 1024 * 1024)
+        return ThumbnailCache(settings.value("cache_dir") or None, max_bytes)
+    
+    def create_attribute_manager(self):
+        """Attribute manager going through the attribute service when it runs"""
+        client = AttributeServiceClient()
+        if client.available():
+            return RemoteAttributeManager(self.master_path, client, self.metadata_cache)
+        return AttributeManager(self.master_path, self.metadata_cache)
+        
+    def subscribe_to_service(self):
+        """Receive the attribute changes made under this project by any client"""
+        self.service_socket = QLocalSocket(self)
+        self.service_socket.readyRead.connect(self.on_service_events)
+        self.service_socket.disconnected.connect(self.on_service_disconnected)
+        self.service_socket.connectToServer(SERVICE_SOCKET)
+        if not self.service_socket.waitForConnected(1000):
+            self.on_service_disconnected()
+            return
+        self.service_socket.write((json.dumps({"op": "subscribe", "roots": [self.master_path]}) + "\n").encode())
+        
+    def on_service_events(self):
+        """Apply changes pushed by the attribute service and repaint their badges"""
+        while self.service_socket is not None and self.service_socket.canReadLine():
+            message = json.loads(bytes(self.service_socket.readLine()).decode())
+            if message.get("event") != "changed":
+                continue
+            self.attribute_manager.apply_event(message)
+            self.refresh_filter()
+            index = self.file_model.index(message["path"])
+            if index.isValid():
+                status_index = index.sibling(index.row(), 4)
+                self.file_model.dataChanged.emit(status_index, status_index)
+                if self.file_model.filePath(self.tree_view.currentIndex()) == message["path"]:
+                    self.on_item_clicked(self.tree_view.currentIndex())
+                    
+    def on_service_disconnected(self):
+        """Fall back to reading sidecars directly when the service goes away"""
+        if self.service_socket is None:
+            return
+        self.service_socket.deleteLater()
+        self.service_socket = None
+        self.attribute_manager = AttributeManager(self.master_path, self.metadata_cache)
+        self.file_model.attribute_manager = self.attribute_manager
+        self.change_tracker.worker.attribute_manager = self.attribute_manager
+        self.tree_view.viewport().update()
+        
     def load_project_details(self):
         """Load project details from database"""
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("SELECT project_comment, delivery_date FROM projects WHERE id = ?", (self.project_id,))
         result = cursor.fetchone()
@@ -703,16 +1469,67 @@ class ProjectTab(QWidget):
         self.file_model.setFilter(QDir.AllEntries | QDir.NoDotAndDotDot | QDir.Hidden)
         self.tree_view.setModel(self.file_model)
         self.tree_view.setRootIndex(self.file_model.index(self.master_path))
+        self.tree_view.viewport().installEventFilter(self)
+        
+        # Keep the file index current for folders as they are browsed
+        self.change_tracker = ChangeTracker(self.attribute_manager.file_index, self.project_id,
+                                            self.master_path, self.attribute_manager, self)
+        self.file_model.directoryLoaded.connect(self.change_tracker.watch)
+        self.file_model.directoryLoaded.connect(self.thumbnail_loader.prefetch)
+        self.change_tracker.watcher.directoryChanged.connect(self.metadata_cache.invalidate_dir)
+        self.change_tracker.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.change_tracker.changes_detected.connect(self.on_files_changed)
+        self.change_tracker.start()
+        
+        # Recursive sizes of the folders shown, updated as they change
+        self.dir_sizes = DirectorySizes()
+        self.file_model.dir_sizes = self.dir_sizes
+        self.size_worker = DirSizeWorker(self.dir_sizes, self.master_path)
+        self.size_thread = QThread(self)
+        self.size_worker.moveToThread(self.size_thread)
+        self.sizes_requested.connect(self.size_worker.compute)
+        self.sizes_invalidated.connect(self.size_worker.invalidate)
+        self.size_worker.computed.connect(self.on_size_computed)
+        self.file_model.directoryLoaded.connect(self.request_folder_sizes)
+        self.change_tracker.watcher.directoryChanged.connect(self.on_folder_size_changed)
+        self.size_thread.start()
         
         # Show the status column and hide unnecessary columns
         self.tree_view.setHeaderHidden(False)
         self.tree_view.setColumnWidth(0, 300)  # Name column width
+        self.tree_view.setColumnWidth(1, 90)  # Size column width
         self.tree_view.setColumnWidth(4, 150)  # Status column width
-        self.tree_view.hideColumn(1)  # Size
         self.tree_view.hideColumn(2)  # Type
         self.tree_view.hideColumn(3)  # Modified
         
-        tree_layout.addWidget(self.tree_view)
+        # Matching files and their folders, shown instead of the tree while filtering
+        self.filter_model = AttributeFilterModel(self.master_path, self)
+        self.filter_view = QTreeView()
+        self.filter_view.setModel(self.filter_model)
+        self.filter_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.filter_view.customContextMenuRequested.connect(self.show_context_menu)
+        self.filter_view.clicked.connect(self.on_filter_item_clicked)
+        self.filter_view.doubleClicked.connect(self.show_in_tree)
+        self.filter_view.setUniformRowHeights(True)
+        self.filter_view.setColumnWidth(0, 300)
+        
+        self.filter_worker = AttributeFilterWorker(self.attribute_manager.file_index, self.project_id)
+        self.filter_thread = QThread(self)
+        self.filter_worker.moveToThread(self.filter_thread)
+        self.filter_requested.connect(self.filter_worker.build)
+        self.filter_worker.built.connect(self.on_filter_built)
+        self.filter_worker.failed.connect(self.on_filter_failed)
+        self.filter_thread.start()
+        
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_REFRESH_MS)
+        self.filter_timer.timeout.connect(self.run_filter)
+        
+        self.tree_stack = QStackedWidget()
+        self.tree_stack.addWidget(self.tree_view)
+        self.tree_stack.addWidget(self.filter_view)
+        tree_layout.addWidget(self.tree_stack)
         tree_frame.setLayout(tree_layout)
         tree_container_layout.addWidget(tree_frame)
         
@@ -731,6 +1548,16 @@ class ProjectTab(QWidget):
         self.scaling_combo.currentTextChanged.connect(self.change_scaling)
         self.scaling_combo.setMaximumWidth(100)
         scaling_layout.addWidget(self.scaling_combo)
+        
+        scaling_layout.addSpacing(15)
+        scaling_layout.addWidget(QLabel("Show:"))
+        self.filter_combo = QComboBox()
+        self.filter_combo.addItems(["All Files"] + list(self.FILTER_ATTRIBUTES))
+        self.filter_combo.currentTextChanged.connect(self.change_filter)
+        scaling_layout.addWidget(self.filter_combo)
+        
+        self.filter_label = QLabel()
+        scaling_layout.addWidget(self.filter_label)
         scaling_layout.addStretch()
         
         scaling_frame.setLayout(scaling_layout)
@@ -866,6 +1693,82 @@ class ProjectTab(QWidget):
         base_size = 9  # Base font size
         font.setPointSize(int(base_size * scale_factor))
         self.tree_view.setFont(font)
+        self.filter_view.setFont(font)
+    
+    def change_filter(self, text):
+        """Switch between the full file tree and the files with an attribute set"""
+        self.filter_timer.stop()
+        if text not in self.FILTER_ATTRIBUTES:
+            self.filter_generation += 1  # Drop any build still running
+            self.tree_stack.setCurrentWidget(self.tree_view)
+            self.filter_label.clear()
+            return
+        self.filter_model.set_root(FilterNode("", None, True))
+        self.tree_stack.setCurrentWidget(self.filter_view)
+        self.run_filter()
+    
+    def refresh_filter(self):
+        """Rebuild an active filter shortly, once for a burst of changes"""
+        if self.filter_combo.currentText() in self.FILTER_ATTRIBUTES:
+            self.filter_timer.start()
+    
+    def run_filter(self):
+        self.filter_generation += 1
+        self.filter_label.setText("Filtering...")
+        self.filter_requested.emit(self.filter_generation, self.FILTER_ATTRIBUTES[self.filter_combo.currentText()])
+    
+    def on_filter_built(self, generation, root, count):
+        if generation != self.filter_generation:
+            return  # Superseded by a newer build, or the filter was turned off
+        if root is None:
+            self.filter_model.set_root(FilterNode("", None, True))
+            self.filter_label.setText("Project not indexed yet")
+            return
+        
+        expanded = self.expanded_filter_paths()
+        self.filter_model.set_root(root)
+        if self.filter_model.count_rows(self.FILTER_EXPAND_LIMIT) < self.FILTER_EXPAND_LIMIT:
+            self.filter_view.expandAll()
+        else:
+            self.expand_filter_paths(expanded)
+        self.filter_label.setText(f"{count} matching")
+    
+    def on_filter_failed(self, generation, error):
+        if generation == self.filter_generation:
+            self.filter_label.setText(f"Filter failed: {error}")
+    
+    def expanded_filter_paths(self):
+        """Paths of the expanded items of the filtered tree"""
+        paths = set()
+        stack = [QModelIndex()]
+        while stack:
+            parent = stack.pop()
+            for row in range(self.filter_model.rowCount(parent)):
+                index = self.filter_model.index(row, 0, parent)
+                if self.filter_view.isExpanded(index):
+                    paths.add(self.filter_model.filePath(index))
+                    stack.append(index)
+        return paths
+    
+    def expand_filter_paths(self, paths):
+        """Expand the items of the filtered tree found in paths, e.g. after a rebuild"""
+        stack = [QModelIndex()]
+        while stack and paths:
+            parent = stack.pop()
+            for row in range(self.filter_model.rowCount(parent)):
+                index = self.filter_model.index(row, 0, parent)
+                if self.filter_model.filePath(index) in paths:
+                    self.filter_view.expand(index)
+                    stack.append(index)
+    
+    def on_filter_item_clicked(self, index):
+        self.on_item_clicked(self.file_model.index(self.filter_model.filePath(index)))
+    
+    def show_in_tree(self, index):
+        """Leave the filter and select the item in the full file tree"""
+        path = self.filter_model.filePath(index)
+        self.filter_combo.setCurrentText("All Files")
+        self.reveal_path(path)
     
     def show_calendar(self):
         """Show calendar dialog for date selection"""
@@ -905,9 +1808,10 @@ class ProjectTab(QWidget):
         new_name = self.project_name_edit.text()
         if new_name != self.project_name:
             self.project_name = new_name
-            conn = sqlite3.connect('file_tree_manager.db')
+            conn = connect_db()
             cursor = conn.cursor()
             cursor.execute("UPDATE projects SET name = ? WHERE id = ?", (new_name, self.project_id))
+            log_change(cursor, self.project_id, "", "name", new_name, self.username)
             conn.commit()
             conn.close()
             
@@ -922,18 +1826,20 @@ class ProjectTab(QWidget):
         """Update project comment in database"""
         comment = self.project_comment_edit.toPlainText()
         self.project_comment = comment
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("UPDATE projects SET project_comment = ? WHERE id = ?", (comment, self.project_id))
+        log_change(cursor, self.project_id, "", "project_comment", comment, self.username)
         conn.commit()
         conn.close()
     
     def update_delivery_date(self, date):
         """Update delivery date in database"""
         self.delivery_date = date
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("UPDATE projects SET delivery_date = ? WHERE id = ?", (date, self.project_id))
+        log_change(cursor, self.project_id, "", "delivery_date", date, self.username)
         conn.commit()
         conn.close()
     
@@ -986,13 +1892,140 @@ class ProjectTab(QWidget):
         if details_splitter:
             self.settings.setValue(f"details_splitter_{self.project_id}", details_splitter.saveState())
                 
+        # Stop background work before the tab goes away
+        self.stop_background_work()
+        
         self.save_tree_state()
         super().closeEvent(event)
+        
+    def stop_background_work(self):
+        """Stop the change tracker, the filter, thumbnail and size workers, any running export and the service subscription"""
+        self.change_tracker.stop()
+        self.filter_timer.stop()
+        self.filter_thread.quit()
+        self.filter_thread.wait()
+        self.thumbnail_loader.stop()
+        self.dir_sizes.cancel()
+        self.size_thread.quit()
+        self.size_thread.wait()
+        if self.service_socket is not None:
+            self.service_socket.disconnected.disconnect(self.on_service_disconnected)
+            self.service_socket.abort()
+            self.service_socket = None
+        if self.export_thread is not None:
+            self.export_worker.exporter.cancel()
+            self.export_thread.quit()
+            self.export_thread.wait()
+    
+    def eventFilter(self, obj, event):
+        # Status cells computed between two repaints of the tree
+        if METRICS.enabled and event.type() == QEvent.Paint and obj is self.tree_view.viewport():
+            METRICS.observe("status_data_calls_per_repaint", self.file_model.status_data_calls,
+                            MetricsDialog.CALL_BUCKETS)
+            self.file_model.status_data_calls = 0
+        return super().eventFilter(obj, event)
+        
+    def on_directory_changed(self, dir_path):
+        # Statuses of folders changed without the service are fetched again
+        if isinstance(self.attribute_manager, RemoteAttributeManager):
+            self.attribute_manager.invalidate_dir(dir_path)
+        
+    def apply_logged_changes(self, rows):
+        """Repaint the status of the files other instances changed, and their project edits"""
+        paths = set()
+        for change_id, project_id, file_path, attribute, value, user in rows:
+            if file_path:
+                paths.add(os.path.join(self.master_path, file_path))
+            else:
+                self.apply_project_change(attribute, value)
+        
+        current_path = self.file_model.filePath(self.tree_view.currentIndex())
+        for path in paths:
+            self.metadata_cache.invalidate(path + SIDECAR_SUFFIX)
+            if isinstance(self.attribute_manager, RemoteAttributeManager):
+                self.attribute_manager.invalidate_dir(os.path.dirname(path))
+            index = self.file_model.index(path)
+            if index.isValid():
+                status_index = index.sibling(index.row(), 4)
+                self.file_model.dataChanged.emit(status_index, status_index)
+        if current_path in paths:
+            self.on_item_clicked(self.tree_view.currentIndex())
+        if paths:
+            self.refresh_filter()
+    
+    def apply_project_change(self, attribute, value):
+        """Show a project field edited elsewhere, unless it is being edited here"""
+        value = value or ""
+        if attribute == "name" and not self.project_name_edit.hasFocus():
+            self.project_name = value
+            self.project_name_edit.setText(value)
+            tab_widget = self.parent().parent() if self.parent() else None
+            if hasattr(tab_widget, 'setTabText') and tab_widget.indexOf(self) >= 0:
+                tab_widget.setTabText(tab_widget.indexOf(self), value)
+        elif attribute == "project_comment" and not self.project_comment_edit.hasFocus():
+            if value != self.project_comment_edit.toPlainText():
+                self.project_comment = value
+                self.project_comment_edit.blockSignals(True)
+                self.project_comment_edit.setPlainText(value)
+                self.project_comment_edit.blockSignals(False)
+        elif attribute == "delivery_date" and not self.delivery_date_edit.hasFocus():
+            if value != self.delivery_date_edit.text():
+                self.delivery_date = value
+                self.delivery_date_edit.blockSignals(True)
+                self.delivery_date_edit.setText(value)
+                self.delivery_date_edit.blockSignals(False)
+    
+    def on_files_changed(self, changes):
+        """Drop cached metadata for paths the change tracker saw change"""
+        resized_dirs = set()
+        rewritten_dirs = set()
+        remote = isinstance(self.attribute_manager, RemoteAttributeManager)
+        for change in changes:
+            for path in change[1:]:
+                self.metadata_cache.invalidate(path)
+                self.metadata_cache.invalidate(path + SIDECAR_SUFFIX)
+                if remote:
+                    self.attribute_manager.invalidate_dir(os.path.dirname(path))
+                self.thumbnails.pop(path, None)
+                self.folder_previews.pop(os.path.dirname(path), None)
+                if change[0] == 'modified':
+                    rewritten_dirs.add(os.path.dirname(path))
+                elif change[0] != 'attributes':
+                    resized_dirs.add(os.path.dirname(path))
+        # Files rewritten in place leave their folder's mtime alone
+        if rewritten_dirs:
+            self.sizes_invalidated.emit(sorted(rewritten_dirs), True)
+        if resized_dirs:
+            self.sizes_invalidated.emit(sorted(resized_dirs), False)
+        if rewritten_dirs or resized_dirs:
+            self.sizes_requested.emit([self.master_path])
+        self.tree_view.viewport().update()
+        self.refresh_filter()
+        
+    def request_folder_sizes(self, dir_path):
+        """Compute the sizes of the sub-folders of a folder the tree loaded, one by one"""
+        parent = self.file_model.index(dir_path)
+        subdirs = []
+        for row in range(self.file_model.rowCount(parent)):
+            index = self.file_model.index(row, 0, parent)
+            if self.file_model.isDir(index):
+                subdirs.append(self.file_model.filePath(index))
+        self.sizes_requested.emit(subdirs + [dir_path])
+    
+    def on_folder_size_changed(self, dir_path):
+        self.sizes_invalidated.emit([dir_path], False)
+        self.sizes_requested.emit([self.master_path])
     
+    def on_size_computed(self, dir_path):
+        self.tree_view.viewport().update()
+    
+    @profiled("item_click")
     def on_item_clicked(self, index):
         """Show details of the selected item"""
         path = self.file_model.filePath(index)
-        if os.path.exists(path) and not path.endswith('.json'):
+        self.details_path = path
+        self.details_sources = set()
+        if self.metadata_cache.exists(path) and not path.endswith('.json'):
             # Get attributes
             publish_status, pub_time, pub_user = self.attribute_manager.get_current_status(path, "publish")
             client_status, client_time, client_user = self.attribute_manager.get_current_status(path, "to_client")
@@ -1000,6 +2033,7 @@ class ProjectTab(QWidget):
             # Format details text
             details = f"<h3>File Details</h3>"
             details += f"<b>Path:</b> {path}<br><br>"
+            details += self.preview_html(path)
             
             details += f"<b>Publish Status:</b> {'Published' if publish_status else 'Not Published'}<br>"
             if pub_time:
@@ -1027,13 +2061,52 @@ class ProjectTab(QWidget):
             
             self.details_panel.setHtml(details)
     
+    def preview_html(self, path):
+        """Thumbnail of a file, or of the first frames in a folder; missing ones are requested"""
+        if self.metadata_cache.isdir(path):
+            sources = self.folder_previews.get(path)
+            if sources is None:
+                self.thumbnail_loader.request(path, is_dir=True)
+                return ""
+            sources = sources[:self.FOLDER_PREVIEWS]
+        elif ThumbnailLoader.can_preview(path):
+            sources = [path]
+        else:
+            return ""
+        
+        self.details_sources = set(sources)
+        images = []
+        loading = False
+        for source in sources:
+            thumbnail = self.thumbnails.get(source)
+            if thumbnail is None:
+                self.thumbnail_loader.request(source)
+                loading = True
+            elif thumbnail:
+                images.append(f'<img src="{QUrl.fromLocalFile(thumbnail).toString()}" '
+                              f'title="{os.path.basename(source)}">')
+        html = " ".join(images)
+        if loading:
+            html += " <i>Loading preview...</i>"
+        return html + "<br><br>" if html else ""
+    
+    def on_thumbnail_ready(self, path, thumbnail):
+        self.thumbnails[path] = thumbnail
+        if path in self.details_sources:
+            self.on_item_clicked(self.file_model.index(self.details_path))
+    
+    def on_thumbnails_listed(self, dir_path, sources):
+        self.folder_previews[dir_path] = sources
+        if dir_path == self.details_path:
+            self.on_item_clicked(self.file_model.index(dir_path))
+    
     def check_attribute_conflicts(self, path, attribute):
         """Check for attribute conflicts in the same directory"""
-        if not os.path.isdir(os.path.dirname(path)):
+        if not self.metadata_cache.isdir(os.path.dirname(path)):
             return True  # No conflict if not in a directory with siblings
             
         parent_dir = os.path.dirname(path)
-        siblings = [f for f in os.listdir(parent_dir) if f != os.path.basename(path)]
+        siblings = [f for f in self.metadata_cache.listdir(parent_dir) if f != os.path.basename(path)]
         
         conflicts = []
         for sibling in siblings:
@@ -1074,14 +2147,15 @@ class ProjectTab(QWidget):
     def show_context_menu(self, position):
         """Show right-click context menu for attribute management"""
         menu = QMenu()
-        index = self.tree_view.indexAt(position)
+        view = self.tree_stack.currentWidget()
+        index = view.indexAt(position)
         
         if index.isValid():
-            path = self.file_model.filePath(index)
+            path = view.model().filePath(index)
             if path.endswith('.json'):
                 return  # Skip .json files
                 
-            is_dir = os.path.isdir(path)
+            is_dir = self.metadata_cache.isdir(path)
             
             publish_action = QAction("Publish", self)
             publish_action.triggered.connect(lambda: self.toggle_attribute("publish", True, path))
@@ -1113,164 +2187,114 @@ class ProjectTab(QWidget):
                 export_xml_action.triggered.connect(lambda: self.export_published_xml(path))
                 menu.addAction(export_xml_action)
             
-            menu.exec_(self.tree_view.viewport().mapToGlobal(position))
+                export_compact_action = QAction("Export Published XML (Frame Ranges)", self)
+                export_compact_action.triggered.connect(lambda: self.export_published_xml(path, compact=True))
+                menu.addAction(export_compact_action)
+                
+            menu.exec_(view.viewport().mapToGlobal(position))
     
+    @profiled("send_to_client")
     def send_to_client(self, dir_path):
         """Send files to the delivery folder, including all child files of folders marked for client"""
         try:
-            # Find all files in directories with to_client attribute
-            to_client_files = []
-            
-            def collect_files_from_dir(current_dir):
-                client_status, _, _ = self.attribute_manager.get_current_status(current_dir, "to_client")
-                if client_status:
-                    # Include all files in this directory and subdirectories
-                    for root, dirs, files in os.walk(current_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            if not file_path.endswith('.json'):  # Skip .json files
-                                to_client_files.append(file_path)
-                else:
-                    # Only include files explicitly marked for client
-                    for item in os.listdir(current_dir):
-                        item_path = os.path.join(current_dir, item)
-                        if os.path.isfile(item_path) and not item_path.endswith('.json'):
-                            file_client_status, _, _ = self.attribute_manager.get_current_status(item_path, "to_client")
-                            if file_client_status:
-                                to_client_files.append(item_path)
-                        elif os.path.isdir(item_path):
-                            collect_files_from_dir(item_path)
-            
-            collect_files_from_dir(dir_path)
+            # Find all files marked for client, including children of marked folders
+            to_client_files = collect_client_files(self.attribute_manager, dir_path)
             
             if not to_client_files:
                 QMessageBox.information(self, "No Files", "No files marked for client delivery in this directory.")
                 return
             
-            # Create the corresponding directory structure in delivery folder
-            rel_path = os.path.relpath(dir_path, self.master_path)
-            dest_dir = os.path.join(self.delivery_path, rel_path)
-            os.makedirs(dest_dir, exist_ok=True)
-            
-            # Copy files without timestamp
-            copied_count = 0
-            for file_path in to_client_files:
-                file_rel_path = os.path.relpath(file_path, self.master_path)
-                dest_path = os.path.join(self.delivery_path, file_rel_path)
-                
-                # Create destination directory if it doesn't exist
-                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                
-                # Copy file without timestamp
-                shutil.copy2(file_path, dest_path)
-                copied_count += 1
+            copied_count = copy_to_delivery(to_client_files, dir_path, self.master_path, self.delivery_path)
             
             QMessageBox.information(self, "Success", f"Successfully copied {copied_count} files to client delivery folder.")
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to send files to client: {str(e)}")
     
-    def export_published_xml(self, dir_path):
+    @profiled("export_published_xml")
+    def export_published_xml(self, dir_path, compact=False):
         """Export XML file with published files information for NLE software"""
-        try:
-            # Find all published files in the directory (including children of published folders)
-            published_files = []
-            
-            def collect_published_files(current_dir):
-                # Check if current directory is published
-                dir_publish_status, _, _ = self.attribute_manager.get_current_status(current_dir, "publish")
-                
-                for root, dirs, files in os.walk(current_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        if file_path.endswith('.json'):
-                            continue  # Skip .json files
-                            
-                        # If parent directory is published, include all files
-                        if dir_publish_status:
-                            published_files.append(file_path)
-                        else:
-                            # Check if individual file is published
-                            file_publish_status, _, _ = self.attribute_manager.get_current_status(file_path, "publish")
-                            if file_publish_status:
-                                published_files.append(file_path)
-            
-            collect_published_files(dir_path)
+        if self.export_thread is not None:
+            QMessageBox.information(self, "Export Running", "An XML export is already running for this project.")
+            return
             
-            if not published_files:
-                QMessageBox.information(self, "No Files", "No published files found in this directory.")
-                return
+        # Find all published files in the directory and stream them to disk
+        # from a worker thread so the window stays responsive
+        exporter = PublishedExporter(self.attribute_manager, self.project_name, compact)
+        self.export_worker = ExportWorker(exporter, dir_path)
+        self.export_thread = QThread(self)
+        self.export_worker.moveToThread(self.export_thread)
             
-            # Create XML structure
-            root = ET.Element("FileSequence")
-            root.set("version", "1.0")
-            root.set("exportDate", datetime.now().isoformat())
-            root.set("project", self.project_name)
+        self.export_progress = QProgressDialog("Scanning directories...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowTitle("Export Published XML")
+        self.export_progress.setMinimumDuration(500)
+        self.export_progress.canceled.connect(exporter.cancel)
             
-            # Group files by sequence (files with similar names and numbers)
-            sequences = {}
-            for file_path in published_files:
-                file_name = os.path.basename(file_path)
-                dir_name = os.path.dirname(file_path)
-                
-                # Try to detect sequence patterns (e.g., file_001.jpg, file_002.jpg)
-                base_name = file_name
-                number = None
-                
-                # Look for numbers in the filename
-                import re
-                match = re.search(r'(\d+)\.\w+$', file_name)
-                if match:
-                    number = match.group(1)
-                    base_name = file_name[:match.start()]
-                
-                if base_name not in sequences:
-                    sequences[base_name] = {
-                        'files': [],
-                        'directory': dir_name
-                    }
-                
-                sequences[base_name]['files'].append({
-                    'path': file_path,
-                    'name': file_name,
-                    'number': number
-                })
-            
-            # Add sequences to XML
-            for base_name, sequence in sequences.items():
-                seq_elem = ET.SubElement(root, "Sequence")
-                seq_elem.set("name", base_name)
-                seq_elem.set("directory", sequence['directory'])
-                
-                for file_info in sorted(sequence['files'], key=lambda x: x['number'] or x['name']):
-                    file_elem = ET.SubElement(seq_elem, "File")
-                    file_elem.set("name", file_info['name'])
-                    if file_info['number']:
-                        file_elem.set("frame", file_info['number'])
-                    file_elem.set("path", file_info['path'])
-                    file_elem.set("size", str(os.path.getsize(file_info['path'])))
-                    file_elem.set("modified", datetime.fromtimestamp(os.path.getmtime(file_info['path'])).isoformat())
-            
-            # Create XML tree and save
-            tree = ET.ElementTree(root)
-            xml_file_path = os.path.join(dir_path, "published_sequence.xml")
-            tree.write(xml_file_path, encoding='utf-8', xml_declaration=True)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_thread.start()
+        
+    def on_export_progress(self, dirs_scanned, files_matched):
+        """Show export progress in the progress dialog"""
+        if self.export_progress:
+            self.export_progress.setLabelText(f"Scanned {dirs_scanned} directories, matched {files_matched} published files")
+        
+    def finish_export(self):
+        """Tear down the export worker and its progress dialog"""
+        self.export_progress.reset()
+        self.export_progress = None
+        self.export_thread.quit()
+        self.export_thread.wait()
+        self.export_thread = None
+        self.export_worker = None
+        
+    def on_export_finished(self, xml_file_path, file_count):
+        """Report the result of a background XML export"""
+        cancelled = self.export_worker.exporter.cancelled
+        self.finish_export()
+        
+        # A cancelled export writes nothing and keeps the previous XML, unless
+        # the cancel came after the new one was already in place
+        if cancelled and not xml_file_path:
+            return
             
-            QMessageBox.information(self, "Success", f"XML export completed successfully.\nSaved to: {xml_file_path}")
+        if not xml_file_path:
+            QMessageBox.information(self, "No Files", "No published files found in this directory.")
+            return
             
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to export XML: {str(e)}")
+        QMessageBox.information(self, "Success", f"XML export completed successfully.\n{file_count} files saved to: {xml_file_path}")
+        
+    def on_export_failed(self, error):
+        """Report an error raised by a background XML export"""
+        self.finish_export()
+        QMessageBox.critical(self, "Error", f"Failed to export XML: {error}")
     
+    def reveal_path(self, path):
+        """Select a path in the file tree and show its details"""
+        index = self.file_model.index(path)
+        if index.isValid():
+            self.tree_view.setCurrentIndex(index)
+            self.tree_view.scrollTo(index)
+            self.on_item_clicked(index)
+        
+    @profiled("toggle_attribute")
     def toggle_attribute(self, attribute, value, path):
         """Toggle attribute for selected items with conflict checking"""
-        if value:  # Only check conflicts when adding attributes
-            if not self.check_attribute_conflicts(path, attribute):
-                return  # User cancelled the operation
-        
-        self.attribute_manager.update_attribute(path, attribute, value, self.username)
+        try:
+            if value:  # Only check conflicts when adding attributes
+                if not self.check_attribute_conflicts(path, attribute):
+                    return  # User cancelled the operation
+            
+            self.attribute_manager.update_attribute(path, attribute, value, self.username)
+        except (OSError, SidecarWriteError, AttributeServiceError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to update attribute: {str(e)}")
+            return
         
         # Refresh the tree view to update badges
         self.tree_view.viewport().update()
+        self.refresh_filter()
         
         # Update details view
         index = self.tree_view.currentIndex()
@@ -1280,11 +2304,27 @@ class ProjectTab(QWidget):
 
 class CommandCenter(QMainWindow):
     """Main application window"""
+    # How often changes committed by other instances are looked for
+    CHANGE_LOG_POLL_MS = 1000
+    
     def __init__(self, user_id, username):
         super().__init__()
         self.user_id = user_id
         self.username = username
         self.settings = QSettings("FileTreeManager", "MainWindow")
+        self.file_index = FileIndex()
+        self.project_ids = set()
+        self.index_thread = None
+        self.index_worker = None
+        self.search_dialog = None
+        self.metrics_dialog = None
+        
+        # Attribute and project changes committed by other instances
+        self.change_log = ChangeLog()
+        self.change_log_timer = QTimer(self)
+        self.change_log_timer.setInterval(self.CHANGE_LOG_POLL_MS)
+        self.change_log_timer.timeout.connect(self.poll_change_log)
+        self.change_log_timer.start()
         
         self.setWindowTitle(f"File Tree Manager - Command Center (User: {username})")
         self.setGeometry(100, 100, 1400, 900)
@@ -1323,6 +2363,19 @@ class CommandCenter(QMainWindow):
         refresh_btn.clicked.connect(self.refresh_projects)
         corner_layout.addWidget(refresh_btn)
 
+        # Search box over the file index of all projects
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search files in all projects...")
+        self.search_edit.setMinimumWidth(250)
+        self.search_edit.returnPressed.connect(self.run_search)
+        corner_layout.addWidget(self.search_edit)
+        
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        
         corner_layout.addStretch()
         
         # Tab widget for projects
@@ -1347,10 +2400,36 @@ class CommandCenter(QMainWindow):
         new_project_action.triggered.connect(self.create_new_project)
         file_menu.addAction(new_project_action)
         
+        batch_project_action = QAction('New Projects from Manifest...', self)
+        batch_project_action.triggered.connect(self.create_projects_from_manifest)
+        file_menu.addAction(batch_project_action)
+        
         refresh_action = QAction('Refresh', self)
         refresh_action.triggered.connect(self.refresh_projects)
         file_menu.addAction(refresh_action)
         
+        rebuild_index_action = QAction('Rebuild File Index', self)
+        rebuild_index_action.triggered.connect(lambda: self.rebuild_file_index())
+        file_menu.addAction(rebuild_index_action)
+        
+        reconcile_action = QAction('Reconcile Attributes', self)
+        reconcile_action.triggered.connect(self.reconcile_attributes)
+        file_menu.addAction(reconcile_action)
+        
+        self.profile_action = QAction('Profile Slow Actions', self)
+        self.profile_action.setCheckable(True)
+        self.profile_action.setChecked(PROFILER.enabled)
+        self.profile_action.toggled.connect(self.set_profiling)
+        file_menu.addAction(self.profile_action)
+        
+        metrics_action = QAction('Metrics', self)
+        metrics_action.triggered.connect(self.show_metrics)
+        file_menu.addAction(metrics_action)
+        
+        cache_stats_action = QAction('Metadata Cache Statistics', self)
+        cache_stats_action.triggered.connect(self.show_metadata_cache_stats)
+        file_menu.addAction(cache_stats_action)
+        
         exit_action = QAction('Exit', self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -1362,6 +2441,46 @@ class CommandCenter(QMainWindow):
             account_action = QAction('Account Management', self)
             account_action.triggered.connect(self.show_user_manager)
             access_menu.addAction(account_action)
+        
+    def reconcile_attributes(self):
+        """Check the current project's sidecars against the database"""
+        tab = self.tab_widget.currentWidget()
+        if tab is None:
+            return
+        dialog = ReconcileDialog(tab.project_id, tab.project_name, tab.master_path, self)
+        dialog.exec_()
+    
+    def set_profiling(self, enabled):
+        """Turn per-action profiling on or off"""
+        PROFILER.enabled = enabled
+        if enabled:
+            self.statusBar().showMessage(f"Profiling actions slower than {PROFILER.threshold:g} s "
+                                         f"into {PROFILER.output_dir}")
+        else:
+            self.statusBar().showMessage("Profiling off")
+    
+    def show_metrics(self):
+        """Show the metrics debug panel (non-modal)"""
+        if self.metrics_dialog is None:
+            self.metrics_dialog = MetricsDialog(self)
+        self.metrics_dialog.show()
+        self.metrics_dialog.raise_()
+    
+    def show_metadata_cache_stats(self):
+        """Show metadata cache hit rates per mount point for the current project"""
+        tab = self.tab_widget.currentWidget()
+        if tab is None:
+            return
+        lines = []
+        for mount, stats in sorted(tab.metadata_cache.stats().items()):
+            misses = stats['misses']
+            avg_miss_ms = stats['miss_seconds'] * 1000 / misses if misses else 0.0
+            lines.append(f"{mount}\n"
+                         f"    TTL {stats['ttl']:g} s, {stats['hits']} hits, {misses} misses "
+                         f"({stats['hit_rate']:.0%} hit rate)\n"
+                         f"    {avg_miss_ms:.2f} ms per miss, {stats['invalidations']} invalidations")
+        QMessageBox.information(self, f"Metadata Cache - {tab.project_name}",
+                                "\n\n".join(lines) if lines else "No lookups yet.")
     
     def show_user_manager(self):
         """Show the user management dialog"""
@@ -1383,6 +2502,14 @@ class CommandCenter(QMainWindow):
         self.settings.setValue("geometry", self.saveGeometry())
         self.settings.setValue("windowState", self.saveState())
         
+        self.change_log_timer.stop()
+        
+        # Stop a running index rebuild
+        if self.index_thread is not None:
+            self.file_index.cancel()
+            self.index_thread.quit()
+            self.index_thread.wait()
+        
         # Save state of all project tabs
         for i in range(self.tab_widget.count()):
             tab = self.tab_widget.widget(i)
@@ -1391,9 +2518,23 @@ class CommandCenter(QMainWindow):
         
         super().closeEvent(event)
     
+    def poll_change_log(self):
+        """Send the changes other instances committed to the tabs of their projects"""
+        rows = self.change_log.poll()
+        if not rows:
+            return
+        by_project = {}
+        for row in rows:
+            by_project.setdefault(row[1], []).append(row)
+        for i in range(self.tab_widget.count()):
+            tab = self.tab_widget.widget(i)
+            if tab.project_id in by_project:
+                tab.apply_logged_changes(by_project[tab.project_id])
+    
+    @profiled("load_projects")
     def load_projects(self):
         """Load projects from database"""
-        conn = sqlite3.connect('file_tree_manager.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -1405,6 +2546,9 @@ class CommandCenter(QMainWindow):
         projects = cursor.fetchall()
         conn.close()
         
+        # Old tabs are replaced; stop their watchers and workers first
+        for i in range(self.tab_widget.count()):
+            self.tab_widget.widget(i).stop_background_work()
         self.tab_widget.clear()
         
         for project_id, name, master_path, client_name, delivery_path in projects:
@@ -1416,14 +2560,111 @@ class CommandCenter(QMainWindow):
             tab = ProjectTab(project_id, name, master_path, client_name, delivery_path, self.username)
             self.tab_widget.addTab(tab, name)
             
+        self.project_ids = {project[0] for project in projects}
+        
         if not projects:
             self.statusBar().showMessage("No projects found. Create a new project to get started.")
+            
+        # Index projects that have never been indexed
+        indexed = self.file_index.indexed_project_ids()
+        self.rebuild_file_index([project for project in projects if project[0] not in indexed])
+        
+    def rebuild_file_index(self, projects=None):
+        """Rebuild the file index in the background (all open projects by default)"""
+        if self.index_thread is not None:
+            return
+        if projects is None:
+            projects = [(tab.project_id, tab.project_name, tab.master_path)
+                        for tab in (self.tab_widget.widget(i) for i in range(self.tab_widget.count()))]
+        else:
+            projects = [(project[0], project[1], project[2]) for project in projects]
+        if not projects:
+            return
+            
+        self.file_index.cancelled = False
+        self.index_worker = IndexWorker(self.file_index, projects)
+        self.index_thread = QThread(self)
+        self.index_worker.moveToThread(self.index_thread)
+        self.index_thread.started.connect(self.index_worker.run)
+        self.index_worker.progress.connect(
+            lambda name, count: self.statusBar().showMessage(f"Indexing {name}: {count} files"))
+        self.index_worker.finished.connect(self.on_index_finished)
+        self.index_worker.failed.connect(self.on_index_failed)
+        self.index_thread.start()
+        self.statusBar().showMessage("Indexing project files...")
+        
+    def finish_indexing(self):
+        self.index_thread.quit()
+        self.index_thread.wait()
+        self.index_thread = None
+        self.index_worker = None
+        
+    def on_index_finished(self, total):
+        self.finish_indexing()
+        self.statusBar().showMessage(f"File index updated ({total} files)")
+        for i in range(self.tab_widget.count()):
+            self.tab_widget.widget(i).refresh_filter()
+        
+    def on_index_failed(self, error):
+        self.finish_indexing()
+        self.statusBar().showMessage(f"File indexing failed: {error}")
+        
+    @profiled("run_search")
+    def run_search(self):
+        """Search the file index and show the results"""
+        self.search_timer.stop()
+        text = self.search_edit.text().strip()
+        if not text:
+            return
+            
+        start = time.perf_counter()
+        try:
+            results = self.file_index.search(text)
+        except sqlite3.Error as e:
+            self.statusBar().showMessage(f"Search failed: {str(e)}")
+            return
+        results = [result for result in results if result['project_id'] in self.project_ids]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        if self.search_dialog is None:
+            self.search_dialog = SearchResultsDialog(self)
+            self.search_dialog.file_activated.connect(self.reveal_file)
+        self.search_dialog.show_results(text, results, elapsed_ms)
+        
+    def reveal_file(self, project_id, path):
+        """Switch to the project tab of a search result and select the file"""
+        for i in range(self.tab_widget.count()):
+            tab = self.tab_widget.widget(i)
+            if tab.project_id == project_id:
+                self.tab_widget.setCurrentIndex(i)
+                tab.reveal_path(path)
+                return
     
     def refresh_projects(self):
         """Refresh the project list"""
         self.load_projects()
         self.statusBar().showMessage("Projects refreshed")
     
+    def create_projects_from_manifest(self):
+        """Create every project listed in a CSV or JSON manifest"""
+        manifest_path, _ = QFileDialog.getOpenFileName(self, "Select Project Manifest", "",
+                                                       "Manifests (*.csv *.json);;All Files (*)")
+        if not manifest_path:
+            return
+        try:
+            projects = load_project_manifest(manifest_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to read manifest: {str(e)}")
+            return
+        if not projects:
+            QMessageBox.information(self, "Create Projects", "The manifest lists no projects.")
+            return
+            
+        dialog = BatchProjectDialog(manifest_path, projects, self.user_id, self)
+        dialog.exec_()
+        if any(result["project_id"] for result in dialog.results):
+            self.load_projects()
+    
     def create_new_project(self):
         """Create a new project"""
         dialog = NewProjectDialog(self)
@@ -1434,12 +2675,16 @@ class CommandCenter(QMainWindow):
                 QMessageBox.warning(self, "Error", "Please fill in required fields")
                 return
                 
-            # Check if root_sample directory exists
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            root_sample_path = os.path.join(script_dir, "folder_hierarchy", "root_sample")
-            
-            if not os.path.exists(root_sample_path):
-                QMessageBox.warning(self, "Error", "Root sample directory not found. Please create it first.")
+            # Project template: folder_hierarchy/template.json, else a copy of
+            # folder_hierarchy/root_sample, else the default folders
+            try:
+                template = project_template()
+                template_values = {
+                    "shot": parse_names(project_data["shots"]),
+                    "sequence": parse_names(project_data["sequences"])
+                }
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, "Error", f"Invalid project template or shot list: {str(e)}")
                 return
                 
             # Ask user if they want to create folder hierarchy
@@ -1449,19 +2694,9 @@ class CommandCenter(QMainWindow):
             
             if reply == QMessageBox.Yes:
                 try:
-                    # Create project directory
+                    # Create the project directory and its expanded template
                     project_dir = os.path.join(project_data["master_path"], project_data["name"])
-                    os.makedirs(project_dir, exist_ok=True)
-                    
-                    # Copy root_sample contents to project directory
-                    for item in os.listdir(root_sample_path):
-                        source = os.path.join(root_sample_path, item)
-                        destination = os.path.join(project_dir, item)
-                        
-                        if os.path.isdir(source):
-                            shutil.copytree(source, destination, dirs_exist_ok=True)
-                        else:
-                            shutil.copy2(source, destination)
+                    create_hierarchy(project_dir, template, template_values)
                     
                     # Update master path to the new project directory
                     project_data["master_path"] = project_dir
@@ -1475,7 +2710,7 @@ class CommandCenter(QMainWindow):
             os.makedirs(delivery_path, exist_ok=True)
             
             # Save to database
-            conn = sqlite3.connect('file_tree_manager.db')
+            conn = connect_db()
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO projects (name, master_path, client_name, delivery_path, project_comment, delivery_date, created_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
@@ -1491,7 +2726,20 @@ class CommandCenter(QMainWindow):
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    import argparse
+    parser = argparse.ArgumentParser(description="File Tree Manager")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile user actions and save the slow ones")
+    parser.add_argument("--profile-threshold", type=float, default=PROFILER.threshold, metavar="SECONDS",
+                        help="save profiles of actions at least this slow (default: %(default)s)")
+    parser.add_argument("--profile-dir", default=PROFILER.output_dir, metavar="DIR",
+                        help="where profiles are saved (default: %(default)s)")
+    args, qt_args = parser.parse_known_args()
+    PROFILER.enabled = args.profile
+    PROFILER.threshold = args.profile_threshold
+    PROFILER.output_dir = args.profile_dir
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Show login window
     login = LoginWindow()
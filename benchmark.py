@@ -0,0 +1,348 @@
+"""Benchmark Fileman hot paths on a synthetic project
+
+Generates a project from the default project template, with frame
+sequences for every shot and sidecars on a share of the files, then times
+the hot paths headlessly on the offscreen Qt platform and writes the
+timings to JSON:
+
+    python benchmark.py --shots 40 --frames 200 --output before.json
+    python benchmark.py --shots 40 --frames 200 --output after.json --compare before.json
+
+Everything runs in a scratch directory (HOME and the databases included),
+so the real Fileman databases are never touched.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+# Folders below a shot that get frame sequences, by the folder they sit in
+SEQUENCE_PASSES = ["beauty", "diffuse", "specular"]
+SEQUENCE_EXTENSION = ".exr"
+
+BENCHMARKS = ["cold_start", "tree_population", "status_column", "check_attribute_conflicts",
+              "send_to_client", "export_published_xml", "load_projects"]
+
+
+def shot_names(shots):
+    return [f"SH{(i + 1) * 10:04d}" for i in range(shots)]
+
+
+def generate_project(root, shots, frames, sidecar_density, seed=0):
+    """Create a synthetic project under root and return its statistics
+
+    The default project template is expanded with the given number of
+    shots. Render and comp folders of each shot get one sequence per pass
+    with the given number of frames. sidecar_density is the share of files
+    and folders that get a sidecar; half of those are published and a
+    quarter marked for the client.
+    """
+    from fileman_core import DEFAULT_TEMPLATE, SIDECAR_SUFFIX, expand_template
+
+    rng = random.Random(seed)
+    folders = expand_template(DEFAULT_TEMPLATE, {"shot": shot_names(shots)})
+    comp_renders = "05_Compositing/03_Comp_Renders"
+    folders.extend(f"{comp_renders}/{shot}" for shot in shot_names(shots))
+
+    file_count = 0
+    sidecar_count = 0
+    timestamp = "2024-01-01T00:00:00"
+
+    def write_sidecar(path):
+        nonlocal sidecar_count
+        publish = rng.random() < 0.5
+        to_client = rng.random() < 0.25
+        data = {
+            "publish": [{"status": publish, "timestamp": timestamp, "user": "bench"}],
+            "to_client": [{"status": to_client, "timestamp": timestamp, "user": "bench"}]
+        }
+        with open(path + SIDECAR_SUFFIX, 'w') as f:
+            json.dump(data, f)
+        sidecar_count += 1
+
+    for folder in folders:
+        folder_path = os.path.join(root, folder)
+        os.makedirs(folder_path, exist_ok=True)
+        name = os.path.basename(folder)
+        is_render_folder = (name.startswith("SH") and ("Render" in folder or comp_renders in folder))
+        if not is_render_folder:
+            continue
+        for render_pass in SEQUENCE_PASSES:
+            for frame in range(1, frames + 1):
+                path = os.path.join(folder_path, f"{name}_{render_pass}.{frame:04d}{SEQUENCE_EXTENSION}")
+                with open(path, 'wb') as f:
+                    f.write(b"\0" * 64)
+                file_count += 1
+                if rng.random() < sidecar_density:
+                    write_sidecar(path)
+        if rng.random() < sidecar_density:
+            write_sidecar(folder_path)
+
+    return {"folders": len(folders), "files": file_count, "sidecars": sidecar_count}
+
+
+def measure(function, repeat):
+    """Run function repeat times; returns the timings in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings, **extra):
+    result = {
+        "runs": [round(t, 6) for t in timings],
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6)
+    }
+    result.update(extra)
+    return result
+
+
+def cold_start(work_dir, repeat):
+    """Time a fresh interpreter importing Fileman (database setup included)"""
+    env = dict(os.environ, HOME=work_dir, QT_QPA_PLATFORM="offscreen")
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, "-c", f"import sys; sys.path.insert(0, {source_dir!r}); import Fileman"]
+    return measure(lambda: subprocess.run(command, cwd=work_dir, env=env, check=True,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL), repeat)
+
+
+def wait_for(app, condition, timeout=120.0):
+    """Process Qt events until condition() is true"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Timed out waiting for the file model")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def run_benchmarks(work_dir, master_path, delivery_path, repeat, selected):
+    """Time the hot paths inside work_dir; returns {benchmark: summary}"""
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+
+    app = QApplication.instance() or QApplication(["benchmark"])
+    # Dialogs would block a headless run; answer No to conflict prompts so
+    # the benchmark never changes the attributes it measures
+    QMessageBox.information = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+    QMessageBox.warning = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+    QMessageBox.critical = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.No)
+
+    import Fileman
+    from fileman_core import AttributeManager, PublishedExporter, scan_tree
+
+    conn = Fileman.sqlite3.connect('file_tree_manager.db')
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM projects WHERE master_path = ?", (master_path,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(
+            "INSERT INTO projects (name, master_path, client_name, delivery_path, created_by) VALUES (?, ?, ?, ?, ?)",
+            ("Benchmark", master_path, "Benchmark Client", delivery_path, 1))
+        project_id = cursor.lastrowid
+    else:
+        project_id = row[0]
+    conn.commit()
+    conn.close()
+
+    all_dirs = [dir_path for dir_path, dirs, files, sidecars in scan_tree(master_path)]
+    results = {}
+
+    if "cold_start" in selected:
+        results["cold_start"] = summarize(cold_start(work_dir, repeat))
+
+    tabs = []
+
+    def new_tab():
+        tab = Fileman.ProjectTab(project_id, "Benchmark", master_path, "Benchmark Client",
+                                 delivery_path, "bench")
+        tabs.append(tab)
+        return tab
+
+    if "tree_population" in selected:
+        # Build the tab and load every folder of the project into the model
+        def populate():
+            tab = new_tab()
+            loaded = set()
+            tab.file_model.directoryLoaded.connect(loaded.add)
+            for dir_path in all_dirs:
+                index = tab.file_model.index(dir_path)
+                tab.file_model.fetchMore(index)
+            wait_for(app, lambda: len(loaded) >= len(all_dirs))
+        results["tree_population"] = summarize(measure(populate, repeat), folders=len(all_dirs))
+
+    tab = new_tab()
+    loaded = set()
+    tab.file_model.directoryLoaded.connect(loaded.add)
+    for dir_path in all_dirs:
+        tab.file_model.fetchMore(tab.file_model.index(dir_path))
+    wait_for(app, lambda: len(loaded) >= len(all_dirs))
+
+    if "status_column" in selected:
+        model = tab.file_model
+        status_indexes = []
+        for dir_path in all_dirs:
+            parent = model.index(dir_path)
+            for row in range(model.rowCount(parent)):
+                status_indexes.append(model.index(row, 4, parent))
+
+        def paint_status():
+            for index in status_indexes:
+                model.data(index)
+        tab.metadata_cache.clear()
+        cold = measure(paint_status, 1)
+        results["status_column"] = summarize(measure(paint_status, repeat), rows=len(status_indexes),
+                                             cold=round(cold[0], 6))
+
+    if "check_attribute_conflicts" in selected:
+        # First frame of every sequence folder: each call scans its siblings
+        targets = []
+        for dir_path, dirs, files, sidecars in scan_tree(master_path):
+            if files:
+                targets.append(files[0].path)
+
+        def check_conflicts():
+            for path in targets:
+                tab.check_attribute_conflicts(path, "publish")
+        results["check_attribute_conflicts"] = summarize(measure(check_conflicts, repeat), calls=len(targets))
+
+    if "send_to_client" in selected:
+        def send():
+            shutil.rmtree(delivery_path, ignore_errors=True)
+            os.makedirs(delivery_path)
+            tab.send_to_client(master_path)
+        results["send_to_client"] = summarize(measure(send, repeat))
+
+    if "export_published_xml" in selected:
+        # The same exporter the tab runs in its worker thread, timed inline
+        def export(use_cache):
+            exporter = PublishedExporter(AttributeManager(master_path), "Benchmark", use_cache=use_cache)
+            exporter.export(master_path)
+        full = measure(lambda: export(False), repeat)
+        cached = measure(lambda: export(True), repeat)
+        results["export_published_xml"] = summarize(full, cached=summarize(cached))
+
+    if "load_projects" in selected:
+        window = Fileman.CommandCenter(1, "admin")
+        window.file_index.cancelled = True
+
+        def load():
+            window.load_projects()
+            window.file_index.cancelled = True
+        results["load_projects"] = summarize(measure(load, repeat), projects=window.tab_widget.count())
+        if window.index_thread is not None:
+            window.index_thread.quit()
+            window.index_thread.wait()
+        for i in range(window.tab_widget.count()):
+            window.tab_widget.widget(i).stop_background_work()
+
+    for tab in tabs:
+        tab.stop_background_work()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print the median of each benchmark against a previous JSON result"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    print(f"{'benchmark':<28}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in results["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        change = result["median"] / before["median"] if before["median"] else float('inf')
+        print(f"{name:<28}{before['median']:>12.4f}{result['median']:>12.4f}{change:>9.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Fileman on a synthetic project")
+    parser.add_argument("--shots", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=100, help="frames per sequence")
+    parser.add_argument("--sidecar-density", type=float, default=0.1,
+                        help="share of files and folders with a sidecar (0-1)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="run only these benchmarks")
+    parser.add_argument("--work-dir", help="scratch directory to reuse (default: a temporary one, removed after)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--compare", metavar="JSON", help="previous results to compare against")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, source_dir)
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="fileman_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    # Fileman keeps its databases in the working directory and its default
+    # project in HOME; point both at the scratch directory before importing
+    os.environ["HOME"] = work_dir
+    os.chdir(work_dir)
+    try:
+        master_path = os.path.join(work_dir, "BenchmarkProject")
+        delivery_path = os.path.join(work_dir, "BenchmarkDelivery")
+        params = {"shots": args.shots, "frames": args.frames, "sidecar_density": args.sidecar_density,
+                  "seed": args.seed, "repeat": args.repeat}
+        project_info = None
+        params_path = os.path.join(work_dir, "project.json")
+        if os.path.exists(params_path):
+            with open(params_path, 'r') as f:
+                saved = json.load(f)
+            if saved["params"] == {key: params[key] for key in saved["params"]}:
+                project_info = saved["project"]
+        if project_info is None:
+            shutil.rmtree(master_path, ignore_errors=True)
+            start = time.perf_counter()
+            project_info = generate_project(master_path, args.shots, args.frames, args.sidecar_density, args.seed)
+            project_info["generate_seconds"] = round(time.perf_counter() - start, 3)
+            with open(params_path, 'w') as f:
+                json.dump({"params": {key: params[key] for key in ("shots", "frames", "sidecar_density", "seed")},
+                           "project": project_info}, f)
+
+        results = {
+            "commit": git_commit(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+            "project": project_info,
+            "results": run_benchmarks(work_dir, master_path, delivery_path, args.repeat,
+                                      set(args.only or BENCHMARKS))
+        }
+    finally:
+        os.chdir(source_dir)
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    for name, result in results["results"].items():
+        print(f"{name:<28}{result['median']:>10.4f} s")
+    if baseline_path:
+        compare(results, baseline_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
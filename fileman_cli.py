@@ -0,0 +1,334 @@
+"""Command line interface to Fileman for scripts and render farm nodes
+
+Uses fileman_core only, so it runs on machines without PyQt5 or a display:
+
+    python fileman_cli.py init-db
+    python fileman_cli.py projects
+    python fileman_cli.py publish /projects/show/SH040/comp/v003.exr
+    python fileman_cli.py export /projects/show/SH040/comp --compact
+    python fileman_cli.py search SH040
+"""
+import os
+import sys
+import getpass
+import argparse
+
+import fileman_core
+from fileman_core import (init_db, AttributeManager, PublishedExporter, FileIndex, AttributeReconciler,
+                          list_projects, find_project, find_project_for_path, find_user_id,
+                          collect_client_files, copy_to_delivery, load_project_manifest, ProjectBatchCreator,
+                          SidecarWriteError, AttributeServiceClient, AttributeServiceError, RemoteAttributeManager,
+                          SidecarImporter)
+
+
+class CLIError(Exception):
+    """Error reported to the user as a message instead of a traceback"""
+
+
+def project_for_path(path, project=None):
+    """Project row for an explicit --project, or the one containing path"""
+    if project is not None:
+        result = find_project(project)
+        if result is None:
+            raise CLIError(f"Unknown project: {project}")
+        return result
+    result = find_project_for_path(path)
+    if result is None:
+        raise CLIError(f"{path} is not inside the master path of any project")
+    return result
+
+
+def existing_path(path):
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        raise CLIError(f"No such file or directory: {path}")
+    return path
+
+
+def open_database():
+    """Bring an existing database up to date; a missing one is an error, not created"""
+    if not os.path.exists(fileman_core.DB_PATH):
+        raise CLIError(f"No database at {os.path.abspath(fileman_core.DB_PATH)} "
+                       f"(use --db, or create it with 'fileman init-db')")
+    init_db(create_defaults=False)
+
+
+def attribute_manager_for(master_path):
+    """Goes through the attribute service when it runs, so open Fileman windows see the change"""
+    client = AttributeServiceClient()
+    if client.available():
+        return RemoteAttributeManager(master_path, client)
+    return AttributeManager(master_path)
+
+
+def cmd_init_db(args):
+    os.makedirs(os.path.dirname(os.path.abspath(fileman_core.DB_PATH)), exist_ok=True)
+    init_db()
+    print(f"Database ready: {os.path.abspath(fileman_core.DB_PATH)}")
+
+
+def cmd_projects(args):
+    for project_id, name, master_path, client_name, delivery_path in list_projects():
+        print(f"{project_id}\t{name}\t{client_name}\t{master_path}\t{delivery_path}")
+
+
+def cmd_status(args):
+    for path in args.paths:
+        path = existing_path(path)
+        project = project_for_path(path, args.project)
+        attribute_manager = attribute_manager_for(project[2])
+        publish, publish_time, publish_user = attribute_manager.get_current_status(path, "publish")
+        to_client, client_time, client_user = attribute_manager.get_current_status(path, "to_client")
+        print(path)
+        print(f"  publish:   {'yes' if publish else 'no'}" + (f" ({publish_time} by {publish_user})" if publish_time else ""))
+        print(f"  to client: {'yes' if to_client else 'no'}" + (f" ({client_time} by {client_user})" if client_time else ""))
+
+
+def set_attribute(args, attribute, value):
+    for path in args.paths:
+        path = existing_path(path)
+        project = project_for_path(path, args.project)
+        attribute_manager = attribute_manager_for(project[2])
+        try:
+            attribute_manager.update_attribute(path, attribute, value, args.user)
+        except (OSError, SidecarWriteError, AttributeServiceError) as e:
+            raise CLIError(str(e))
+        print(f"{path}: {attribute} = {value}")
+
+
+def cmd_publish(args):
+    set_attribute(args, "publish", not args.unpublish)
+
+
+def cmd_mark_client(args):
+    set_attribute(args, "to_client", not args.remove)
+
+
+def cmd_move(args):
+    source = existing_path(args.source)
+    dest = os.path.abspath(args.dest)
+    project = project_for_path(source, args.project)
+    if project_for_path(dest, args.project)[0] != project[0]:
+        raise CLIError(f"{dest} is not in the same project as {source}")
+    try:
+        AttributeManager(project[2]).move(source, dest)
+    except OSError as e:
+        raise CLIError(str(e))
+    print(f"{source} -> {dest}")
+
+
+def cmd_deliver(args):
+    path = existing_path(args.path)
+    project = project_for_path(path, args.project)
+    attribute_manager = AttributeManager(project[2])
+    files = collect_client_files(attribute_manager, path)
+    if not files:
+        print("No files marked for client delivery in this directory.")
+        return
+    if args.dry_run:
+        for file_path in files:
+            print(file_path)
+        return
+    copied_count = copy_to_delivery(files, path, project[2], project[4])
+    print(f"Copied {copied_count} files to {project[4]}")
+
+
+def print_progress(dirs_scanned, files_matched):
+    sys.stderr.write(f"\rScanned {dirs_scanned} folders, {files_matched} published files")
+    sys.stderr.flush()
+
+
+def cmd_export(args):
+    path = existing_path(args.path)
+    if not os.path.isdir(path):
+        raise CLIError(f"Not a directory: {path}")
+    project = project_for_path(path, args.project)
+    exporter = PublishedExporter(AttributeManager(project[2]), project[1], args.compact, not args.no_cache)
+    xml_path, file_count = exporter.export(path, None if args.quiet else print_progress)
+    if not args.quiet:
+        sys.stderr.write("\n")
+    if xml_path is None:
+        print("No published files found in this directory.")
+    else:
+        print(f"Exported {file_count} published files to {xml_path}")
+
+
+def cmd_reconcile(args):
+    project = find_project(args.project)
+    if project is None:
+        raise CLIError(f"Unknown project: {args.project}")
+    reconciler = AttributeReconciler(project[0], project[2], args.workers, args.processes)
+    divergences = reconciler.check()
+    for divergence in divergences:
+        print(f"{divergence['kind']}\t{divergence['path']}\t"
+              f"sidecar={divergence['sidecar']}\tdatabase={divergence['database']}")
+    print(f"{len(divergences)} divergences")
+    if args.repair and divergences:
+        print(f"Repaired {reconciler.repair(divergences)} rows")
+
+
+def cmd_create_projects(args):
+    try:
+        projects = load_project_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        raise CLIError(f"Cannot read manifest: {e}")
+    # Projects are owned by the --user account, or the admin account
+    creator = ProjectBatchCreator(find_user_id(args.user) or 1, args.workers)
+    results = creator.create(projects)
+    for result in results:
+        status = result["error"] or f"created {result['created']} items"
+        print(f"{result['name'] or '-'}\t{result['project_dir']}\t{result['seconds']:.2f}s\t{status}")
+    failed = sum(1 for result in results if result["error"])
+    print(f"{len(results) - failed} projects created, {failed} failed")
+    if failed:
+        raise CLIError(f"{failed} projects failed")
+
+
+def cmd_import_sidecars(args):
+    project = find_project(args.project)
+    if project is None:
+        raise CLIError(f"Unknown project: {args.project}")
+    importer = SidecarImporter(project[0], project[2], args.workers, not args.threads)
+    result = importer.run(None if args.quiet else print_import_progress)
+    if not args.quiet:
+        sys.stderr.write("\n")
+    for sidecar_path in result["corrupt"]:
+        print(f"unreadable\t{sidecar_path}")
+    print(f"Imported {result['files'] - len(result['corrupt'])} sidecars from {project[1]}: "
+          f"{result['new_history_entries']} new of {result['history_entries']} history entries, "
+          f"{len(result['corrupt'])} unreadable")
+    print(f"{result['seconds']:.2f} s ({result['scan_seconds']:.2f} s scanning), "
+          f"{result['files_per_second']:.0f} files/s")
+
+
+def print_import_progress(files_done, files_total):
+    sys.stderr.write(f"\rParsed {files_done} of {files_total} sidecars")
+    sys.stderr.flush()
+
+
+def cmd_index(args):
+    projects = list_projects()
+    if args.project is not None:
+        project = find_project(args.project)
+        if project is None:
+            raise CLIError(f"Unknown project: {args.project}")
+        projects = [project]
+    file_index = FileIndex()
+    for project_id, name, master_path, client_name, delivery_path in projects:
+        count = file_index.rebuild_project(project_id, name, master_path, AttributeManager(master_path))
+        print(f"{name}: {count} entries indexed")
+
+
+def cmd_search(args):
+    for result in FileIndex().search(args.text, args.limit):
+        status = fileman_core.status_text(result['publish'], result['to_client'])
+        print(f"{result['project']}\t{result['path']}\t{result['kind']}\t{status}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fileman", description="Fileman attribute, delivery and export tools")
+    parser.add_argument("--db", metavar="DIR",
+                        help="directory holding file_tree_manager.db and file_index.db (default: current directory)")
+    parser.add_argument("--user", default=getpass.getuser(), help="user recorded in the attribute history")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="collect metrics and write them to FILE (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--scan-workers", type=int, default=fileman_core.SCAN_WORKERS,
+                        help="directories listed concurrently when walking trees (1 walks serially)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sub = subparsers.add_parser("init-db", help="create the database with an admin user and a default project")
+    sub.set_defaults(func=cmd_init_db)
+    
+    sub = subparsers.add_parser("projects", help="list projects")
+    sub.set_defaults(func=cmd_projects)
+
+    sub = subparsers.add_parser("status", help="show publish and to client status")
+    sub.add_argument("paths", nargs="+")
+    sub.add_argument("--project", help="project name or id (default: found from the path)")
+    sub.set_defaults(func=cmd_status)
+
+    sub = subparsers.add_parser("publish", help="mark files or folders as published")
+    sub.add_argument("paths", nargs="+")
+    sub.add_argument("--unpublish", action="store_true", help="clear the publish status instead")
+    sub.add_argument("--project", help="project name or id (default: found from the path)")
+    sub.set_defaults(func=cmd_publish)
+
+    sub = subparsers.add_parser("mark-client", help="mark files or folders for client delivery")
+    sub.add_argument("paths", nargs="+")
+    sub.add_argument("--remove", action="store_true", help="clear the to client status instead")
+    sub.add_argument("--project", help="project name or id (default: found from the path)")
+    sub.set_defaults(func=cmd_mark_client)
+
+    sub = subparsers.add_parser("move", help="rename a file or folder and keep its attributes")
+    sub.add_argument("source")
+    sub.add_argument("dest")
+    sub.add_argument("--project", help="project name or id (default: found from the path)")
+    sub.set_defaults(func=cmd_move)
+    
+    sub = subparsers.add_parser("deliver", help="copy files marked for client to the delivery folder")
+    sub.add_argument("path")
+    sub.add_argument("--dry-run", action="store_true", help="list the files without copying them")
+    sub.add_argument("--project", help="project name or id (default: found from the path)")
+    sub.set_defaults(func=cmd_deliver)
+
+    sub = subparsers.add_parser("export", help="export published files as XML")
+    sub.add_argument("path")
+    sub.add_argument("--compact", action="store_true", help="write frame ranges instead of one element per frame")
+    sub.add_argument("--no-cache", action="store_true", help="rescan every folder instead of reusing the export cache")
+    sub.add_argument("--quiet", action="store_true", help="do not print progress")
+    sub.add_argument("--project", help="project name or id (default: found from the path)")
+    sub.set_defaults(func=cmd_export)
+
+    sub = subparsers.add_parser("reconcile", help="compare sidecars with the database")
+    sub.add_argument("project", help="project name or id")
+    sub.add_argument("--repair", action="store_true", help="make database rows match the sidecars")
+    sub.add_argument("--workers", type=int, default=8)
+    sub.add_argument("--processes", action="store_true", help="parse sidecars in worker processes")
+    sub.set_defaults(func=cmd_reconcile)
+
+    sub = subparsers.add_parser("create-projects", help="create the projects listed in a CSV or JSON manifest")
+    sub.add_argument("manifest",
+                     help="columns: name, master_path, client_name, delivery_date, template, shots, sequences, comment")
+    sub.add_argument("--workers", type=int, default=4, help="projects created at once")
+    sub.set_defaults(func=cmd_create_projects)
+
+    sub = subparsers.add_parser("import-sidecars", help="import the state and history of every sidecar of a project")
+    sub.add_argument("project", help="project name or id")
+    sub.add_argument("--workers", type=int, help="parser processes (default: one per CPU)")
+    sub.add_argument("--threads", action="store_true", help="parse sidecars in threads instead of processes")
+    sub.add_argument("--quiet", action="store_true", help="do not print progress")
+    sub.set_defaults(func=cmd_import_sidecars)
+    
+    sub = subparsers.add_parser("index", help="rebuild the file index")
+    sub.add_argument("--project", help="project name or id (default: all projects)")
+    sub.set_defaults(func=cmd_index)
+
+    sub = subparsers.add_parser("search", help="search the file index")
+    sub.add_argument("text")
+    sub.add_argument("--limit", type=int, default=500)
+    sub.set_defaults(func=cmd_search)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        fileman_core.set_db_dir(args.db)
+    fileman_core.SCAN_WORKERS = args.scan_workers
+    if args.metrics:
+        fileman_core.METRICS.enabled = True
+    try:
+        if args.func is not cmd_init_db:
+            open_database()
+        args.func(args)
+    except CLIError as e:
+        print(f"fileman: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.metrics:
+            fileman_core.METRICS.dump(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
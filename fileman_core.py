@@ -0,0 +1,3502 @@
+"""Filesystem helpers shared by Fileman features that do not need Qt"""
+import os
+import re
+import sys
+import csv
+import json
+import time
+import random
+import socket
+import contextlib
+import shutil
+import sqlite3
+import heapq
+import queue
+import hashlib
+import threading
+import functools
+import itertools
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Suffix of the JSON sidecar that stores attribute history next to a file
+SIDECAR_SUFFIX = ".attr.json"
+
+# Frame number right before the extension, e.g. beauty.0042.exr
+FRAME_PATTERN = re.compile(r'^(.*?)(\d+)(\.\w+)$')
+
+# Directories listed concurrently by tree walks. Listing is bound by
+# metadata latency (network storage) rather than CPU and the system calls
+# release the GIL, so threads scale; 1 walks serially.
+SCAN_WORKERS = 8
+PREFETCH_PER_WORKER = 16
+
+
+class NullTimer:
+    """Timer returned while metrics are disabled; does nothing"""
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc_info):
+        return False
+        
+        
+class MetricTimer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Process-wide counters and histograms for the hot paths
+    
+    Disabled by default (or enabled with FILEMAN_METRICS=1): every call then
+    returns after a single flag check, and timed() hands out a shared
+    no-op timer. Histograms use fixed cumulative buckets like Prometheus;
+    timings are in seconds. Safe to update from worker threads.
+    """
+    TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+    NULL_TIMER = NullTimer()
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            
+    def observe(self, name, value, buckets=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                bounds = tuple(buckets or self.TIME_BUCKETS)
+                histogram = self.histograms[name] = {
+                    "buckets": bounds, "counts": [0] * (len(bounds) + 1),
+                    "count": 0, "sum": 0.0, "max": 0.0
+                }
+            index = 0
+            bounds = histogram["buckets"]
+            while index < len(bounds) and value > bounds[index]:
+                index += 1
+            histogram["counts"][index] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+            if value > histogram["max"]:
+                histogram["max"] = value
+                
+    def timed(self, name):
+        """Context manager adding the duration of its block to histogram name"""
+        if not self.enabled:
+            return self.NULL_TIMER
+        return MetricTimer(self, name)
+        
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            
+    @staticmethod
+    def quantile(histogram, q):
+        """Estimate a quantile as the upper bound of the bucket holding it"""
+        if not histogram["count"]:
+            return 0.0
+        target = q * histogram["count"]
+        seen = 0
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            seen += count
+            if seen >= target:
+                return bound
+        return histogram["max"]
+        
+    def snapshot(self):
+        """Plain-data copy of all metrics, with mean, p50 and p95 per histogram"""
+        with self.lock:
+            histograms = {}
+            for name, histogram in self.histograms.items():
+                data = dict(histogram, buckets=list(histogram["buckets"]), counts=list(histogram["counts"]))
+                data["mean"] = histogram["sum"] / histogram["count"] if histogram["count"] else 0.0
+                data["p50"] = self.quantile(histogram, 0.5)
+                data["p95"] = self.quantile(histogram, 0.95)
+                histograms[name] = data
+            return {"time": datetime.now().isoformat(), "counters": dict(self.counters), "histograms": histograms}
+            
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE fileman_{name} counter")
+            lines.append(f"fileman_{name} {value}")
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE fileman_{name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines.append(f'fileman_{name}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'fileman_{name}_bucket{{le="+Inf"}} {histogram["count"]}')
+            lines.append(f"fileman_{name}_sum {histogram['sum']}")
+            lines.append(f"fileman_{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+        
+    def dump(self, path):
+        """Write the metrics to path: Prometheus text for .prom/.txt, JSON otherwise"""
+        if os.path.splitext(path)[1].lower() in (".prom", ".txt"):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2)
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+METRICS = Metrics(enabled=os.environ.get("FILEMAN_METRICS") == "1")
+
+
+def profile_to_speedscope(stats, name):
+    """Convert cProfile stats to a speedscope sampled profile (dict)
+    
+    cProfile records caller/callee pairs, not whole stacks, so stacks are
+    rebuilt from the roots down, splitting each function's time between
+    its callers in proportion to the time each edge accounts for.
+    """
+    stats = stats.stats
+    frames = []
+    frame_ids = {}
+    samples = []
+    weights = []
+    
+    def frame_id(func):
+        if func not in frame_ids:
+            filename, line, function = func
+            frame_ids[func] = len(frames)
+            frames.append({"name": function, "file": filename, "line": line})
+        return frame_ids[func]
+        
+    callees = {}
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+            
+    def walk(func, share, stack):
+        cc, nc, tt, ct, callers = stats[func]
+        stack = stack + [frame_id(func)]
+        if tt * share > 0:
+            samples.append(stack)
+            weights.append(tt * share)
+        if len(stack) > 200:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            total = stats[callee][3]
+            # Paths under 10 us are dropped so deep call graphs stay small
+            if total > 0 and share * edge_time >= 1e-5 and frame_ids.get(callee) not in stack:
+                walk(callee, share * edge_time / total, stack)
+                
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        if not callers:
+            walk(func, 1.0, [])
+            
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": name, "unit": "seconds",
+            "startValue": 0, "endValue": sum(weights),
+            "samples": samples, "weights": weights
+        }],
+        "name": name,
+        "exporter": "fileman"
+    }
+
+
+class ActionProfiler:
+    """Profiles user actions and saves the slow ones
+    
+    While enabled, each profile(action) block runs under cProfile. When it
+    takes at least threshold seconds, <time>_<action>_<ms>ms.prof (for
+    pstats/snakeviz) and a matching .speedscope.json are written to
+    output_dir. Nested actions are part of the outermost one; actions in
+    other threads get their own profile where the interpreter allows it.
+    """
+    def __init__(self, output_dir=None, threshold=0.5, enabled=False):
+        self.output_dir = output_dir or os.path.join(os.path.expanduser("~"), "FileTreeManager", "profiles")
+        self.threshold = threshold
+        self.enabled = enabled
+        self.local = threading.local()
+        self.saved = []
+        
+    def profile(self, action):
+        if not self.enabled or getattr(self.local, "active", False):
+            return Metrics.NULL_TIMER
+        return ProfiledAction(self, action)
+        
+    def save(self, action, profiler, elapsed):
+        import pstats
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{action}_{elapsed * 1000:.0f}ms"
+        base_path = os.path.join(self.output_dir, name)
+        profiler.dump_stats(base_path + ".prof")
+        with open(base_path + ".speedscope.json", 'w') as f:
+            json.dump(profile_to_speedscope(pstats.Stats(profiler), name), f)
+        self.saved.append(base_path + ".prof")
+        return base_path
+
+
+class ProfiledAction:
+    def __init__(self, action_profiler, action):
+        self.action_profiler = action_profiler
+        self.action = action
+        self.profiler = None
+        
+    def __enter__(self):
+        import cProfile
+        self.action_profiler.local.active = True
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler is running (Python 3.12+ allows only one)
+            self.profiler = None
+        self.start = time.perf_counter()
+        return self
+        
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.action_profiler.local.active = False
+        if self.profiler is None:
+            return False
+        self.profiler.disable()
+        if elapsed >= self.action_profiler.threshold:
+            try:
+                self.action_profiler.save(self.action, self.profiler, elapsed)
+            except OSError:
+                pass  # Never let profiling break the action itself
+        return False
+
+
+PROFILER = ActionProfiler()
+
+
+def profiled(action):
+    """Decorator running a function as a profiled user action"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with PROFILER.profile(action):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def scan_directory(path):
+    """List a directory once with os.scandir
+
+    Returns (dirs, files, sidecars): DirEntry lists for sub-directories and
+    files (sidecars excluded) and the set of entry names that have a sidecar.
+    """
+    dirs = []
+    files = []
+    sidecar_names = []
+    with METRICS.timed("fs_scandir_seconds"), os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if name.endswith(SIDECAR_SUFFIX):
+                sidecar_names.append(name[:-len(SIDECAR_SUFFIX)])
+                continue
+            if name == SIDECAR_LOCK_NAME:
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirs.append(entry)
+            else:
+                files.append(entry)
+    return dirs, files, set(sidecar_names)
+
+
+def walk_tree(top, visit, children, workers=None):
+    """Walk a tree top-down, visiting directories concurrently
+    
+    visit(dir_path) runs in a thread pool and returns a result for the
+    directory; children(dir_path, result) gives the sub-directory paths to
+    descend into. Yields (dir_path, result) in the same pre-order as a
+    serial walk, whatever the number of workers, so output built from it
+    is deterministic. Directories for which visit raises OSError are
+    skipped.
+    
+    Sub-directories are queued as soon as their parent has been visited,
+    not when the consumer gets to it, so deep or slow branches do not
+    serialize the walk. Queued directories are handed to the workers in
+    walk order, so the ones the consumer needs next never wait behind work
+    far ahead, and at most PREFETCH_PER_WORKER results per worker are held
+    ahead of the consumer. children is called again once the consumer has
+    handled a directory, so the consumer may still prune the walk; work
+    queued for pruned branches is dropped.
+    """
+    if workers is None:
+        workers = SCAN_WORKERS
+    stack = [top]
+    if workers <= 1:
+        while stack:
+            dir_path = stack.pop()
+            try:
+                result = visit(dir_path)
+            except OSError:
+                continue
+            yield dir_path, result
+            # Reversed so sub-directories are visited in listing order
+            stack.extend(reversed(children(dir_path, result)))
+        return
+        
+    limit = workers * PREFETCH_PER_WORKER
+    # Walk order of a directory is the tuple of sibling indices leading to
+    # it, so comparing keys compares positions in the pre-order walk
+    keys = {top: ()}
+    candidates = [((), top)]  # heap of directories found but not submitted
+    pending = {}              # path -> future, visited ahead of the consumer
+    found = {}                # path -> sub-directories found from its result
+    finished = queue.SimpleQueue()
+    running = [0]
+    
+    def submit(path):
+        future = executor.submit(visit, path)
+        pending[path] = future
+        running[0] += 1
+        future.add_done_callback(lambda future, path=path: finished.put((path, future)))
+        return future
+        
+    def fill(block=False):
+        # Expand what finished, then top up the workers in walk order
+        try:
+            path, future = finished.get(block)
+            while True:
+                running[0] -= 1
+                if pending.get(path) is future and not future.cancelled() and future.exception() is None:
+                    found[path] = children(path, future.result())
+                    for index, child in enumerate(found[path]):
+                        keys[child] = keys[path] + (index,)
+                        heapq.heappush(candidates, (keys[child], child))
+                path, future = finished.get_nowait()
+        except queue.Empty:
+            pass
+        while candidates and running[0] < workers * 2 and len(pending) < limit:
+            key, path = heapq.heappop(candidates)
+            if path in keys and path not in pending:
+                submit(path)
+                
+    def drop(path):
+        keys.pop(path, None)
+        future = pending.pop(path, None)
+        if future is not None:
+            future.cancel()
+        for child in found.pop(path, ()):
+            drop(child)
+            
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while stack:
+                dir_path = stack.pop()
+                fill()
+                future = pending.get(dir_path) or submit(dir_path)
+                while not future.done():
+                    fill(block=True)
+                del pending[dir_path]
+                
+                try:
+                    result = future.result()
+                except OSError:
+                    keys.pop(dir_path, None)
+                    continue
+                yield dir_path, result
+                subdirs = children(dir_path, result)
+                # Drop work queued for branches the consumer pruned
+                wanted = set(subdirs)
+                for child in found.pop(dir_path, ()):
+                    if child not in wanted:
+                        drop(child)
+                for index, child in enumerate(subdirs):
+                    keys.setdefault(child, keys[dir_path] + (index,))
+                keys.pop(dir_path)
+                # Reversed so sub-directories are visited in listing order
+                stack.extend(reversed(subdirs))
+        finally:
+            # Stopped early (cancelled or error): drop queued work
+            for future in pending.values():
+                future.cancel()
+
+
+def scan_tree(top, workers=None):
+    """Walk a tree top-down in a single scandir pass per directory
+
+    Yields (dir_path, dirs, files, sidecars) like os.walk, but with DirEntry
+    objects whose stat() result is cached, and the set of names in dir_path
+    that have a sidecar. Removing entries from dirs prunes the walk.
+    Symlinked directories are listed but not descended into, and unreadable
+    directories are skipped, as with os.walk. Directories are listed by
+    walk_tree with the given number of workers.
+    """
+    def children(dir_path, result):
+        return [entry.path for entry in result[0] if not entry.is_symlink()]
+        
+    for dir_path, (dirs, files, sidecars) in walk_tree(top, scan_directory, children, workers):
+        yield dir_path, dirs, files, sidecars
+
+
+class FileSequence:
+    """Files of one directory sharing prefix, frame padding and extension
+    
+    Files without a frame number become a sequence of their own with
+    padding and extension set to None.
+    """
+    def __init__(self, directory, prefix, padding, extension):
+        self.directory = directory
+        self.prefix = prefix
+        self.padding = padding
+        self.extension = extension
+        self.files = []  # (frame, digits, entry)
+        
+    @property
+    def is_sequence(self):
+        return self.extension is not None
+        
+    @property
+    def pattern(self):
+        """printf-style file pattern, e.g. beauty.%04d.exr"""
+        if not self.is_sequence:
+            return self.prefix
+        number = f"%0{self.padding}d" if self.padding else "%d"
+        return f"{self.prefix}{number}{self.extension}"
+        
+    def add(self, frame, digits, entry):
+        self.files.append((frame, digits, entry))
+        
+    def sorted_files(self):
+        return sorted(self.files, key=lambda f: (f[0] is None, f[0], f[2].name))
+        
+    def frames(self):
+        return sorted({frame for frame, _, _ in self.files if frame is not None})
+        
+    def ranges(self):
+        """Contiguous (start, end) frame runs"""
+        ranges = []
+        for frame in self.frames():
+            if ranges and frame == ranges[-1][1] + 1:
+                ranges[-1][1] = frame
+            else:
+                ranges.append([frame, frame])
+        return [tuple(r) for r in ranges]
+        
+    def gaps(self):
+        """Missing (start, end) frame runs between the first and last frame"""
+        ranges = self.ranges()
+        return [(prev[1] + 1, cur[0] - 1) for prev, cur in zip(ranges, ranges[1:])]
+
+
+def format_frame_ranges(ranges):
+    """Format (start, end) runs as 1-10,12,20-30"""
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def detect_sequences(entries):
+    """Group file entries into FileSequences, in first-seen order
+    
+    Sequences are keyed by directory, prefix, padding and extension, so
+    same-named renders in different shots stay apart. A frame with a
+    leading zero sets the padding to its width; frames without one join
+    the widest padding they fit in (beauty.0999 and beauty.1000 are one
+    sequence), otherwise they are unpadded.
+    """
+    parsed = []
+    padded_widths = {}
+    for entry in entries:
+        directory = os.path.dirname(entry.path)
+        match = FRAME_PATTERN.match(entry.name)
+        if not match:
+            parsed.append(((directory, entry.name, None, None), None, None, entry))
+            continue
+        prefix, digits, extension = match.groups()
+        group = (directory, prefix, extension)
+        if len(digits) > 1 and digits.startswith('0'):
+            padded_widths.setdefault(group, set()).add(len(digits))
+        parsed.append((group, int(digits), digits, entry))
+        
+    sequences = {}
+    for group, frame, digits, entry in parsed:
+        if frame is None:
+            key = group
+        elif len(digits) > 1 and digits.startswith('0'):
+            key = group + (len(digits),)
+        else:
+            widths = [w for w in padded_widths.get(group, ()) if w <= len(digits)]
+            key = group + (max(widths) if widths else 0,)
+        if key not in sequences:
+            directory, prefix = key[0], key[1]
+            if frame is None:
+                sequences[key] = FileSequence(directory, prefix, None, None)
+            else:
+                sequences[key] = FileSequence(directory, prefix, key[3], key[2])
+        sequences[key].add(frame, digits, entry)
+    return list(sequences.values())
+
+
+def sequence_to_element(sequence, compact=False):
+    """Build the <Sequence> element of the published XML export
+    
+    The default mode lists one <File> per frame. Compact mode describes a
+    frame sequence with its pattern, totals and one <Range> per contiguous
+    run, so element count grows with gaps rather than frames.
+    """
+    seq_elem = ET.Element("Sequence")
+    seq_elem.set("name", sequence.prefix)
+    seq_elem.set("directory", sequence.directory)
+    
+    if compact and sequence.is_sequence:
+        stats = [entry.stat() for _, _, entry in sequence.files]
+        ranges = sequence.ranges()
+        seq_elem.set("pattern", sequence.pattern)
+        seq_elem.set("start", str(ranges[0][0]))
+        seq_elem.set("end", str(ranges[-1][1]))
+        seq_elem.set("count", str(len(sequence.files)))
+        seq_elem.set("size", str(sum(st.st_size for st in stats)))
+        seq_elem.set("modified", datetime.fromtimestamp(max(st.st_mtime for st in stats)).isoformat())
+        gaps = sequence.gaps()
+        if gaps:
+            seq_elem.set("gaps", format_frame_ranges(gaps))
+        for start, end in ranges:
+            range_elem = ET.SubElement(seq_elem, "Range")
+            range_elem.set("start", str(start))
+            range_elem.set("end", str(end))
+        return seq_elem
+        
+    for frame, digits, entry in sequence.sorted_files():
+        stat = entry.stat()
+        file_elem = ET.SubElement(seq_elem, "File")
+        file_elem.set("name", entry.name)
+        if digits:
+            file_elem.set("frame", digits)
+        file_elem.set("path", entry.path)
+        file_elem.set("size", str(stat.st_size))
+        file_elem.set("modified", datetime.fromtimestamp(stat.st_mtime).isoformat())
+    return seq_elem
+
+
+class StreamingXMLWriter:
+    """Write an XML document one child element at a time
+    
+    Each child is serialized with ElementTree as soon as it is complete, so
+    the output is byte-identical to ElementTree.write() of the whole tree
+    while only one subtree is held in memory. The document is streamed to a
+    temp file next to path and only replaces path once closed, so an
+    aborted document leaves any previous one in place.
+    """
+    def __init__(self, path, root):
+        self.path = path
+        self.tmp_path = os.path.join(os.path.dirname(path),
+                                     f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self.closing = f"</{root.tag}>"
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', errors='xmlcharrefreplace')
+        self.file.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        opening = ET.tostring(root, encoding='unicode', short_empty_elements=False)
+        self.file.write(opening[:-len(self.closing)])
+        
+    def write(self, elem):
+        self.file.write(ET.tostring(elem, encoding='unicode'))
+        
+    def close(self):
+        self.file.write(self.closing)
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        
+    def abort(self):
+        """Close and delete a partially written document, keeping the previous one"""
+        self.file.close()
+        os.remove(self.tmp_path)
+
+
+class CachedEntry:
+    """DirEntry stand-in for a file remembered by the export cache"""
+    __slots__ = ('path', 'name', 'st_size', 'st_mtime')
+    
+    def __init__(self, directory, name, size, mtime):
+        self.path = os.path.join(directory, name)
+        self.name = name
+        self.st_size = size
+        self.st_mtime = mtime
+        
+    def stat(self):
+        return self
+
+
+class PublishedExporter:
+    """Export the published files under a directory as published_sequence.xml
+    
+    The XML is streamed to disk directory by directory while the tree is
+    walked. Sequences never span directories, so each directory's sequences
+    are complete once it has been listed.
+    
+    With use_cache, the published files found in each directory are saved
+    next to the XML together with the directory and sidecar mtimes. The next
+    export only lists directories whose mtime changed or whose sidecars were
+    rewritten, and reuses the cached results for the rest. A file rewritten
+    in place without touching its directory keeps its cached size and mtime
+    until the directory changes; pass use_cache=False for a full rescan.
+    
+    The cache holds a header line and then one line per directory. Records
+    are appended to a temp file as the walk goes, and the previous cache is
+    only indexed by directory (line offsets), so memory does not grow with
+    the number of published files.
+    """
+    XML_NAME = "published_sequence.xml"
+    CACHE_NAME = "published_sequence.xml.cache.json"
+    CACHE_VERSION = 2
+    # Timestamps this close to the scan may still change within the same
+    # mtime tick, so they are never trusted by the next export
+    RACY_SECONDS = 2.0
+    
+    def __init__(self, attribute_manager, project_name, compact=False, use_cache=True):
+        self.attribute_manager = attribute_manager
+        self.project_name = project_name
+        self.compact = compact
+        self.use_cache = use_cache
+        self.cache_file = None
+        self.previous_file = None
+        self.previous_lock = threading.Lock()
+        self.publish_root = False
+        self.rescanned_dirs = 0
+        self.cached_dirs = 0
+        self.files_matched = 0
+        self.progress_callback = None
+        self.cancelled = False
+        
+    def cancel(self):
+        """Stop a running export; safe to call from another thread"""
+        self.cancelled = True
+        
+    def load_cache(self, dir_path, publish_root):
+        """Return {rel_dir: line offset} of the previous export's records, if usable"""
+        try:
+            f = open(os.path.join(dir_path, self.CACHE_NAME), 'rb')
+        except OSError:
+            return {}
+        offsets = {}
+        try:
+            header = json.loads(f.readline())
+            if (not isinstance(header, dict) or header.get("version") != self.CACHE_VERSION
+                    or header.get("root") != dir_path or header.get("publish_root") != publish_root):
+                f.close()
+                return {}
+            offset = f.tell()
+            for line in f:
+                # Each line is the JSON directory name, a tab and the JSON record
+                offsets[json.loads(line[:line.index(b"\t")])] = offset
+                offset += len(line)
+        except ValueError:
+            f.close()
+            return {}
+        self.previous_file = f
+        return offsets
+    
+    def read_record(self, offset):
+        """Read back one directory record of the previous export"""
+        with self.previous_lock:
+            self.previous_file.seek(offset)
+            line = self.previous_file.readline()
+        try:
+            return json.loads(line[line.index(b"\t") + 1:])
+        except ValueError:
+            return None
+    
+    def open_cache(self, dir_path, publish_root):
+        """Start the new cache in a temp file next to the XML"""
+        self.cache_path = os.path.join(dir_path, self.CACHE_NAME)
+        self.cache_tmp_path = os.path.join(dir_path, f".{self.CACHE_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self.cache_file = open(self.cache_tmp_path, 'wb')
+        self.cache_file.write(json.dumps({
+            "version": self.CACHE_VERSION,
+            "root": dir_path,
+            "publish_root": publish_root
+        }).encode() + b"\n")
+    
+    def write_record(self, rel_dir, record):
+        self.cache_file.write(json.dumps(rel_dir).encode() + b"\t" + json.dumps(record).encode() + b"\n")
+    
+    def close_cache(self, save):
+        """Replace the previous cache with the new one (save) or drop the new one"""
+        if self.previous_file is not None:
+            self.previous_file.close()
+            self.previous_file = None
+        if self.cache_file is None:
+            return
+        self.cache_file.close()
+        self.cache_file = None
+        if save:
+            os.replace(self.cache_tmp_path, self.cache_path)
+        else:
+            try:
+                os.remove(self.cache_tmp_path)
+            except FileNotFoundError:
+                pass
+        
+    def stable_mtime(self, stat, now):
+        if now - stat.st_mtime < self.RACY_SECONDS:
+            return None
+        return stat.st_mtime_ns
+        
+    def reuse_record(self, current_dir, record):
+        """Return the cached record if neither the directory nor its sidecars changed"""
+        try:
+            if record["mtime"] is None or os.stat(current_dir).st_mtime_ns != record["mtime"]:
+                return None
+            for name, mtime in record["sidecars"].items():
+                if mtime is None or os.stat(os.path.join(current_dir, name + SIDECAR_SUFFIX)).st_mtime_ns != mtime:
+                    return None
+        except OSError:
+            return None
+        return record
+        
+    def scan_record(self, current_dir, dir_path, publish_root):
+        """List a directory and return its published entries and cache record"""
+        now = time.time()
+        dir_stat = os.stat(current_dir)
+        dirs, files, sidecars = scan_directory(current_dir)
+        
+        sidecar_mtimes = {}
+        for name in sidecars:
+            try:
+                sidecar_stat = os.stat(os.path.join(current_dir, name + SIDECAR_SUFFIX))
+            except OSError:
+                continue
+            sidecar_mtimes[name] = self.stable_mtime(sidecar_stat, now)
+            
+        published_files = []
+        for entry in files:
+            if entry.name.endswith('.json'):
+                continue  # Skip .json files
+            if current_dir == dir_path and (entry.name == self.XML_NAME
+                                            or entry.name.startswith(f".{self.XML_NAME}.")):
+                continue  # Skip the export being written and its temp files
+                
+            # If the exported directory is published, include all files
+            if publish_root:
+                published_files.append(entry)
+            elif entry.name in sidecars:
+                # Check if individual file is published
+                file_publish_status, _, _ = self.attribute_manager.get_current_status(entry.path, "publish")
+                if file_publish_status:
+                    published_files.append(entry)
+            
+        record = {
+            "mtime": self.stable_mtime(dir_stat, now),
+            "sidecars": sidecar_mtimes,
+            "subdirs": [entry.name for entry in dirs if not entry.is_symlink()],
+            "files": [[entry.name, entry.stat().st_size, entry.stat().st_mtime] for entry in published_files]
+        }
+        return published_files, record
+        
+    def iter_published(self, dir_path):
+        """Yield the published file entries of each directory under dir_path"""
+        publish_root, _, _ = self.attribute_manager.get_current_status(dir_path, "publish")
+        self.publish_root = publish_root
+        previous = self.load_cache(dir_path, publish_root) if self.use_cache else {}
+        if self.use_cache:
+            self.open_cache(dir_path, publish_root)
+        self.rescanned_dirs = 0
+        self.cached_dirs = 0
+        self.files_matched = 0
+        
+        def visit(current_dir):
+            if self.cancelled:
+                return None
+            offset = previous.get(os.path.relpath(current_dir, dir_path))
+            record = None if offset is None else self.read_record(offset)
+            if record is not None:
+                record = self.reuse_record(current_dir, record)
+            if record is not None:
+                return [CachedEntry(current_dir, *info) for info in record["files"]], record, True
+            # Unreadable directories raise OSError and are skipped
+            published_files, record = self.scan_record(current_dir, dir_path, publish_root)
+            return published_files, record, False
+            
+        def children(current_dir, result):
+            if result is None:
+                return []
+            return [os.path.join(current_dir, name) for name in result[1]["subdirs"]]
+            
+        for current_dir, result in walk_tree(dir_path, visit, children):
+            if self.cancelled:
+                return
+            published_files, record, cached = result
+            if cached:
+                self.cached_dirs += 1
+            else:
+                self.rescanned_dirs += 1
+            if self.cache_file is not None:
+                self.write_record(os.path.relpath(current_dir, dir_path), record)
+            self.files_matched += len(published_files)
+            if self.progress_callback:
+                self.progress_callback(self.rescanned_dirs + self.cached_dirs, self.files_matched)
+            if published_files:
+                yield published_files
+        
+    def export(self, dir_path, progress_callback=None):
+        """Write the XML and return (xml_path, file_count)
+        
+        progress_callback(dirs_scanned, files_matched) is called after each
+        directory. When no published file is found or the export is
+        cancelled, nothing is written and an existing XML is kept.
+        """
+        self.progress_callback = progress_callback
+        root = ET.Element("FileSequence")
+        root.set("version", "1.0")
+        root.set("exportDate", datetime.now().isoformat())
+        root.set("project", self.project_name)
+        if self.compact:
+            root.set("mode", "compact")
+            
+        xml_path = os.path.join(dir_path, self.XML_NAME)
+        writer = StreamingXMLWriter(xml_path, root)
+        file_count = 0
+        try:
+            for published_files in self.iter_published(dir_path):
+                file_count += len(published_files)
+                for sequence in detect_sequences(published_files):
+                    writer.write(sequence_to_element(sequence, self.compact))
+        except BaseException:
+            writer.abort()
+            self.close_cache(False)
+            raise
+            
+        if not file_count or self.cancelled:
+            writer.abort()
+            self.close_cache(False)
+            return None, 0
+        writer.close()
+        self.close_cache(True)
+        return xml_path, file_count
+
+
+# Main database with users, projects and file attributes
+DB_PATH = 'file_tree_manager.db'
+
+# File index database, kept apart from file_tree_manager.db so that large
+# index writes never hold the lock that attribute updates need
+INDEX_DB_PATH = 'file_index.db'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times every statement into db_query_seconds"""
+    def execute(self, *args):
+        with METRICS.timed("db_query_seconds"):
+            return super().execute(*args)
+            
+    def executemany(self, *args):
+        with METRICS.timed("db_query_seconds"):
+            return super().executemany(*args)
+            
+    def executescript(self, *args):
+        with METRICS.timed("db_query_seconds"):
+            return super().executescript(*args)
+            
+            
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including implicit ones, are InstrumentedCursors"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+        
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+        
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+        
+    def executescript(self, *args):
+        return self.cursor().executescript(*args)
+
+
+def connect_db(db_path=None):
+    """Open a database (the main one by default), timed when metrics are on"""
+    if not METRICS.enabled:
+        return sqlite3.connect(db_path or DB_PATH)
+    with METRICS.timed("db_connect_seconds"):
+        return sqlite3.connect(db_path or DB_PATH, factory=InstrumentedConnection)
+
+
+def set_db_dir(directory):
+    """Use the databases in another directory (e.g. a shared one from the CLI)"""
+    global DB_PATH, INDEX_DB_PATH
+    DB_PATH = os.path.join(directory, 'file_tree_manager.db')
+    INDEX_DB_PATH = os.path.join(directory, 'file_index.db')
+
+
+def init_db(create_defaults=True):
+    """Create the main database tables, default admin user and default project
+    
+    With create_defaults=False only missing tables are added, so an
+    existing database is brought up to date without new rows or folders.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    
+    # Users table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Projects table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        master_path TEXT NOT NULL,
+        client_name TEXT NOT NULL,
+        delivery_path TEXT NOT NULL,
+        project_comment TEXT DEFAULT '',
+        delivery_date TEXT DEFAULT '',
+        created_by INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users (id)
+    )
+    ''')
+    
+    # File attributes table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS file_attributes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        publish_status BOOLEAN DEFAULT FALSE,
+        to_client_status BOOLEAN DEFAULT FALSE,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects (id),
+        UNIQUE(project_id, file_path)
+    )
+    ''')
+    
+    # Every history entry of every sidecar, for queries across projects
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS attribute_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        attribute TEXT NOT NULL,
+        status BOOLEAN NOT NULL,
+        timestamp TEXT NOT NULL DEFAULT '',
+        user TEXT NOT NULL DEFAULT '',
+        FOREIGN KEY (project_id) REFERENCES projects (id),
+        UNIQUE(project_id, file_path, attribute, timestamp, user)
+    )
+    ''')
+    
+    # Attribute and project changes, followed by other instances (ChangeLog)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL DEFAULT '',
+        attribute TEXT NOT NULL,
+        value TEXT,
+        user TEXT,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    if not create_defaults:
+        conn.commit()
+        conn.close()
+        return
+    
+    # Default admin user if not exists
+    cursor.execute("SELECT COUNT(*) FROM users")
+    if cursor.fetchone()[0] == 0:
+        password_hash = hashlib.sha256("admin123".encode()).hexdigest()
+        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", 
+                      ("admin", password_hash))
+    
+    # Create a default project if none exists
+    cursor.execute("SELECT COUNT(*) FROM projects")
+    if cursor.fetchone()[0] == 0:
+        # Create default directories
+        home_dir = os.path.expanduser("~")
+        default_master = os.path.join(home_dir, "FileTreeManager", "DefaultProject")
+        default_delivery = os.path.join(home_dir, "FileTreeManager", "Deliveries")
+        
+        os.makedirs(default_master, exist_ok=True)
+        os.makedirs(default_delivery, exist_ok=True)
+        
+        # Add a sample file
+        with open(os.path.join(default_master, "sample.txt"), "w") as f:
+            f.write("This is a sample file for the default project.")
+        
+        cursor.execute(
+            "INSERT INTO projects (name, master_path, client_name, delivery_path, created_by) VALUES (?, ?, ?, ?, ?)",
+            ("Default Project", default_master, "Default Client", default_delivery, 1)
+        )
+    
+    conn.commit()
+    conn.close()
+
+
+# Change log rows kept for instances catching up
+CHANGE_LOG_SIZE = 10000
+
+
+def log_change(cursor, project_id, file_path, attribute, value, user=None):
+    """Record a change for other instances; file_path is '' for project fields
+    
+    Call it in the transaction making the change, so the row is committed
+    with it.
+    """
+    cursor.execute("INSERT INTO change_log (project_id, file_path, attribute, value, user) VALUES (?, ?, ?, ?, ?)",
+                   (project_id, file_path, attribute, value, user))
+    # Trim old rows now and then rather than on every change
+    if cursor.lastrowid % 100 == 0:
+        cursor.execute("DELETE FROM change_log WHERE id <= ?", (cursor.lastrowid - CHANGE_LOG_SIZE,))
+
+
+class ChangeLog:
+    """Follows the change_log rows committed by other connections
+    
+    PRAGMA data_version only moves when another connection commits, so
+    poll() costs a single pragma on the open connection while nothing
+    changes. Rows are (id, project_id, file_path, attribute, value, user).
+    """
+    def __init__(self, db_path=None):
+        self.conn = connect_db(db_path)
+        self.data_version = None
+        self.last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+    
+    def poll(self):
+        """Rows committed since the last poll"""
+        try:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self.data_version:
+                return []
+            rows = self.conn.execute(
+                "SELECT id, project_id, file_path, attribute, value, user FROM change_log WHERE id > ? ORDER BY id",
+                (self.last_id,)).fetchall()
+        except sqlite3.OperationalError:
+            return []  # Locked by a writer; the version is unchanged, so the next poll retries
+        self.data_version = version
+        if rows:
+            self.last_id = rows[-1][0]
+        return rows
+    
+    def close(self):
+        self.conn.close()
+
+
+def file_kind(name, is_dir):
+    """Type shown and searched in the file index: 'folder' or the extension"""
+    if is_dir:
+        return "folder"
+    return os.path.splitext(name)[1][1:].lower()
+
+
+def status_text(publish_status, to_client_status):
+    """Searchable text for the attribute columns of the file index"""
+    status = []
+    if publish_status:
+        status.append("published")
+    if to_client_status:
+        status.append("to client")
+    return " ".join(status)
+
+
+class FileIndex:
+    """Persistent per-project index of files and attributes with FTS5 search
+    
+    indexed_files holds one row per file or folder (path relative to the
+    project master path, parent folder, size, mtime, inode, type and current
+    attribute status), and indexed_dirs the mtime of every indexed folder so
+    that changed folders can be found without listing the tree again.
+    file_search is an FTS5 table sharing the indexed_files rowids, over the
+    path, project name, type and status text. It uses the trigram tokenizer
+    where SQLite supports it, so "040" finds SH040 and Shot_040 alike.
+    """
+    BATCH_SIZE = 5000
+    # Bumped when the schema changes; the index is a cache, so older
+    # layouts are dropped and rebuilt rather than migrated
+    SCHEMA_VERSION = 2
+    STATUS_COLUMNS = {"publish": "publish_status", "to_client": "to_client_status"}
+    STATUS_BUSY_TIMEOUT_MS = 200
+    
+    def __init__(self, db_path=None):
+        self.db_path = db_path or INDEX_DB_PATH
+        self.trigram = True
+        self.cancelled = False
+        self.init_db()
+        
+    def connect(self):
+        conn = connect_db(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+        
+    def init_db(self):
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] < self.SCHEMA_VERSION:
+            for table in ("indexed_projects", "indexed_files", "indexed_dirs", "file_search"):
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indexed_projects (
+            project_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            master_path TEXT NOT NULL,
+            indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indexed_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            rel_path TEXT NOT NULL,
+            parent TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            is_dir BOOLEAN DEFAULT FALSE,
+            size INTEGER DEFAULT 0,
+            mtime REAL DEFAULT 0,
+            inode INTEGER DEFAULT 0,
+            publish_status BOOLEAN DEFAULT FALSE,
+            to_client_status BOOLEAN DEFAULT FALSE,
+            UNIQUE(project_id, rel_path)
+        )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS indexed_files_parent ON indexed_files (project_id, parent)")
+        # Partial indexes holding only the set rows, for the attribute filters
+        for column in self.STATUS_COLUMNS.values():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS indexed_files_{column} ON indexed_files (project_id) "
+                           f"WHERE {column}")
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indexed_dirs (
+            project_id INTEGER NOT NULL,
+            rel_path TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            PRIMARY KEY (project_id, rel_path)
+        )
+        ''')
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS file_search
+            USING fts5(path, project, kind, status, tokenize='trigram')
+            ''')
+        except sqlite3.OperationalError:
+            # SQLite older than 3.34 has no trigram tokenizer
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS file_search
+            USING fts5(path, project, kind, status)
+            ''')
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'file_search'")
+        self.trigram = "trigram" in cursor.fetchone()[0]
+        conn.commit()
+        conn.close()
+        
+    def cancel(self):
+        """Stop a running rebuild; safe to call from another thread"""
+        self.cancelled = True
+        
+    def indexed_project_ids(self):
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT project_id FROM indexed_projects")
+        project_ids = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return project_ids
+        
+    @staticmethod
+    def subtree_clause(column, rel_path):
+        """SQL condition and parameters matching rel_path and everything below it
+        
+        Uses a range on the path instead of LIKE, which would treat the
+        underscores common in our folder names as wildcards.
+        """
+        if rel_path == '.':
+            return "1", []
+        prefix = rel_path + os.sep
+        return (f"({column} = ? OR ({column} >= ? AND {column} < ?))",
+                [rel_path, prefix, rel_path + chr(ord(os.sep) + 1)])
+        
+    def iter_records(self, master_path, attribute_manager, top, dir_mtimes):
+        """Yield indexed_files rows for every file and folder below top
+        
+        The mtime of every folder walked, top included, is appended to
+        dir_mtimes as (rel_path, mtime_ns).
+        """
+        dir_mtimes.append((os.path.relpath(top, master_path), os.stat(top).st_mtime_ns))
+        
+        def visit(current_dir):
+            # Runs in the walk's worker threads: list, stat and read sidecars
+            if self.cancelled:
+                return [], [], []
+            dirs, files, sidecars = scan_directory(current_dir)
+            parent = os.path.relpath(current_dir, master_path)
+            records = []
+            folder_mtimes = []
+            for is_dir, entries in ((True, dirs), (False, files)):
+                for entry in entries:
+                    if entry.name.endswith('.json'):
+                        continue  # Skip .json files
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    rel_path = os.path.relpath(entry.path, master_path)
+                    if is_dir:
+                        folder_mtimes.append((rel_path, stat.st_mtime_ns))
+                    publish_status = to_client_status = False
+                    if entry.name in sidecars:
+                        publish_status, to_client_status = self.read_status(attribute_manager, entry.path)
+                    records.append((rel_path, parent, file_kind(entry.name, is_dir), is_dir,
+                                    0 if is_dir else stat.st_size, stat.st_mtime, entry.inode(),
+                                    publish_status, to_client_status))
+            subdirs = [entry.path for entry in dirs if not entry.is_symlink()]
+            return records, folder_mtimes, subdirs
+            
+        for current_dir, (records, folder_mtimes, subdirs) in walk_tree(top, visit, lambda path, result: result[2]):
+            if self.cancelled:
+                return
+            dir_mtimes.extend(folder_mtimes)
+            yield from records
+        
+    @staticmethod
+    def read_status(attribute_manager, path):
+        return (bool(attribute_manager.get_current_status(path, "publish")[0]),
+                bool(attribute_manager.get_current_status(path, "to_client")[0]))
+        
+    def index_subtree(self, cursor, project_id, master_path, top, attribute_manager, progress_callback=None,
+                      tables=("indexed_files", "indexed_dirs")):
+        """Insert rows for top and everything below it into tables; returns the row count"""
+        files_table, dirs_table = tables
+        count = 0
+        batch = []
+        dir_mtimes = []
+        for record in self.iter_records(master_path, attribute_manager, top, dir_mtimes):
+            batch.append((project_id,) + record)
+            if len(batch) >= self.BATCH_SIZE:
+                self.insert_records(cursor, batch, files_table)
+                count += len(batch)
+                batch = []
+                if progress_callback:
+                    progress_callback(count)
+        self.insert_records(cursor, batch, files_table)
+        cursor.executemany(f"INSERT OR REPLACE INTO {dirs_table} (project_id, rel_path, mtime_ns) VALUES (?, ?, ?)",
+                           [(project_id, rel_path, mtime_ns) for rel_path, mtime_ns in dir_mtimes])
+        return count + len(batch)
+        
+    def rebuild_project(self, project_id, project_name, master_path, attribute_manager, progress_callback=None):
+        """Replace the index of one project with a fresh walk of its master path
+        
+        progress_callback(files_indexed) is called after each batch. Returns
+        the number of indexed entries, or None if the rebuild was cancelled.
+        
+        The walk fills temp tables of this connection, which hold no lock
+        on the index, so attribute updates and syncs keep writing to it.
+        Only the swap of the new rows for the old ones is one transaction.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+            CREATE TEMP TABLE rebuild_files (
+                project_id INTEGER, rel_path TEXT, parent TEXT, kind TEXT, is_dir BOOLEAN, size INTEGER,
+                mtime REAL, inode INTEGER, publish_status BOOLEAN, to_client_status BOOLEAN,
+                UNIQUE (project_id, rel_path)
+            )
+            ''')
+            cursor.execute('''
+            CREATE TEMP TABLE rebuild_dirs (
+                project_id INTEGER, rel_path TEXT, mtime_ns INTEGER, PRIMARY KEY (project_id, rel_path)
+            )
+            ''')
+            count = self.index_subtree(cursor, project_id, master_path, master_path, attribute_manager,
+                                       progress_callback, ("temp.rebuild_files", "temp.rebuild_dirs"))
+            if self.cancelled:
+                conn.rollback()
+                return None
+            conn.commit()
+            
+            with METRICS.timed("index_swap_seconds"):
+                cursor.execute("DELETE FROM file_search WHERE rowid IN "
+                               "(SELECT id FROM indexed_files WHERE project_id = ?)", (project_id,))
+                cursor.execute("DELETE FROM indexed_files WHERE project_id = ?", (project_id,))
+                cursor.execute("DELETE FROM indexed_dirs WHERE project_id = ?", (project_id,))
+                cursor.execute('''
+                INSERT OR REPLACE INTO indexed_projects (project_id, name, master_path, indexed_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (project_id, project_name, master_path))
+                cursor.execute('''
+                INSERT OR REPLACE INTO indexed_files
+                (project_id, rel_path, parent, kind, is_dir, size, mtime, inode, publish_status, to_client_status)
+                SELECT project_id, rel_path, parent, kind, is_dir, size, mtime, inode, publish_status, to_client_status
+                FROM temp.rebuild_files
+                ''')
+                cursor.execute("INSERT OR REPLACE INTO indexed_dirs (project_id, rel_path, mtime_ns) "
+                               "SELECT project_id, rel_path, mtime_ns FROM temp.rebuild_dirs")
+                self.insert_search_rows(cursor, project_id, '.')
+                conn.commit()
+        finally:
+            conn.close()
+        return count
+        
+    def insert_records(self, cursor, batch, table="indexed_files"):
+        cursor.executemany(f'''
+        INSERT OR REPLACE INTO {table}
+        (project_id, rel_path, parent, kind, is_dir, size, mtime, inode, publish_status, to_client_status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+        
+    def delete_search_rows(self, cursor, project_id, rel_path):
+        clause, params = self.subtree_clause("rel_path", rel_path)
+        cursor.execute(f'''
+        DELETE FROM file_search WHERE rowid IN
+        (SELECT id FROM indexed_files WHERE project_id = ? AND {clause})
+        ''', [project_id] + params)
+        
+    def insert_search_rows(self, cursor, project_id, rel_path):
+        """(Re)create the FTS rows of rel_path and everything below it"""
+        clause, params = self.subtree_clause("f.rel_path", rel_path)
+        cursor.execute(f'''
+        INSERT INTO file_search (rowid, path, project, kind, status)
+        SELECT f.id, f.rel_path, p.name, f.kind,
+               TRIM(CASE WHEN f.publish_status THEN 'published' ELSE '' END || ' ' ||
+                    CASE WHEN f.to_client_status THEN 'to client' ELSE '' END)
+        FROM indexed_files f JOIN indexed_projects p ON p.project_id = f.project_id
+        WHERE f.project_id = ? AND {clause}
+        ''', [project_id] + params)
+        
+    def update_status(self, project_id, rel_path, attribute, value):
+        """Record a new attribute value for an indexed file
+        
+        Best effort: called right after the sidecar is written, often from
+        the GUI thread, so it waits at most STATUS_BUSY_TIMEOUT_MS for the
+        index and gives up on errors. The next sync of the folder, which
+        re-reads the sidecars, repairs a missed update.
+        """
+        try:
+            conn = self.connect()
+            try:
+                conn.execute(f"PRAGMA busy_timeout = {self.STATUS_BUSY_TIMEOUT_MS}")
+                self.set_status(conn.cursor(), project_id, rel_path, attribute, value)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            METRICS.count("index_status_update_failures_total")
+        
+    def set_status(self, cursor, project_id, rel_path, attribute, value):
+        column = self.STATUS_COLUMNS[attribute]
+        cursor.execute(f"UPDATE indexed_files SET {column} = ? WHERE project_id = ? AND rel_path = ?",
+                       (bool(value), project_id, rel_path))
+        cursor.execute('''
+        SELECT id, publish_status, to_client_status FROM indexed_files
+        WHERE project_id = ? AND rel_path = ?
+        ''', (project_id, rel_path))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE file_search SET status = ? WHERE rowid = ?", (status_text(row[1], row[2]), row[0]))
+        
+    def matching_paths(self, project_id, attribute):
+        """Indexed entries of a project with an attribute set
+        
+        Returns (rel_path, is_dir, publish, to_client) tuples. Served by the
+        partial index of the attribute, so the cost follows the number of
+        matches rather than the size of the project.
+        """
+        column = self.STATUS_COLUMNS[attribute]
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'''
+            SELECT rel_path, is_dir, publish_status, to_client_status FROM indexed_files
+            INDEXED BY indexed_files_{column}
+            WHERE project_id = ? AND {column}
+            ''', (project_id,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        return [(rel_path, bool(is_dir), bool(publish), bool(to_client))
+                for rel_path, is_dir, publish, to_client in rows]
+    
+    def changed_dirs(self, project_id, master_path):
+        """Return indexed folders whose mtime differs from the index, parents first
+        
+        Costs one stat per indexed folder and no listing.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT rel_path, mtime_ns FROM indexed_dirs WHERE project_id = ?", (project_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        changed = []
+        for rel_path, mtime_ns in rows:
+            dir_path = os.path.normpath(os.path.join(master_path, rel_path))
+            try:
+                if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                    changed.append(dir_path)
+            except OSError:
+                continue  # Gone; picked up when its parent is synced
+        changed.sort(key=lambda path: path.count(os.sep))
+        return changed
+        
+    def sync_dirs(self, project_id, master_path, dir_paths, attribute_manager):
+        """Bring the index of changed folders up to date and return the changes
+        
+        Each folder is listed once and diffed against its indexed children.
+        An entry removed in one folder and added with the same inode in
+        another (or the same) folder is treated as a rename, so a moved
+        folder keeps its indexed subtree instead of being walked again.
+        New folders are indexed recursively; removed folders lose their
+        subtree. Only the index tables change: attributes of a renamed path
+        stay with its sidecar and file_attributes rows (see
+        AttributeManager.move for a rename that takes them along).
+        
+        Returns a list of (change, path[, new_path]) tuples where change is
+        'added', 'removed', 'renamed', 'modified' or 'attributes'.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        changes = []
+        added = []
+        removed = []
+        try:
+            for dir_path in dir_paths:
+                parent = os.path.relpath(dir_path, master_path)
+                try:
+                    dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+                    dirs, files, sidecars = scan_directory(dir_path)
+                except OSError:
+                    continue  # Removed or renamed; the parent folder reports it
+                    
+                cursor.execute('''
+                SELECT rel_path, is_dir, size, mtime, inode, publish_status, to_client_status
+                FROM indexed_files WHERE project_id = ? AND parent = ?
+                ''', (project_id, parent))
+                indexed = {os.path.basename(row[0]): row for row in cursor.fetchall()}
+                
+                current = {}
+                for is_dir, entries in ((True, dirs), (False, files)):
+                    for entry in entries:
+                        if not entry.name.endswith('.json'):
+                            current[entry.name] = (is_dir, entry)
+                    
+                for name, row in indexed.items():
+                    if name not in current:
+                        removed.append((os.path.join(dir_path, name), bool(row[1]), row[4]))
+                    
+                for name, (is_dir, entry) in current.items():
+                    row = indexed.get(name)
+                    if row is None or bool(row[1]) != is_dir:
+                        if row is not None:
+                            removed.append((entry.path, bool(row[1]), row[4]))
+                        added.append((entry.path, is_dir, entry))
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if not is_dir and (stat.st_size != row[2] or stat.st_mtime != row[3] or entry.inode() != row[4]):
+                        cursor.execute('''
+                        UPDATE indexed_files SET size = ?, mtime = ?, inode = ?
+                        WHERE project_id = ? AND rel_path = ?
+                        ''', (stat.st_size, stat.st_mtime, entry.inode(), project_id, row[0]))
+                        changes.append(('modified', entry.path))
+                        
+                    status = (False, False)
+                    if name in sidecars:
+                        status = self.read_status(attribute_manager, entry.path)
+                    if status != (bool(row[5]), bool(row[6])):
+                        self.set_status(cursor, project_id, row[0], "publish", status[0])
+                        self.set_status(cursor, project_id, row[0], "to_client", status[1])
+                        changes.append(('attributes', entry.path))
+                    
+                cursor.execute("INSERT OR REPLACE INTO indexed_dirs (project_id, rel_path, mtime_ns) VALUES (?, ?, ?)",
+                               (project_id, parent, dir_mtime_ns))
+                
+            # Pair removals and additions of the same inode as renames
+            removed_by_inode = {(inode, is_dir): path for path, is_dir, inode in removed if inode}
+            renamed = []
+            new_entries = []
+            for path, is_dir, entry in added:
+                old_path = removed_by_inode.pop((entry.inode(), is_dir), None)
+                if old_path is not None:
+                    renamed.append((old_path, path))
+                else:
+                    new_entries.append((path, is_dir, entry))
+                
+            # Removals go first so a path that changed type is re-added cleanly
+            removed_paths = list(removed_by_inode.values()) + [path for path, _, inode in removed if not inode]
+            for path in removed_paths:
+                self.remove_path(cursor, project_id, master_path, path)
+                changes.append(('removed', path))
+                
+            for old_path, path in renamed:
+                self.rename_path(cursor, project_id, master_path, old_path, path)
+                status = self.read_status(attribute_manager, path)
+                self.set_status(cursor, project_id, os.path.relpath(path, master_path), "publish", status[0])
+                self.set_status(cursor, project_id, os.path.relpath(path, master_path), "to_client", status[1])
+                changes.append(('renamed', old_path, path))
+                
+            for path, is_dir, entry in new_entries:
+                rel_path = os.path.relpath(path, master_path)
+                self.delete_search_rows(cursor, project_id, rel_path)
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Already gone again
+                status = self.read_status(attribute_manager, path)
+                self.insert_records(cursor, [(project_id, rel_path, os.path.relpath(os.path.dirname(path), master_path),
+                                              file_kind(entry.name, is_dir), is_dir, 0 if is_dir else stat.st_size,
+                                              stat.st_mtime, entry.inode()) + status])
+                if is_dir:
+                    self.index_subtree(cursor, project_id, master_path, path, attribute_manager)
+                self.insert_search_rows(cursor, project_id, os.path.relpath(path, master_path))
+                changes.append(('added', path))
+            conn.commit()
+        finally:
+            conn.close()
+        return changes
+        
+    def remove_path(self, cursor, project_id, master_path, path):
+        """Drop a file or folder and everything below it from the index"""
+        rel_path = os.path.relpath(path, master_path)
+        self.delete_search_rows(cursor, project_id, rel_path)
+        clause, params = self.subtree_clause("rel_path", rel_path)
+        cursor.execute(f"DELETE FROM indexed_files WHERE project_id = ? AND {clause}", [project_id] + params)
+        cursor.execute(f"DELETE FROM indexed_dirs WHERE project_id = ? AND {clause}", [project_id] + params)
+        
+    def rename_path(self, cursor, project_id, master_path, old_path, new_path):
+        """Move the index rows of a file or folder subtree to a new path
+        
+        Only the index follows: attributes stay with their sidecars and
+        file_attributes rows (see AttributeManager.move).
+        """
+        old_rel = os.path.relpath(old_path, master_path)
+        new_rel = os.path.relpath(new_path, master_path)
+        self.delete_search_rows(cursor, project_id, old_rel)
+        # Anything already indexed at the destination is replaced
+        self.remove_path(cursor, project_id, master_path, new_path)
+        
+        clause, params = self.subtree_clause("rel_path", old_rel)
+        cursor.execute(f'''
+        UPDATE indexed_files
+        SET rel_path = ? || substr(rel_path, ?),
+            parent = CASE WHEN rel_path = ? THEN ? ELSE ? || substr(parent, ?) END
+        WHERE project_id = ? AND {clause}
+        ''', [new_rel, len(old_rel) + 1, old_rel, os.path.relpath(os.path.dirname(new_path), master_path),
+              new_rel, len(old_rel) + 1, project_id] + params)
+        cursor.execute(f'''
+        UPDATE indexed_dirs SET rel_path = ? || substr(rel_path, ?)
+        WHERE project_id = ? AND {clause}
+        ''', [new_rel, len(old_rel) + 1, project_id] + params)
+        cursor.execute("UPDATE indexed_files SET kind = ? WHERE project_id = ? AND rel_path = ? AND NOT is_dir",
+                       (file_kind(new_rel, False), project_id, new_rel))
+        self.insert_search_rows(cursor, project_id, new_rel)
+        
+    def search(self, text, limit=500):
+        """Search all indexed projects
+        
+        Every word must match the path, project name, type or status
+        ("published", "to client"). Returns dicts ordered by relevance.
+        """
+        words = text.split()
+        if not words:
+            return []
+        # The trigram tokenizer cannot match words shorter than three
+        # characters, so those are filtered on the path instead
+        match_words = [w for w in words if len(w) >= 3 or not self.trigram]
+        like_words = [w for w in words if w not in match_words]
+        
+        query = '''
+        SELECT f.project_id, p.name, p.master_path, f.rel_path, f.kind, f.is_dir,
+               f.size, f.mtime, f.publish_status, f.to_client_status
+        '''
+        params = []
+        if match_words:
+            query += '''
+            FROM file_search s
+            JOIN indexed_files f ON f.id = s.rowid
+            JOIN indexed_projects p ON p.project_id = f.project_id
+            WHERE file_search MATCH ?
+            '''
+            if self.trigram:
+                params.append(" ".join('"%s"' % w.replace('"', '""') for w in match_words))
+            else:
+                params.append(" ".join('"%s"*' % w.replace('"', '""') for w in match_words))
+        else:
+            query += '''
+            FROM indexed_files f
+            JOIN indexed_projects p ON p.project_id = f.project_id
+            WHERE 1
+            '''
+        for word in like_words:
+            query += " AND f.rel_path LIKE ?"
+            params.append(f"%{word}%")
+        query += " ORDER BY rank LIMIT ?" if match_words else " ORDER BY f.rel_path LIMIT ?"
+        params.append(limit)
+        
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+            
+        return [{
+            'project_id': row[0],
+            'project': row[1],
+            'path': os.path.join(row[2], row[3]),
+            'kind': row[4],
+            'is_dir': bool(row[5]),
+            'size': row[6],
+            'mtime': row[7],
+            'publish': bool(row[8]),
+            'to_client': bool(row[9])
+        } for row in rows]
+
+
+class DirectorySizes:
+    """Recursive folder sizes, cached per folder and keyed by its mtime
+    
+    Each folder keeps a row with its mtime, the size of the files directly
+    in it and its sub-folders. A folder is listed again only when its mtime
+    changed (an entry was added, removed or renamed); other folders cost a
+    stat, and totals are sums over the rows. Rows live in dir_sizes of the
+    index database, so a restart does not list the tree again. Files
+    rewritten in place do not touch their folder's mtime: their folders
+    are passed to invalidate(relist=True) when the change is seen.
+    
+    Not thread-safe: compute and invalidate must run in one thread, but
+    total may be called from any thread.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or INDEX_DB_PATH
+        self.rows = {}    # path -> (mtime_ns, files size, sub-folder names)
+        self.totals = {}  # path -> recursive size, until something below changes
+        self.cancelled = False
+        self.init_db()
+    
+    def connect(self):
+        conn = connect_db(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def init_db(self):
+        conn = self.connect()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS dir_sizes (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            files_size INTEGER NOT NULL,
+            subdirs TEXT NOT NULL
+        )
+        ''')
+        conn.commit()
+        conn.close()
+    
+    def cancel(self):
+        """Stop a running compute; safe to call from another thread"""
+        self.cancelled = True
+    
+    def load(self, top):
+        """Read the saved rows of top and the folders below it"""
+        clause, params = FileIndex.subtree_clause("path", top)
+        conn = self.connect()
+        try:
+            rows = conn.execute(f"SELECT path, mtime_ns, files_size, subdirs FROM dir_sizes WHERE {clause}",
+                                params).fetchall()
+        finally:
+            conn.close()
+        for path, mtime_ns, files_size, subdirs in rows:
+            self.rows.setdefault(path, (mtime_ns, files_size, json.loads(subdirs)))
+    
+    def total(self, dir_path):
+        """Recursive size of a folder in bytes, or None until it is computed"""
+        return self.totals.get(dir_path)
+    
+    def visit(self, dir_path):
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        row = self.rows.get(dir_path)
+        if row is not None and row[0] == mtime_ns:
+            return row, False
+        dirs, files, _ = scan_directory(dir_path)
+        files_size = 0
+        for entry in files:
+            try:
+                files_size += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+        return (mtime_ns, files_size, sorted(entry.name for entry in dirs if not entry.is_symlink())), True
+    
+    def compute(self, top, workers=None):
+        """Recursive size of top, computing the totals below it that are not known
+        
+        Folders with a known total are not descended into. Returns None if
+        top cannot be read or the compute was cancelled.
+        """
+        if top in self.totals:
+            return self.totals[top]
+        
+        def children(dir_path, result):
+            return [path for path in (os.path.join(dir_path, name) for name in result[0][2])
+                    if path not in self.totals]
+        
+        order = []
+        changed = []
+        with METRICS.timed("dir_size_seconds"):
+            for dir_path, (row, listed) in walk_tree(top, self.visit, children, workers):
+                if self.cancelled:
+                    return None
+                if listed:
+                    changed.append((dir_path, row, self.rows.get(dir_path)))
+                self.rows[dir_path] = row
+                order.append(dir_path)
+            # Pre-order reversed visits every folder after its sub-folders
+            for dir_path in reversed(order):
+                _, files_size, subdirs = self.rows[dir_path]
+                self.totals[dir_path] = files_size + sum(self.totals.get(os.path.join(dir_path, name), 0)
+                                                         for name in subdirs)
+        METRICS.count("dir_size_listed_total", len(changed))
+        if changed:
+            self.save(changed)
+        return self.totals.get(top)
+    
+    def save(self, changed):
+        """Store relisted rows and forget the folders that went away"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            for dir_path, row, old_row in changed:
+                for name in set(old_row[2] if old_row else ()) - set(row[2]):
+                    gone = os.path.join(dir_path, name)
+                    clause, params = FileIndex.subtree_clause("path", gone)
+                    cursor.execute(f"DELETE FROM dir_sizes WHERE {clause}", params)
+                    for path in [path for path in self.rows if path == gone or path.startswith(gone + os.sep)]:
+                        del self.rows[path]
+                        self.totals.pop(path, None)
+            cursor.executemany("INSERT OR REPLACE INTO dir_sizes (path, mtime_ns, files_size, subdirs) "
+                               "VALUES (?, ?, ?, ?)",
+                               [(dir_path, row[0], row[1], json.dumps(row[2])) for dir_path, row, _ in changed])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def invalidate(self, dir_path, relist=False):
+        """Forget the totals of a folder and of the folders above it
+        
+        With relist, the folder is listed again on the next compute even if
+        its mtime did not change (e.g. a file in it was rewritten in place).
+        """
+        if relist and dir_path in self.rows:
+            self.rows[dir_path] = (-1,) + self.rows[dir_path][1:]
+        while True:
+            self.totals.pop(dir_path, None)
+            parent = os.path.dirname(dir_path)
+            if parent == dir_path:
+                break
+            dir_path = parent
+
+
+class MetadataCache:
+    """Short-lived cache of stat, listdir and sidecar reads
+    
+    The tree view, details panel and attribute checks ask for the same
+    paths many times a second, and each call costs milliseconds on SMB and
+    NFS mounts. Results are kept for ttl seconds (per mount point with
+    mount_ttls), dropped when we write a path ourselves (invalidate) or a
+    watched folder changes (invalidate_dir). Missing paths are cached too.
+    Safe to share between the GUI thread and worker threads.
+    
+    Hits, misses, invalidations and the time spent on misses are counted
+    per mount point; see stats().
+    """
+    MAX_ENTRIES = 100000
+    
+    def __init__(self, ttl=1.0, mount_ttls=None):
+        self.ttl = ttl
+        self.mount_ttls = dict(mount_ttls or {})
+        self.lock = threading.Lock()
+        self.entries = {}   # (kind, path) -> (expires, value)
+        self.mounts = {}    # directory -> mount point
+        self.counters = {}  # mount point -> counter dict
+        
+    def mount_point(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        mount = self.mounts.get(directory)
+        if mount is None:
+            mount = directory
+            while not os.path.ismount(mount):
+                parent = os.path.dirname(mount)
+                if parent == mount:
+                    break
+                mount = parent
+            self.mounts[directory] = mount
+        return mount
+        
+    def ttl_for(self, mount):
+        return self.mount_ttls.get(mount, self.ttl)
+        
+    def count(self, mount, name, amount=1):
+        counters = self.counters.get(mount)
+        if counters is None:
+            counters = self.counters[mount] = {"hits": 0, "misses": 0, "invalidations": 0, "miss_seconds": 0.0}
+        counters[name] += amount
+        
+    def lookup(self, kind, path, load):
+        """Return the cached value of load(path), calling it on a miss"""
+        key = (kind, path)
+        now = time.monotonic()
+        mount = self.mount_point(path)
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] > now:
+                self.count(mount, "hits")
+                return cached[1]
+        start = time.perf_counter()
+        value = load(path)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.count(mount, "misses")
+            self.count(mount, "miss_seconds", elapsed)
+            self.entries.pop(key, None)
+            self.entries[key] = (now + self.ttl_for(mount), value)
+            if len(self.entries) > self.MAX_ENTRIES:
+                # Oldest insertions go first
+                del self.entries[next(iter(self.entries))]
+        return value
+        
+    @staticmethod
+    def load_stat(path):
+        try:
+            with METRICS.timed("fs_stat_seconds"):
+                return os.stat(path)
+        except OSError:
+            return None
+            
+    @staticmethod
+    def load_listdir(path):
+        try:
+            with METRICS.timed("fs_listdir_seconds"):
+                return os.listdir(path)
+        except OSError:
+            return None
+            
+    @staticmethod
+    def load_json(path):
+        try:
+            with METRICS.timed("sidecar_read_seconds"), open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return False
+            
+    def stat(self, path):
+        """os.stat result, or None if the path does not exist"""
+        return self.lookup("stat", path, self.load_stat)
+        
+    def exists(self, path):
+        return self.stat(path) is not None
+        
+    def isdir(self, path):
+        stat = self.stat(path)
+        return stat is not None and (stat.st_mode & 0o170000) == 0o040000
+        
+    def listdir(self, path):
+        """Entry names like os.listdir; raises OSError if unreadable"""
+        names = self.lookup("listdir", path, self.load_listdir)
+        if names is None:
+            raise FileNotFoundError(f"Cannot list directory: {path}")
+        return list(names)
+        
+    def read_json(self, path):
+        """Parsed JSON file, None if missing, False if unreadable or invalid
+        
+        The returned object is shared; callers must not modify it.
+        """
+        return self.lookup("json", path, self.load_json)
+        
+    def invalidate(self, path):
+        """Forget path and the listing of its parent (we wrote or removed it)"""
+        mount = self.mount_point(path)
+        with self.lock:
+            for key in (("stat", path), ("listdir", path), ("json", path), ("listdir", os.path.dirname(path))):
+                self.entries.pop(key, None)
+            self.count(mount, "invalidations")
+            
+    def invalidate_dir(self, dir_path):
+        """Forget a folder's listing and everything directly inside it"""
+        mount = self.mount_point(dir_path)
+        with self.lock:
+            stale = [key for key in self.entries if key[1] == dir_path or os.path.dirname(key[1]) == dir_path]
+            for key in stale:
+                del self.entries[key]
+            self.count(mount, "invalidations")
+            
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            
+    def stats(self):
+        """Return {mount point: counters} with hit_rate and ttl added"""
+        with self.lock:
+            result = {}
+            for mount, counters in self.counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                result[mount] = dict(counters,
+                                     hit_rate=counters["hits"] / lookups if lookups else 0.0,
+                                     ttl=self.ttl_for(mount))
+            return result
+
+
+# Attempts at a sidecar update before giving up on concurrent writers
+SIDECAR_WRITE_ATTEMPTS = 8
+
+# Age after which a sidecar lock file is taken to be left by a dead writer
+# (only where fcntl is missing)
+SIDECAR_LOCK_SECONDS = 10.0
+
+# Per-folder lock file held by sidecar writers (skipped by scan_directory)
+SIDECAR_LOCK_NAME = ".fileman.lock"
+
+# POSIX record locks belong to the process, so threads of one process are
+# kept apart by these first (a lock file path hashes to one of them)
+SIDECAR_THREAD_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+class SidecarWriteError(Exception):
+    """A sidecar kept changing under an update"""
+
+
+@contextlib.contextmanager
+def sidecar_lock(sidecar_path):
+    """Advisory lock serializing writers of the sidecars in one folder
+    
+    A SIDECAR_LOCK_NAME file in the folder is locked with fcntl.lockf, which
+    works across hosts on NFS (flock there needs a writable fd or is not
+    shared at all). Where no lock can be taken (read-only folder, NFS
+    without a lock manager) the writer goes on unlocked and relies on the
+    version check in append_history.
+    
+    Without fcntl (Windows) a "<sidecar>.lock" file created with O_EXCL is
+    held instead. One older than SIDECAR_LOCK_SECONDS is removed, which
+    Windows refuses while its writer still has it open, so only locks of
+    dead writers are taken over.
+    """
+    if fcntl is None:
+        lock_path = sidecar_path + ".lock"
+        with METRICS.timed("sidecar_lock_wait_seconds"):
+            while True:
+                try:
+                    fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - os.stat(lock_path).st_mtime > SIDECAR_LOCK_SECONDS:
+                            os.remove(lock_path)
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    except PermissionError:
+                        pass  # Still open: its writer is alive
+                    time.sleep(random.uniform(0.001, 0.01))
+        try:
+            yield
+        finally:
+            lock_stat = os.fstat(fd)
+            os.close(fd)
+            try:
+                # Leave a lock file alone that another writer has created since
+                if os.path.samestat(lock_stat, os.stat(lock_path)):
+                    os.remove(lock_path)
+            except OSError:
+                pass
+        return
+    lock_path = os.path.join(os.path.dirname(sidecar_path) or '.', SIDECAR_LOCK_NAME)
+    fd = None
+    with SIDECAR_THREAD_LOCKS[hash(lock_path) % len(SIDECAR_THREAD_LOCKS)]:
+        try:
+            with METRICS.timed("sidecar_lock_wait_seconds"):
+                try:
+                    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+                    fcntl.lockf(fd, fcntl.LOCK_EX)
+                except OSError:
+                    METRICS.count("sidecar_lock_failures_total")
+            yield
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+
+class AttributeManager:
+    """Manages publish/to_client attributes and history tracking"""
+    def __init__(self, master_path, metadata_cache=None):
+        self.master_path = master_path
+        self.metadata_cache = metadata_cache
+        self._file_index = None
+    
+    @property
+    def file_index(self):
+        """FileIndex opened on first use, so plain attribute reads never touch it"""
+        if self._file_index is None:
+            self._file_index = FileIndex()
+        return self._file_index
+    
+    def get_sidecar_path(self, path):
+        """Get path for sidecar JSON file"""
+        return f"{path}.attr.json"
+    
+    def load_data(self, path):
+        """Load attribute data from sidecar file"""
+        sidecar_path = self.get_sidecar_path(path)
+        if self.metadata_cache is not None:
+            data = self.metadata_cache.read_json(sidecar_path)
+            if data:
+                return data
+            return {"publish": [], "to_client": []}
+        if os.path.exists(sidecar_path):
+            try:
+                with METRICS.timed("sidecar_read_seconds"), open(sidecar_path, 'r') as f:
+                    return json.load(f)
+            except:
+                return {"publish": [], "to_client": []}
+        return {"publish": [], "to_client": []}
+    
+    @staticmethod
+    def write_temp(sidecar_path, data):
+        """Write data to a synced temp file next to the sidecar; returns its path"""
+        tmp_path = f"{sidecar_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with METRICS.timed("sidecar_write_seconds"), open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return tmp_path
+    
+    @staticmethod
+    def read_version(sidecar_path):
+        """(data, version) read from disk; ({}, 0) if missing, ValueError if unreadable"""
+        try:
+            with open(sidecar_path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}, 0
+        if not isinstance(data, dict):
+            raise ValueError(f"Sidecar is not a JSON object: {sidecar_path}")
+        return data, data.get("version", 0)
+    
+    @staticmethod
+    def preserve_corrupt(sidecar_path):
+        """Move an unreadable sidecar aside so a new history does not overwrite it"""
+        corrupt_path = f"{sidecar_path}.corrupt-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        try:
+            os.replace(sidecar_path, corrupt_path)
+        except FileNotFoundError:
+            return None
+        METRICS.count("sidecar_corrupt_total")
+        return corrupt_path
+    
+    def append_history(self, path, attribute, entry):
+        """Append an entry to a sidecar history without losing concurrent writes
+        
+        Read, check and replace happen under sidecar_lock, so two writers
+        never replace the same version. The version counter is still checked
+        before the replace and the entry read back after it, which catches
+        writers that do not take the lock (older Fileman versions).
+        """
+        sidecar_path = self.get_sidecar_path(path)
+        for attempt in range(SIDECAR_WRITE_ATTEMPTS):
+            with sidecar_lock(sidecar_path):
+                try:
+                    data, version = self.read_version(sidecar_path)
+                except ValueError:
+                    self.preserve_corrupt(sidecar_path)
+                    data, version = {}, 0
+                data.setdefault("publish", [])
+                data.setdefault("to_client", [])
+                data.pop("lock_until", None)  # Left by older versions
+                data[attribute].append(entry)
+                data["version"] = version + 1
+                
+                tmp_path = self.write_temp(sidecar_path, data)
+                try:
+                    current_version = self.read_version(sidecar_path)[1]
+                except ValueError:
+                    current_version = None
+                if current_version != version:
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, sidecar_path)
+                    try:
+                        written, written_version = self.read_version(sidecar_path)
+                    except ValueError:
+                        written, written_version = {}, None
+                    if written_version == version + 1 and entry in written.get(attribute, []):
+                        if self.metadata_cache is not None:
+                            self.metadata_cache.invalidate(sidecar_path)
+                        return
+            METRICS.count("sidecar_write_conflicts_total")
+            time.sleep(random.uniform(0, 0.01 * (attempt + 1)))
+        raise SidecarWriteError(f"Could not update {sidecar_path}: other writers kept changing it")
+    
+    def update_attribute(self, path, attribute, value, user):
+        """Update attribute with timestamp history"""
+        timestamp = datetime.now().isoformat()
+        self.append_history(path, attribute, {
+            "status": value,
+            "timestamp": timestamp,
+            "user": user
+        })
+        
+        # Update centralized database
+        conn = connect_db()
+        cursor = conn.cursor()
+        
+        # Get project ID from master path
+        cursor.execute("SELECT id FROM projects WHERE master_path = ?", (self.master_path,))
+        project_result = cursor.fetchone()
+        
+        if project_result:
+            project_id = project_result[0]
+            rel_path = os.path.relpath(path, self.master_path)
+            
+            # Check if file exists in database
+            cursor.execute('''
+            SELECT COUNT(*) FROM file_attributes 
+            WHERE project_id = ? AND file_path = ?
+            ''', (project_id, rel_path))
+            
+            if cursor.fetchone()[0] == 0:
+                cursor.execute('''
+                INSERT INTO file_attributes 
+                (project_id, file_path, publish_status, to_client_status) 
+                VALUES (?, ?, ?, ?)
+                ''', (project_id, rel_path, False, False))
+            
+            # Update the attribute
+            if attribute == "publish":
+                cursor.execute('''
+                UPDATE file_attributes SET publish_status = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE file_path = ? AND project_id = ?
+                ''', (value, rel_path, project_id))
+            elif attribute == "to_client":
+                cursor.execute('''
+                UPDATE file_attributes SET to_client_status = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE file_path = ? AND project_id = ?
+                ''', (value, rel_path, project_id))
+            
+            cursor.execute('''
+            INSERT OR IGNORE INTO attribute_history (project_id, file_path, attribute, status, timestamp, user)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (project_id, rel_path, attribute, value, timestamp, user))
+            log_change(cursor, project_id, rel_path, attribute, value, user)
+        
+        conn.commit()
+        conn.close()
+        
+        # Keep the search index in step with the new status
+        if project_result and os.path.exists(INDEX_DB_PATH):
+            self.file_index.update_status(project_id, rel_path, attribute, value)
+        
+        return timestamp
+    
+    def move(self, old_path, new_path):
+        """Rename a file or folder and take its attributes along
+        
+        The sidecar is renamed with the file (those of a folder's contents
+        move with the folder), then the file_attributes and attribute_history
+        rows of the moved paths follow.
+        """
+        old_sidecar = self.get_sidecar_path(old_path)
+        new_sidecar = self.get_sidecar_path(new_path)
+        for path in (new_path, new_sidecar):
+            if os.path.lexists(path):
+                raise FileExistsError(f"Already exists: {path}")
+        with sidecar_lock(old_sidecar):
+            os.rename(old_path, new_path)
+            if os.path.exists(old_sidecar):
+                os.rename(old_sidecar, new_sidecar)
+        if self.metadata_cache is not None:
+            for path in (old_path, new_path, old_sidecar, new_sidecar):
+                self.metadata_cache.invalidate(path)
+        
+        conn = connect_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM projects WHERE master_path = ?", (self.master_path,))
+            project_result = cursor.fetchone()
+            if project_result:
+                old_rel = os.path.relpath(old_path, self.master_path)
+                new_rel = os.path.relpath(new_path, self.master_path)
+                clause, params = FileIndex.subtree_clause("file_path", old_rel)
+                new_clause, new_params = FileIndex.subtree_clause("file_path", new_rel)
+                for table in ("file_attributes", "attribute_history"):
+                    # Rows left by whatever was at the destination before
+                    cursor.execute(f"DELETE FROM {table} WHERE project_id = ? AND {new_clause}",
+                                   [project_result[0]] + new_params)
+                    cursor.execute(f'''
+                    UPDATE {table} SET file_path = ? || substr(file_path, ?)
+                    WHERE project_id = ? AND {clause}
+                    ''', [new_rel, len(old_rel) + 1, project_result[0]] + params)
+                conn.commit()
+        finally:
+            conn.close()
+    
+    def get_current_status(self, path, attribute):
+        """Get current status and timestamp for an attribute"""
+        data = self.load_data(path)
+        if data[attribute]:
+            last_entry = data[attribute][-1]
+            return last_entry["status"], last_entry["timestamp"], last_entry.get("user", "Unknown")
+        return False, "", "Unknown"
+    
+    def get_attribute_history(self, path, attribute):
+        """Get complete history of an attribute"""
+        data = self.load_data(path)
+        return data.get(attribute, [])
+
+
+# Unix socket of the local attribute service (fileman_service.py)
+SERVICE_SOCKET = os.environ.get("FILEMAN_SERVICE_SOCKET") or os.path.join(
+    os.path.expanduser("~"), "FileTreeManager", "attribute_service.sock")
+
+
+class AttributeServiceError(Exception):
+    """The attribute service refused a request or cannot be reached"""
+
+
+class AttributeServiceClient:
+    """Connection to the attribute service: one JSON object per line each way
+    
+    Thread-safe; requests from several threads share the connection.
+    """
+    TIMEOUT = 10.0
+    
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or SERVICE_SOCKET
+        self.lock = threading.Lock()
+        self.sock = None
+        self.reader = None
+        
+    def connect(self):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.TIMEOUT)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+        
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+            self.sock = None
+            self.reader = None
+            
+    def request(self, op, retry=True, **fields):
+        """Send a request and return the reply; raises AttributeServiceError
+        
+        A request on a dropped connection is resent once on a new one, unless
+        retry is False (updates, which must not be applied twice).
+        """
+        message = (json.dumps(dict(fields, op=op)) + "\n").encode()
+        with self.lock, METRICS.timed("service_request_seconds"):
+            for attempt in range(2):
+                reused = self.sock is not None
+                try:
+                    if not reused:
+                        self.connect()
+                    self.sock.sendall(message)
+                    line = self.reader.readline()
+                    if not line:
+                        raise ConnectionError("connection closed by the attribute service")
+                    break
+                except OSError as e:
+                    self.close()
+                    if attempt or not reused or not retry:
+                        raise AttributeServiceError(f"Attribute service unavailable: {str(e)}")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise AttributeServiceError(reply.get("error", "Request failed"))
+        return reply
+        
+    def available(self):
+        """True if the service answers a ping"""
+        try:
+            self.request("ping")
+        except AttributeServiceError:
+            return False
+        return True
+
+
+class RemoteAttributeManager(AttributeManager):
+    """AttributeManager reading and writing through the attribute service
+    
+    Current statuses are fetched a folder at a time and kept for STATUS_TTL
+    seconds, so sidecars written without the service and missed events
+    show up without a restart. Pushed changes (apply_event) update a kept
+    folder; invalidate_dir drops it. Reads fall back to the sidecars when
+    the service cannot be reached; updates raise AttributeServiceError.
+    """
+    # Folders of statuses kept before the cache is cleared
+    MAX_DIRS = 2000
+    STATUS_TTL = 30.0
+    
+    def __init__(self, master_path, client, metadata_cache=None):
+        super().__init__(master_path, metadata_cache)
+        self.client = client
+        self.dir_statuses = {}
+        self.statuses_lock = threading.Lock()
+        
+    def statuses_for(self, dir_path):
+        now = time.monotonic()
+        with self.statuses_lock:
+            expires, statuses = self.dir_statuses.get(dir_path, (0, None))
+        if statuses is None or expires <= now:
+            statuses = self.client.request("status", dirs=[dir_path])["dirs"][dir_path]
+            with self.statuses_lock:
+                if len(self.dir_statuses) >= self.MAX_DIRS:
+                    self.dir_statuses.clear()
+                self.dir_statuses[dir_path] = (now + self.STATUS_TTL, statuses)
+        return statuses
+        
+    def get_current_status(self, path, attribute):
+        dir_path, name = os.path.split(path)
+        try:
+            entry = self.statuses_for(dir_path).get(name, {}).get(attribute)
+        except AttributeServiceError:
+            # Service gone: reads never fail, they go to the sidecar instead
+            history = AttributeManager.load_data(self, path)[attribute]
+            entry = history and [history[-1]["status"], history[-1]["timestamp"], history[-1].get("user", "Unknown")]
+        if entry:
+            return entry[0], entry[1], entry[2]
+        return False, "", "Unknown"
+        
+    def load_data(self, path):
+        try:
+            return self.client.request("history", path=path)["data"]
+        except AttributeServiceError:
+            return super().load_data(path)
+        
+    def update_attribute(self, path, attribute, value, user):
+        event = self.client.request("update", retry=False, master_path=self.master_path, path=path,
+                                    attribute=attribute, value=value, user=user)["event"]
+        self.apply_event(event)
+        return event["timestamp"]
+        
+    def apply_event(self, event):
+        """Update the cached status of a path from a change pushed by the service"""
+        dir_path, name = os.path.split(event["path"])
+        with self.statuses_lock:
+            expires, statuses = self.dir_statuses.get(dir_path, (0, None))
+            if statuses is not None:
+                statuses.setdefault(name, {})[event["attribute"]] = [event["value"], event["timestamp"], event["user"]]
+                
+    def invalidate_dir(self, dir_path):
+        with self.statuses_lock:
+            self.dir_statuses.pop(dir_path, None)
+
+
+def list_projects():
+    """Return (id, name, master_path, client_name, delivery_path) for every project"""
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name, master_path, client_name, delivery_path FROM projects ORDER BY id")
+    projects = cursor.fetchall()
+    conn.close()
+    return projects
+
+
+def find_project(name_or_id):
+    """Project row matching an id or a name, or None"""
+    for project in list_projects():
+        if str(project[0]) == str(name_or_id) or project[1] == name_or_id:
+            return project
+    return None
+
+
+def find_user_id(username):
+    """Id of the user with this name, or None"""
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def find_project_for_path(path):
+    """Project row whose master path contains path (the deepest one), or None"""
+    path = os.path.abspath(path)
+    best = None
+    for project in list_projects():
+        master_path = os.path.abspath(project[2])
+        if path == master_path or path.startswith(master_path.rstrip(os.sep) + os.sep):
+            if best is None or len(master_path) > len(os.path.abspath(best[2])):
+                best = project
+    return best
+
+
+def collect_client_files(attribute_manager, dir_path):
+    """Files under dir_path to deliver: every file of a folder marked for
+    client (recursively) and every file marked itself; .json files are skipped
+    """
+    to_client_files = []
+    
+    # Directories whose whole subtree goes to the client
+    client_dirs = set()
+    dir_client_status, _, _ = attribute_manager.get_current_status(dir_path, "to_client")
+    if dir_client_status:
+        client_dirs.add(dir_path)
+        
+    for current_dir, dirs, files, sidecars in scan_tree(dir_path):
+        if current_dir in client_dirs:
+            # Include all files in this directory and subdirectories
+            client_dirs.update(entry.path for entry in dirs)
+            for entry in files:
+                if not entry.name.endswith('.json'):  # Skip .json files
+                    to_client_files.append(entry.path)
+            continue
+    
+        # Only include files explicitly marked for client; entries
+        # without a sidecar cannot be marked, so skip reading them
+        for entry in files:
+            if entry.name in sidecars and not entry.name.endswith('.json'):
+                file_client_status, _, _ = attribute_manager.get_current_status(entry.path, "to_client")
+                if file_client_status:
+                    to_client_files.append(entry.path)
+        for entry in dirs:
+            if entry.name in sidecars:
+                sub_client_status, _, _ = attribute_manager.get_current_status(entry.path, "to_client")
+                if sub_client_status:
+                    client_dirs.add(entry.path)
+    return to_client_files
+
+
+def copy_to_delivery(files, dir_path, master_path, delivery_path):
+    """Copy files to the same relative paths under delivery_path; returns the count"""
+    # Create the corresponding directory structure in delivery folder
+    rel_path = os.path.relpath(dir_path, master_path)
+    dest_dir = os.path.join(delivery_path, rel_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    
+    # Copy files without timestamp
+    copied_count = 0
+    for file_path in files:
+        file_rel_path = os.path.relpath(file_path, master_path)
+        dest_path = os.path.join(delivery_path, file_rel_path)
+        
+        # Create destination directory if it doesn't exist
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        
+        # Copy file without timestamp
+        start = time.perf_counter()
+        shutil.copy2(file_path, dest_path)
+        copied_count += 1
+        if METRICS.enabled:
+            elapsed = time.perf_counter() - start
+            METRICS.observe("delivery_copy_seconds", elapsed)
+            METRICS.count("delivery_bytes_total", os.path.getsize(dest_path))
+            METRICS.count("delivery_copy_seconds_total", elapsed)
+    return copied_count
+
+
+def read_sidecar_state(sidecar_path):
+    """Current (publish, to_client) status stored in a sidecar, or None if unreadable"""
+    try:
+        with open(sidecar_path, 'r') as f:
+            data = json.load(f)
+        publish = data.get("publish") or []
+        to_client = data.get("to_client") or []
+        return (bool(publish[-1]["status"]) if publish else False,
+                bool(to_client[-1]["status"]) if to_client else False)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def read_sidecar_states(sidecar_paths):
+    """read_sidecar_state over a chunk of paths (one task for a worker pool)"""
+    return [read_sidecar_state(path) for path in sidecar_paths]
+
+
+def read_sidecar_history(sidecar_path):
+    """((publish, to_client), [(attribute, status, timestamp, user), ...]) or None if unreadable"""
+    try:
+        with open(sidecar_path, 'r') as f:
+            data = json.load(f)
+        state = []
+        entries = []
+        for attribute in ("publish", "to_client"):
+            history = data.get(attribute) or []
+            state.append(bool(history[-1]["status"]) if history else False)
+            for entry in history:
+                entries.append((attribute, bool(entry["status"]), str(entry.get("timestamp") or ""),
+                                str(entry.get("user") or "")))
+        return tuple(state), entries
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def read_sidecar_histories(sidecar_paths):
+    """read_sidecar_history over a chunk of paths (one task for a worker pool)"""
+    return [read_sidecar_history(path) for path in sidecar_paths]
+
+
+# Set a file_attributes row to the given statuses, creating it if needed
+UPSERT_ATTRIBUTES_SQL = '''
+INSERT INTO file_attributes (project_id, file_path, publish_status, to_client_status)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(project_id, file_path) DO UPDATE SET
+    publish_status = excluded.publish_status,
+    to_client_status = excluded.to_client_status,
+    last_updated = CURRENT_TIMESTAMP
+'''
+
+
+class AttributeReconciler:
+    """Finds and repairs divergences between sidecars and file_attributes
+    
+    Sidecars are found with one walk of the master path and parsed by a
+    thread pool (or a process pool, which parses faster but must not be
+    forked from a running GUI). All file_attributes rows of the project are
+    loaded with a single query and repairs are written with executemany in
+    one transaction.
+    
+    Divergence kinds:
+    - 'mismatch': sidecar and row disagree
+    - 'missing_row': a set sidecar status has no row
+    - 'orphan_row': a row has a set status but no sidecar backs it
+    - 'corrupt': the sidecar cannot be parsed (reported, never repaired)
+    The sidecar carries the history, so repairs make the rows match it.
+    cancel() (from another thread) makes a running check return None after
+    the folder or chunk at hand.
+    """
+    CHUNK_SIZE = 500
+    
+    def __init__(self, project_id, master_path, workers=8, use_processes=False, db_path=None):
+        self.project_id = project_id
+        self.master_path = master_path
+        self.workers = workers
+        self.use_processes = use_processes
+        self.db_path = db_path or DB_PATH
+        self.cancelled = False
+    
+    def cancel(self):
+        self.cancelled = True
+        
+    def find_sidecars(self):
+        """Return the paths that have a sidecar under the master path"""
+        paths = []
+        for current_dir, dirs, files, sidecars in scan_tree(self.master_path):
+            if self.cancelled:
+                break
+            paths.extend(os.path.join(current_dir, name) for name in sidecars)
+        return paths
+        
+    def read_states(self, paths):
+        """Return {path: (publish, to_client) or None} parsed in parallel"""
+        sidecar_paths = [path + SIDECAR_SUFFIX for path in paths]
+        chunks = [sidecar_paths[i:i + self.CHUNK_SIZE] for i in range(0, len(sidecar_paths), self.CHUNK_SIZE)]
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        states = []
+        with executor_class(max_workers=self.workers) as executor:
+            futures = [executor.submit(read_sidecar_states, chunk) for chunk in chunks]
+            for future in futures:
+                if self.cancelled:
+                    # Queued chunks are dropped; leaving the pool only waits for running ones
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                states.extend(future.result())
+        return dict(zip(paths, states))
+        
+    def load_rows(self):
+        """Return {rel_path: (publish, to_client)} for the project"""
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT file_path, publish_status, to_client_status FROM file_attributes
+        WHERE project_id = ?
+        ''', (self.project_id,))
+        rows = {row[0]: (bool(row[1]), bool(row[2])) for row in cursor.fetchall()}
+        conn.close()
+        return rows
+        
+    def check(self):
+        """Return a list of divergence dicts (kind, path, sidecar, database), or None if cancelled"""
+        states = self.read_states(self.find_sidecars())
+        if self.cancelled:
+            return None
+        rows = self.load_rows()
+        
+        divergences = []
+        for path, state in states.items():
+            rel_path = os.path.relpath(path, self.master_path)
+            row = rows.pop(rel_path, None)
+            if state is None:
+                kind = 'corrupt'
+            elif row is None:
+                kind = 'missing_row' if any(state) else None
+            else:
+                kind = 'mismatch' if state != row else None
+            if kind:
+                divergences.append({'kind': kind, 'path': path, 'sidecar': state, 'database': row})
+            
+        # Rows left over have no sidecar at all
+        for rel_path, row in rows.items():
+            if any(row):
+                divergences.append({'kind': 'orphan_row', 'path': os.path.join(self.master_path, rel_path),
+                                    'sidecar': None, 'database': row})
+        divergences.sort(key=lambda d: d['path'])
+        return divergences
+        
+    def repair(self, divergences):
+        """Make file_attributes match the sidecars; returns the number of rows fixed"""
+        upserts = []
+        for divergence in divergences:
+            if divergence['kind'] == 'corrupt':
+                continue
+            publish, to_client = divergence['sidecar'] or (False, False)
+            upserts.append((self.project_id, os.path.relpath(divergence['path'], self.master_path),
+                            publish, to_client))
+            
+        conn = connect_db(self.db_path)
+        try:
+            conn.executemany(UPSERT_ATTRIBUTES_SQL, upserts)
+            conn.commit()
+        finally:
+            conn.close()
+        return len(upserts)
+
+
+class SidecarImporter:
+    """Imports the current state and full history of every sidecar of a project
+    
+    For migrating projects older than the database. Sidecars are found with
+    a parallel walk of the master path and parsed in chunks by a process
+    pool (or threads, from a running GUI) while earlier chunks are written.
+    Current states are upserted into file_attributes and history entries
+    inserted into attribute_history, BATCH_SIZE files per executemany
+    transaction. History rows are unique per entry, so re-running an
+    import only adds what is new.
+    """
+    CHUNK_SIZE = 500
+    BATCH_SIZE = 5000
+    
+    def __init__(self, project_id, master_path, workers=None, use_processes=True, db_path=None):
+        self.project_id = project_id
+        self.master_path = master_path
+        self.workers = workers or os.cpu_count() or 4
+        self.use_processes = use_processes
+        self.db_path = db_path or DB_PATH
+    
+    def find_sidecars(self):
+        """Return the sidecar paths under the master path"""
+        sidecar_paths = []
+        for current_dir, dirs, files, sidecars in scan_tree(self.master_path):
+            sidecar_paths.extend(os.path.join(current_dir, name + SIDECAR_SUFFIX) for name in sidecars)
+        return sidecar_paths
+    
+    def write_batch(self, conn, states, entries):
+        with conn:
+            conn.executemany(UPSERT_ATTRIBUTES_SQL, states)
+            before = conn.total_changes
+            conn.executemany('''
+            INSERT OR IGNORE INTO attribute_history (project_id, file_path, attribute, status, timestamp, user)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', entries)
+            return conn.total_changes - before
+    
+    def run(self, progress_callback=None):
+        """Import the project; returns counts, timing and files per second
+        
+        progress_callback(files_done, files_total) follows each chunk.
+        """
+        start = time.perf_counter()
+        sidecar_paths = self.find_sidecars()
+        scan_seconds = time.perf_counter() - start
+        chunks = [sidecar_paths[i:i + self.CHUNK_SIZE] for i in range(0, len(sidecar_paths), self.CHUNK_SIZE)]
+        result = {"files": len(sidecar_paths), "corrupt": [], "history_entries": 0, "new_history_entries": 0}
+        states = []
+        entries = []
+        done = 0
+        
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        conn = connect_db(self.db_path)
+        try:
+            with executor_class(max_workers=self.workers) as executor:
+                for chunk, histories in zip(chunks, executor.map(read_sidecar_histories, chunks)):
+                    for sidecar_path, history in zip(chunk, histories):
+                        if history is None:
+                            result["corrupt"].append(sidecar_path)
+                            continue
+                        rel_path = os.path.relpath(sidecar_path[:-len(SIDECAR_SUFFIX)], self.master_path)
+                        states.append((self.project_id, rel_path) + history[0])
+                        entries.extend((self.project_id, rel_path) + entry for entry in history[1])
+                    done += len(chunk)
+                    if len(states) >= self.BATCH_SIZE:
+                        result["history_entries"] += len(entries)
+                        result["new_history_entries"] += self.write_batch(conn, states, entries)
+                        states, entries = [], []
+                    if progress_callback:
+                        progress_callback(done, len(sidecar_paths))
+            result["history_entries"] += len(entries)
+            result["new_history_entries"] += self.write_batch(conn, states, entries)
+        finally:
+            conn.close()
+        
+        result["scan_seconds"] = scan_seconds
+        result["seconds"] = time.perf_counter() - start
+        result["files_per_second"] = result["files"] / result["seconds"] if result["seconds"] else 0.0
+        return result
+
+
+# Project templates: folder patterns with {name} placeholders, expanded
+# in memory and created with one mkdir per folder
+TEMPLATE_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+DEFAULT_TEMPLATE = {
+    "name": "Default",
+    # Placeholders a template may use, with their default values
+    "variables": {"sequence": [], "shot": []},
+    "folders": [
+        "01_Project_Data/01_StoryBoard_and_Script",
+        "01_Project_Data/02_References",
+        "01_Project_Data/03_Work_Material/01_Images",
+        "01_Project_Data/03_Work_Material/02_Footage",
+        "01_Project_Data/03_Work_Material/03_Audio",
+        "01_Project_Data/03_Work_Material/04_Models",
+        "01_Project_Data/04_Calendar",
+        "01_Project_Data/05_Cam_Info",
+        "01_Project_Data/06_Feedback",
+
+        "02_2D_Projects/01_PSD",
+        "02_2D_Projects/02_Illustrator",
+
+        "3D_Project/01_Softwares/01_Max/01_Pre-Prod/01_RND",
+        "3D_Project/01_Softwares/01_Max/01_Pre-Prod/02_Models",
+        "3D_Project/01_Softwares/01_Max/01_Pre-Prod/03_Rigging",
+        "3D_Project/01_Softwares/01_Max/01_Pre-Prod/04_Lookdev",
+        "3D_Project/01_Softwares/01_Max/01_Pre-Prod/05_Render",
+        "3D_Project/01_Softwares/01_Max/02_Prod/01_Scenes/{sequence}/{shot}/Anim",
+        "3D_Project/01_Softwares/01_Max/02_Prod/01_Scenes/{sequence}/{shot}/Render_Scenes",
+        "3D_Project/01_Softwares/01_Max/02_Prod/02_Render/{sequence}/{shot}",
+        "3D_Project/01_Softwares/01_Max/03_Sims",
+        "3D_Project/01_Softwares/01_Max/04_Matlibs",
+
+        "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/01_RND",
+        "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/02_Models",
+        "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/03_Rigging",
+        "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/04_Lookdev",
+        "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/05_Render",
+        "3D_Project/01_Softwares/02_Maya/02_Prod/01_Scenes/{sequence}/{shot}/Anim",
+        "3D_Project/01_Softwares/02_Maya/02_Prod/01_Scenes/{sequence}/{shot}/Render_Scenes",
+        "3D_Project/01_Softwares/02_Maya/02_Prod/02_Renders/{sequence}/{shot}",
+
+        "3D_Project/01_Softwares/03_Houdini/01_Pre-prod/01_Scenes",
+        "3D_Project/01_Softwares/03_Houdini/01_Pre-prod/02_Collect",
+        "3D_Project/01_Softwares/03_Houdini/01_Pre-prod/03_Renders",
+        "3D_Project/01_Softwares/03_Houdini/02_Prod/01_Scenes",
+        "3D_Project/01_Softwares/03_Houdini/02_Prod/02_Collect",
+        "3D_Project/01_Softwares/03_Houdini/02_Prod/03_Renders",
+
+        "3D_Project/01_Softwares/04_Unreal/01_Scenes/{sequence}/{shot}",
+        "3D_Project/01_Softwares/04_Unreal/02_Render/{sequence}/{shot}",
+
+        "3D_Project/01_Softwares/05_ZBrush/01_Scenes",
+        "3D_Project/01_Softwares/05_ZBrush/02_Work_Images",
+
+        "3D_Project/01_Softwares/06_Substance/01_Scenes",
+        "3D_Project/01_Softwares/06_Substance/02_Work_Images",
+
+        "3D_Project/02_Export/01_Assets",
+        "3D_Project/02_Export/02_Shots/{sequence}/{shot}",
+
+        "3D_Project/03_Capture/01_Pre-prod",
+        "3D_Project/03_Capture/02_Prod/{sequence}/{shot}",
+
+        "3D_Project/04_Textures",
+
+        "04_Tracking/01_PFTrack",
+        "04_Tracking/02_AE",
+        "04_Tracking/03_C4D",
+        "04_Tracking/004_SynthEyes",
+        "04_Tracking/005_PFTrack",
+
+        "05_Compositing/01_Comp_Scenes/01_Slate",
+        "05_Compositing/02_PreComp_Renders",
+        "05_Compositing/03_Comp_Renders",
+        "05_Compositing/04_Edit/Output",
+        "05_Compositing/04_Edit/Work",
+
+        "06_Internal_Review",
+        "07_Out_To_Client"
+    ]
+}
+
+
+def load_template(path):
+    """Read a template from a JSON file with the same keys as DEFAULT_TEMPLATE
+    
+    An optional "files" object maps destination patterns to template files,
+    relative to the JSON file's folder, e.g.
+    {"05_Compositing/01_Comp_Scenes/01_Slate/slate.nk": "files/slate.nk"}.
+    """
+    with open(path, 'r') as f:
+        template = json.load(f)
+    if not isinstance(template.get("folders"), list):
+        raise ValueError(f"Template has no folder list: {path}")
+    template.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    template.setdefault("variables", {})
+    template.setdefault("base_dir", os.path.dirname(os.path.abspath(path)))
+    return template
+
+
+def template_from_tree(root, name=None):
+    """Template with the leaf directories and the files of an existing tree"""
+    folders = []
+    files = {}
+    for dir_path, dirs, entries, sidecars in scan_tree(root, workers=1):
+        rel_dir = os.path.relpath(dir_path, root).replace(os.sep, '/')
+        if not dirs and dir_path != root:
+            folders.append(rel_dir)
+        for entry in entries:
+            rel_path = entry.name if dir_path == root else f"{rel_dir}/{entry.name}"
+            files[rel_path] = entry.path
+    return {"name": name or os.path.basename(root), "variables": {}, "folders": sorted(folders), "files": files}
+
+
+def parse_names(spec):
+    """Names from a spec like "SH0010-SH0300, SH0500" (ranges step by 10, or ":step")
+    
+    A range keeps the prefix and zero padding of its first name, so
+    "SQ01-SQ03:1" gives SQ01, SQ02, SQ03. A range whose last name is not
+    reached by its step raises ValueError instead of being cut short.
+    """
+    names = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        match = re.match(r'^(.*?)(\d+)-(?:\1)?(\d+)(?::(\d+))?$', item)
+        if match is None:
+            names.append(item)
+            continue
+        prefix, first, last, given_step = match.groups()
+        step = int(given_step) if given_step else 10
+        if step <= 0 or int(last) < int(first):
+            raise ValueError(f"Invalid range: {item}")
+        if (int(last) - int(first)) % step:
+            hint = "" if given_step else f"; write {item}:1 for every number"
+            raise ValueError(f"Range {item} does not end on a step of {step}{hint}")
+        names.extend(f"{prefix}{number:0{len(first)}d}" for number in range(int(first), int(last) + 1, step))
+    return names
+
+
+def template_variables(template, values=None):
+    variables = dict(template.get("variables", {}))
+    variables.update(values or {})
+    return variables
+
+
+def expand_pattern(pattern, variables, is_file=False):
+    """Paths for every combination of the values of the placeholders in pattern
+    
+    Segments whose placeholder has no values are left out; for a file
+    pattern, a file name without values gives no paths at all.
+    """
+    segments = []
+    names = []
+    parts = pattern.strip('/').split('/')
+    for index, segment in enumerate(parts):
+        segment_names = TEMPLATE_PLACEHOLDER.findall(segment)
+        for name in segment_names:
+            if name not in variables:
+                raise ValueError(f"Unknown placeholder {{{name}}} in template path {pattern}")
+        if any(not variables[name] for name in segment_names):
+            if is_file and index == len(parts) - 1:
+                return []
+            continue
+        segments.append(segment)
+        names.extend(name for name in segment_names if name not in names)
+    pattern = '/'.join(segments)
+    if not pattern:
+        return []
+    paths = []
+    for combination in itertools.product(*(variables[name] for name in names)):
+        mapping = dict(zip(names, combination))
+        paths.append(TEMPLATE_PLACEHOLDER.sub(lambda match: str(mapping[match.group(1)]), pattern))
+    return paths
+
+
+def expand_template(template, values=None):
+    """Return every folder of the template, parents included, sorted by depth
+    
+    values maps placeholder names to lists of values and overrides the
+    template's defaults. A pattern is expanded for every combination of the
+    values of its placeholders; path segments whose placeholder has no
+    values are left out, so "02_Render/{sequence}/{shot}" without sequences
+    gives 02_Render/<shot>. Folders holding template files are included.
+    Paths use '/' separators and are relative to the project root.
+    """
+    variables = template_variables(template, values)
+    folders = set()
+    paths = [path for pattern in template["folders"] for path in expand_pattern(pattern, variables)]
+    paths.extend(dest.rpartition('/')[0] for dest, source in expand_template_files(template, values))
+    for path in paths:
+        # Add the folder and any parents not seen yet
+        while path and path not in folders:
+            folders.add(path)
+            path = path.rpartition('/')[0]
+    return sorted(folders, key=lambda path: (path.count('/'), path))
+
+
+def expand_template_files(template, values=None):
+    """(destination, source) pairs for the template files, sorted by destination"""
+    variables = template_variables(template, values)
+    files = {}
+    for pattern, source in template.get("files", {}).items():
+        for dest in expand_pattern(pattern, variables, is_file=True):
+            files[dest] = source
+    return sorted(files.items())
+
+
+# Linux ioctl sharing the data blocks of two files (btrfs, XFS, some NAS)
+FICLONE = 0x40049409 if fcntl is not None and sys.platform.startswith('linux') else None
+
+
+def link_file(source, dest, mode="reflink"):
+    """Create dest with the content of source, sharing its data where possible
+    
+    mode "hardlink" tries a hard link first; "reflink" and "hardlink" try a
+    copy-on-write clone; everything falls back to a copy. Returns the method
+    used and raises FileExistsError if dest exists.
+    """
+    if mode == "hardlink":
+        try:
+            os.link(source, dest)
+            return "hardlink"
+        except FileExistsError:
+            raise
+        except OSError:
+            pass  # Other filesystem, or links unsupported (SMB)
+    with open(source, 'rb') as src, open(dest, 'xb') as dst:
+        if mode != "copy" and FICLONE is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return "reflink"
+            except OSError:
+                pass
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    return "copy"
+
+
+def template_fingerprint(template):
+    """Hash of a template's layout and of the size and mtime of its files"""
+    digest = hashlib.sha256(json.dumps(
+        [template.get("variables", {}), template["folders"], template.get("files", {}),
+         template.get("base_dir")], sort_keys=True).encode())
+    for source in sorted(set(template.get("files", {}).values())):
+        stat = os.stat(os.path.join(template.get("base_dir", ""), source))
+        digest.update(f"{source}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+class TemplateSnapshot:
+    """A template's folder list plus content-addressed copies of its files
+    
+    Template files are hashed into cache_dir/objects once. A manifest keyed
+    by the template fingerprint maps each source to its object, so later
+    projects only stat the sources. Projects are materialized with one
+    parallel round of mkdirs per depth, and template files are placed with
+    link_file using the template's "link" mode (default "reflink"; use
+    "hardlink" only for files nobody edits in place, objects are read-only).
+    """
+    LINK_MODES = ("reflink", "hardlink", "copy")
+    
+    # Snapshots by (fingerprint, cache_dir), shared by every project created
+    instances = {}
+    instances_lock = threading.Lock()
+    
+    def __init__(self, template, cache_dir=None, fingerprint=None):
+        self.template = template
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), "FileTreeManager", "template_cache")
+        self.link_mode = template.get("link", "reflink")
+        if self.link_mode not in self.LINK_MODES:
+            raise ValueError(f"Unknown template link mode: {self.link_mode}")
+        self.fingerprint = fingerprint or template_fingerprint(template)
+        self.objects = {}
+        if template.get("files"):
+            self.load()
+            
+    @classmethod
+    def for_template(cls, template, cache_dir=None):
+        """Snapshot of template, reused while its files are unchanged"""
+        fingerprint = template_fingerprint(template)
+        key = (fingerprint, cache_dir)
+        with cls.instances_lock:
+            snapshot = cls.instances.get(key)
+        if snapshot is None:
+            snapshot = cls(template, cache_dir, fingerprint)
+            with cls.instances_lock:
+                cls.instances[key] = snapshot
+        return snapshot
+        
+    def source_path(self, source):
+        return os.path.join(self.template.get("base_dir", ""), source)
+        
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+        
+    def load(self):
+        manifest_path = os.path.join(self.cache_dir, "manifests", f"{self.fingerprint}.json")
+        try:
+            with open(manifest_path, 'r') as f:
+                objects = json.load(f)["objects"]
+            if all(os.path.exists(self.object_path(digest)) for digest in objects.values()):
+                self.objects = objects
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        with METRICS.timed("template_snapshot_seconds"):
+            sources = sorted(set(self.template["files"].values()))
+            self.objects = {source: self.store(self.source_path(source)) for source in sources}
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"name": self.template.get("name"), "objects": self.objects}, f)
+        os.replace(tmp_path, manifest_path)
+        
+    def store(self, path):
+        """Copy a file into the object store, hashing it on the way; returns its digest"""
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, "objects", f".{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.sha256()
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+        digest = digest.hexdigest()
+        object_path = self.object_path(digest)
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, object_path)
+        return digest
+        
+    @staticmethod
+    def make_folder(path):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            return False
+        return True
+        
+    def place_file(self, job):
+        dest, source = job
+        try:
+            mode = link_file(self.object_path(self.objects[source]), dest, self.link_mode)
+        except FileExistsError:
+            return False
+        METRICS.count(f"template_files_{mode}_total")
+        return True
+        
+    def materialize(self, root, values=None, progress_callback=None, workers=None):
+        """Create the template under root; returns the folders and files created
+        
+        progress_callback(done, total, path, created) is called after each
+        folder and file, from the calling thread.
+        """
+        workers = SCAN_WORKERS if workers is None else workers
+        folders = expand_template(self.template, values)
+        files = [(os.path.join(root, *dest.split('/')), source)
+                 for dest, source in expand_template_files(self.template, values)]
+        total = len(folders) + len(files)
+        created = []
+        done = 0
+        
+        def report(paths, results):
+            nonlocal done
+            for path, made in zip(paths, results):
+                done += 1
+                if made:
+                    created.append(path)
+                if progress_callback:
+                    progress_callback(done, total, path, made)
+                    
+        os.makedirs(root, exist_ok=True)
+        with METRICS.timed("template_materialize_seconds"), \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            map_jobs = executor.map if workers > 1 else map
+            # Every folder of a depth has its parent made by the round before
+            for depth, level in itertools.groupby(folders, key=lambda folder: folder.count('/')):
+                paths = [os.path.join(root, *folder.split('/')) for folder in level]
+                report(paths, map_jobs(self.make_folder, paths))
+            report([dest for dest, source in files], map_jobs(self.place_file, files))
+        return created
+
+
+def create_hierarchy(root, template, values=None, progress_callback=None, workers=None):
+    """Create the expanded template under root; returns the folders and files created
+    
+    Folders that already exist are kept. progress_callback(done, total,
+    path, created) is called after each folder and file.
+    """
+    snapshot = TemplateSnapshot.for_template(template)
+    return snapshot.materialize(root, values, progress_callback, workers)
+
+
+def project_template(path=None):
+    """Template for new projects
+    
+    path may be a template JSON file or a sample folder to copy. Without a
+    path, folder_hierarchy/template.json next to this module is used, else
+    folder_hierarchy/root_sample, else DEFAULT_TEMPLATE.
+    """
+    if path is None:
+        template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "folder_hierarchy")
+        if os.path.isfile(os.path.join(template_dir, "template.json")):
+            return load_template(os.path.join(template_dir, "template.json"))
+        if os.path.isdir(os.path.join(template_dir, "root_sample")):
+            return template_from_tree(os.path.join(template_dir, "root_sample"))
+        return DEFAULT_TEMPLATE
+    if os.path.isdir(path):
+        return template_from_tree(path)
+    return load_template(path)
+
+
+MANIFEST_FIELDS = ("name", "master_path", "client_name", "delivery_date", "template", "shots", "sequences", "comment")
+
+
+def load_project_manifest(path):
+    """Projects listed in a CSV manifest with a header row, or a JSON one
+    
+    A JSON manifest is a list of objects or an object with a "projects"
+    list; shots and sequences may be lists there. "client" is accepted for
+    client_name, and relative master and template paths are relative to the
+    manifest.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, 'r') as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get("projects")
+        if not isinstance(rows, list):
+            raise ValueError(f"Manifest has no project list: {path}")
+    else:
+        with open(path, 'r', newline='') as f:
+            rows = list(csv.DictReader(f))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    projects = []
+    for number, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Manifest entry {number} is not an object")
+        fields = {}
+        for key, value in row.items():
+            if key is None:
+                continue
+            if isinstance(value, list):
+                value = ", ".join(str(item) for item in value)
+            fields[key.strip().lower()] = "" if value is None else str(value).strip()
+        if not fields.get("client_name"):
+            fields["client_name"] = fields.get("client", "")
+        project = {field: fields.get(field, "") for field in MANIFEST_FIELDS}
+        for field in ("master_path", "template"):
+            if project[field]:
+                project[field] = os.path.join(base_dir, os.path.expanduser(project[field]))
+        projects.append(project)
+    return projects
+
+
+class ProjectBatchCreator:
+    """Creates the projects of a manifest in parallel
+    
+    Folder structures are created concurrently, then the rows of every
+    project created are inserted in one transaction, so a database error
+    registers none of them. create() returns one result per project with
+    its folder count, timing and error, if any.
+    """
+    def __init__(self, created_by, workers=4, db_path=None):
+        self.created_by = created_by
+        self.workers = max(1, workers)
+        self.db_path = db_path
+        
+    def prepare(self, projects):
+        """Results for the projects, with templates and shot lists resolved"""
+        templates = {}
+        results = []
+        project_dirs = set()
+        for project in projects:
+            result = dict(project, project_id=None, project_dir="", delivery_path="", created=0,
+                          seconds=0.0, error=None)
+            results.append(result)
+            if not project["name"] or not project["master_path"]:
+                result["error"] = "Name and master path are required"
+                continue
+            result["project_dir"] = os.path.join(os.path.abspath(project["master_path"]), project["name"])
+            result["delivery_path"] = os.path.join(result["project_dir"], "Deliveries")
+            if result["project_dir"] in project_dirs:
+                result["error"] = f"Listed twice: {result['project_dir']}"
+                continue
+            project_dirs.add(result["project_dir"])
+            try:
+                if project["template"] not in templates:
+                    templates[project["template"]] = project_template(project["template"] or None)
+                result["template_data"] = templates[project["template"]]
+                result["values"] = {"shot": parse_names(project["shots"]),
+                                    "sequence": parse_names(project["sequences"])}
+            except (OSError, ValueError) as e:
+                result["error"] = f"Invalid template or shot list: {str(e)}"
+        return results
+        
+    def create_folders(self, result, workers):
+        start = time.perf_counter()
+        try:
+            result["created"] = len(create_hierarchy(result["project_dir"], result["template_data"],
+                                                     result["values"], workers=workers))
+            os.makedirs(result["delivery_path"], exist_ok=True)
+        except Exception as e:
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+        return result
+        
+    def create(self, projects, progress_callback=None):
+        """Create the projects; progress_callback(done, total, result) follows each one"""
+        results = self.prepare(projects)
+        pending = [result for result in results if result["error"] is None]
+        # Share the mkdir workers between the projects created at once
+        folder_workers = max(1, SCAN_WORKERS // self.workers)
+        done = len(results) - len(pending)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.create_folders, result, folder_workers) for result in pending]
+            for future in as_completed(futures):
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(results), future.result())
+                    
+        created = [result for result in results if result["error"] is None]
+        if created:
+            conn = connect_db(self.db_path)
+            try:
+                with conn:
+                    cursor = conn.cursor()
+                    for result in created:
+                        cursor.execute(
+                            "INSERT INTO projects (name, master_path, client_name, delivery_path, project_comment, "
+                            "delivery_date, created_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (result["name"], result["project_dir"], result["client_name"], result["delivery_path"],
+                             result["comment"], result["delivery_date"], self.created_by))
+                        result["project_id"] = cursor.lastrowid
+            except sqlite3.Error as e:
+                for result in created:
+                    result["project_id"] = None
+                    result["error"] = f"Database error, no project was registered: {str(e)}"
+            finally:
+                conn.close()
+        for result in results:
+            result.pop("template_data", None)
+            result.pop("values", None)
+        return results
+
+
+# Default bound of the thumbnail cache, in bytes
+THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def file_digest(path):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def preview_sources(dir_path, extensions, limit=None):
+    """Files of a folder worth a thumbnail: first frames of sequences and single images
+    
+    extensions is the set of lowercase extensions (".png") that can be
+    previewed. Returns at most limit paths, in name order.
+    """
+    _, files, _ = scan_directory(dir_path)
+    sources = []
+    for sequence in detect_sequences(sorted(files, key=lambda entry: entry.name)):
+        first = sequence.sorted_files()[0][2]
+        if os.path.splitext(first.name)[1].lower() in extensions:
+            sources.append(first.path)
+    sources.sort()
+    return sources[:limit]
+
+
+class ThumbnailCache:
+    """Size-bounded on-disk store of preview images, keyed by source content
+    
+    Thumbnails live in cache_dir/objects under the SHA-256 of the file they
+    show, so copies and renamed frames share one and a re-rendered frame
+    gets a new one. cache.db records the digest of every source path with
+    its size and mtime, so unchanged files are only stat'ed, and when each
+    thumbnail was last used: the least recently used are deleted once the
+    store grows past max_bytes. Safe to use from several threads.
+    """
+    def __init__(self, cache_dir=None, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), "FileTreeManager", "thumbnail_cache")
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(self.cache_dir, "cache.db")
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self.init_db()
+    
+    def connect(self):
+        conn = connect_db(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def init_db(self):
+        conn = self.connect()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS sources (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS thumbnails (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_last_used ON thumbnails (last_used)")
+        conn.commit()
+        conn.close()
+    
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+    
+    def source_digest(self, path):
+        """Digest of a file's content, hashing it only when it changed since last seen"""
+        stat = os.stat(path)
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT size, mtime_ns, digest FROM sources WHERE path = ?", (path,)).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                return row[2]
+            with METRICS.timed("thumbnail_hash_seconds"):
+                digest = file_digest(path)
+            conn.execute("INSERT OR REPLACE INTO sources (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                         (path, stat.st_size, stat.st_mtime_ns, digest))
+            conn.commit()
+        finally:
+            conn.close()
+        return digest
+    
+    def get(self, path, render):
+        """Path of the thumbnail of a file, made with render(path) on a miss
+        
+        render returns the encoded thumbnail as bytes, or None for files it
+        cannot read, in which case get returns None too.
+        """
+        digest = self.source_digest(path)
+        object_path = self.object_path(digest)
+        conn = self.connect()
+        try:
+            cursor = conn.execute("UPDATE thumbnails SET last_used = ? WHERE digest = ?", (time.time(), digest))
+            conn.commit()
+        finally:
+            conn.close()
+        if cursor.rowcount and os.path.exists(object_path):
+            METRICS.count("thumbnail_cache_hits_total")
+            return object_path
+        
+        METRICS.count("thumbnail_cache_misses_total")
+        with METRICS.timed("thumbnail_render_seconds"):
+            data = render(path)
+        if data is None:
+            return None
+        self.store(digest, data)
+        return object_path
+    
+    def store(self, digest, data):
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, object_path)
+        conn = self.connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO thumbnails (digest, size, last_used) VALUES (?, ?, ?)",
+                         (digest, len(data), time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+        self.evict()
+    
+    def evict(self):
+        """Delete the least recently used thumbnails until the store is within max_bytes"""
+        conn = self.connect()
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM thumbnails").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Down to 90% so that the next few thumbnails do not evict again
+            evicted = []
+            for digest, size in conn.execute("SELECT digest, size FROM thumbnails ORDER BY last_used"):
+                if total <= self.max_bytes * 0.9:
+                    break
+                evicted.append(digest)
+                total -= size
+            conn.executemany("DELETE FROM thumbnails WHERE digest = ?", [(digest,) for digest in evicted])
+            conn.execute("DELETE FROM sources WHERE digest NOT IN (SELECT digest FROM thumbnails)")
+            conn.commit()
+        finally:
+            conn.close()
+        for digest in evicted:
+            try:
+                os.remove(self.object_path(digest))
+            except FileNotFoundError:
+                pass
+        METRICS.count("thumbnail_evictions_total", len(evicted))
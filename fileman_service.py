@@ -0,0 +1,194 @@
+"""Local attribute service shared by the Fileman instances of a host
+
+Owns the sidecars and the database for its clients: answers batched status
+queries, applies updates and pushes every change to subscribed clients, so
+open project tabs update their badges live instead of reading the disk.
+Clients talk JSON, one object per line, over a Unix socket:
+
+    python fileman_service.py --db /studio/fileman
+
+Requests and their replies:
+
+    {"op": "ping"}
+    {"op": "status", "dirs": [dir, ...]}
+        -> {"dirs": {dir: {name: {"publish": [status, timestamp, user], ...}}}}
+    {"op": "history", "path": path}                 -> {"data": sidecar data}
+    {"op": "update", "master_path": ..., "path": ..., "attribute": ...,
+     "value": ..., "user": ...}                     -> {"event": change}
+    {"op": "subscribe", "roots": [master_path, ...]}
+
+Every reply has "ok" (and "error" when false). After subscribing, the
+connection also receives {"event": "changed", "path": ..., "attribute": ...,
+"value": ..., "timestamp": ..., "user": ...} for changes under its roots.
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+import socketserver
+
+import fileman_core
+from fileman_core import init_db, AttributeManager, AttributeServiceClient, MetadataCache, SIDECAR_SUFFIX
+
+
+class AttributeService:
+    """Attribute store and subscriber list behind the socket server"""
+    ATTRIBUTES = ("publish", "to_client")
+
+    def __init__(self, ttl=1.0):
+        # Shared by every project; also catches changes made without the service
+        self.metadata_cache = MetadataCache(ttl)
+        self.reader = AttributeManager(None, self.metadata_cache)
+        self.managers = {}
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def manager(self, master_path):
+        with self.lock:
+            manager = self.managers.get(master_path)
+            if manager is None:
+                manager = AttributeManager(master_path, self.metadata_cache)
+                self.managers[master_path] = manager
+        return manager
+
+    def dir_statuses(self, dir_path):
+        """Latest entry of each attribute for every sidecar in a folder"""
+        statuses = {}
+        for name in self.metadata_cache.listdir(dir_path) or []:
+            if not name.endswith(SIDECAR_SUFFIX):
+                continue
+            data = self.metadata_cache.read_json(os.path.join(dir_path, name))
+            if not isinstance(data, dict):
+                continue
+            entries = {}
+            for attribute in self.ATTRIBUTES:
+                history = data.get(attribute) or []
+                if history:
+                    last_entry = history[-1]
+                    entries[attribute] = [last_entry.get("status", False), last_entry.get("timestamp", ""),
+                                          last_entry.get("user", "Unknown")]
+            statuses[name[:-len(SIDECAR_SUFFIX)]] = entries
+        return statuses
+
+    def handle(self, message, handler):
+        """Reply to one request"""
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "status":
+            # Clients cache the answer, so it must not come from a stale listing
+            for dir_path in message["dirs"]:
+                self.metadata_cache.invalidate_dir(dir_path)
+            return {"ok": True, "dirs": {dir_path: self.dir_statuses(dir_path) for dir_path in message["dirs"]}}
+        if op == "history":
+            path = message["path"]
+            self.metadata_cache.invalidate(path + SIDECAR_SUFFIX)
+            return {"ok": True, "data": self.reader.load_data(path)}
+        if op == "update":
+            if message["attribute"] not in self.ATTRIBUTES:
+                raise ValueError(f"Unknown attribute: {message['attribute']}")
+            timestamp = self.manager(message["master_path"]).update_attribute(
+                message["path"], message["attribute"], message["value"], message["user"])
+            event = {"event": "changed", "path": message["path"], "attribute": message["attribute"],
+                     "value": message["value"], "timestamp": timestamp, "user": message["user"]}
+            self.publish(event)
+            return {"ok": True, "event": event}
+        if op == "subscribe":
+            handler.roots = [os.path.abspath(root) for root in message["roots"]]
+            with self.lock:
+                self.subscribers.add(handler)
+            return {"ok": True}
+        raise ValueError(f"Unknown request: {op}")
+
+    def publish(self, event):
+        """Send a change to the subscribers whose roots contain its path"""
+        path = os.path.abspath(event["path"])
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for handler in subscribers:
+            if any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in handler.roots):
+                try:
+                    handler.send(event)
+                except OSError:
+                    self.unsubscribe(handler)
+
+    def unsubscribe(self, handler):
+        with self.lock:
+            self.subscribers.discard(handler)
+
+
+class ServiceHandler(socketserver.StreamRequestHandler):
+    """One client connection: requests in, replies and pushed changes out"""
+    def setup(self):
+        super().setup()
+        self.roots = []
+        self.write_lock = threading.Lock()
+
+    def send(self, message):
+        with self.write_lock:
+            self.wfile.write((json.dumps(message) + "\n").encode())
+
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            try:
+                reply = service.handle(json.loads(line), self)
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            try:
+                self.send(reply)
+            except OSError:
+                break
+
+    def finish(self):
+        self.server.service.unsubscribe(self)
+        super().finish()
+
+
+class ServiceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        self.service = service
+        super().__init__(socket_path, ServiceHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fileman-service", description="Local Fileman attribute service")
+    parser.add_argument("--socket", default=fileman_core.SERVICE_SOCKET,
+                        help="Unix socket to listen on (default: %(default)s, or $FILEMAN_SERVICE_SOCKET)")
+    parser.add_argument("--db", metavar="DIR",
+                        help="directory holding file_tree_manager.db and file_index.db (default: current directory)")
+    parser.add_argument("--ttl", type=float, default=1.0,
+                        help="seconds sidecars read from disk are trusted (changes made without the service)")
+    args = parser.parse_args(argv)
+    if args.db:
+        fileman_core.set_db_dir(args.db)
+    if not os.path.exists(fileman_core.DB_PATH):
+        print(f"fileman-service: no database at {os.path.abspath(fileman_core.DB_PATH)} "
+              f"(use --db, or create it with 'fileman init-db')", file=sys.stderr)
+        return 1
+    init_db(create_defaults=False)
+
+    if os.path.exists(args.socket):
+        if AttributeServiceClient(args.socket).available():
+            print(f"fileman-service: already running on {args.socket}", file=sys.stderr)
+            return 1
+        os.remove(args.socket)  # Left behind by a service that did not exit cleanly
+    os.makedirs(os.path.dirname(os.path.abspath(args.socket)), exist_ok=True)
+
+    server = ServiceServer(args.socket, AttributeService(args.ttl))
+    print(f"fileman-service: listening on {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,82 @@
 import os
 import sys
+import time
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                             QFileDialog, QMessageBox, QTextEdit)
+                             QFileDialog, QMessageBox, QTextEdit, QProgressBar,
+                             QCheckBox)
+from fileman_core import DEFAULT_TEMPLATE, parse_names, create_hierarchy
+
+
+class FolderCreationWorker(QObject):
+    """Creates a folder structure off the GUI thread
+    
+    Log lines are sent in batches at most every LOG_INTERVAL seconds, or
+    written to log_path instead when one is given.
+    """
+    progress = pyqtSignal(int, int)
+    log = pyqtSignal(str)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    
+    # Minimum delay between log and progress signals, in seconds
+    LOG_INTERVAL = 0.1
+    
+    def __init__(self, root_path, template, values, log_path=None):
+        super().__init__()
+        self.root_path = root_path
+        self.template = template
+        self.values = values
+        self.log_path = log_path
+        self.log_file = None
+        self.pending = []
+        self.last_flush = 0.0
+        
+    def flush(self, done, total):
+        if self.pending:
+            if self.log_file:
+                self.log_file.write("\n".join(self.pending) + "\n")
+            else:
+                self.log.emit("\n".join(self.pending))
+            self.pending = []
+        self.progress.emit(done, total)
+        self.last_flush = time.monotonic()
+        
+    def on_folder(self, done, total, path, created):
+        if created:
+            self.pending.append(f"Created: {path}")
+        if done == total or time.monotonic() - self.last_flush >= self.LOG_INTERVAL:
+            self.flush(done, total)
+            
+    def run(self):
+        try:
+            if self.log_path:
+                self.log_file = open(self.log_path, 'w', encoding='utf-8')
+            os.makedirs(self.root_path)
+            self.pending.append(f"Created root folder: {self.root_path}")
+            created = create_hierarchy(self.root_path, self.template, self.values, self.on_folder)
+            self.flush(len(created), len(created))
+        except Exception as e:
+            self.pending.append(f"Error: {str(e)}")
+            self.flush(0, 0)
+            self.failed.emit(str(e))
+            return
+        finally:
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+        self.finished.emit(len(created))
+
 
 class FolderCreatorApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.root_path = ""
         self.root_name = ""
+        self.template_values = {}
+        self.creation_thread = None
+        self.creation_worker = None
         self.initUI()
         
     def initUI(self):
@@ -42,11 +110,36 @@ class FolderCreatorApp(QMainWindow):
         name_layout.addWidget(self.name_input)
         layout.addLayout(name_layout)
         
+        # Shots and sequences filled into the {shot} and {sequence} folders
+        shots_layout = QHBoxLayout()
+        shots_label = QLabel('Shots:')
+        self.shots_input = QLineEdit()
+        self.shots_input.setPlaceholderText('e.g. SH0010-SH3000, SH5000')
+        shots_layout.addWidget(shots_label)
+        shots_layout.addWidget(self.shots_input)
+        layout.addLayout(shots_layout)
+        
+        sequences_layout = QHBoxLayout()
+        sequences_label = QLabel('Sequences:')
+        self.sequences_input = QLineEdit()
+        self.sequences_input.setPlaceholderText('Optional, e.g. SQ010-SQ050')
+        sequences_layout.addWidget(sequences_label)
+        sequences_layout.addWidget(self.sequences_input)
+        layout.addLayout(sequences_layout)
+        
+        # Large structures log thousands of lines; a file keeps the view responsive
+        self.log_to_file_checkbox = QCheckBox('Write log to file instead of the window')
+        layout.addWidget(self.log_to_file_checkbox)
+        
         # Create button
         self.create_btn = QPushButton('Create Folder Structure')
         self.create_btn.clicked.connect(self.confirm_creation)
         layout.addWidget(self.create_btn)
         
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+        
         # Status display
         self.status_display = QTextEdit()
         self.status_display.setReadOnly(True)
@@ -69,6 +162,15 @@ class FolderCreatorApp(QMainWindow):
             QMessageBox.warning(self, 'Warning', 'Please enter a root folder name.')
             return
             
+        try:
+            self.template_values = {
+                "shot": parse_names(self.shots_input.text()),
+                "sequence": parse_names(self.sequences_input.text())
+            }
+        except ValueError as e:
+            QMessageBox.warning(self, 'Warning', str(e))
+            return
+            
         full_path = os.path.join(self.root_path, self.root_name)
         
         if os.path.exists(full_path):
@@ -90,97 +192,59 @@ class FolderCreatorApp(QMainWindow):
                 self.create_folder_structure(full_path)
                 
     def create_folder_structure(self, root_path):
-        try:
-            os.makedirs(root_path)
-            self.status_display.append(f"Created root folder: {root_path}")
-            
-            # Define the folder structure based on the document
-            folder_structure = [
-                "01_Project_Data/01_StoryBoard_and_Script",
-                "01_Project_Data/02_References",
-                "01_Project_Data/03_Work_Material/01_Images",
-                "01_Project_Data/03_Work_Material/02_Footage",
-                "01_Project_Data/03_Work_Material/03_Audio",
-                "01_Project_Data/03_Work_Material/04_Models",
-                "01_Project_Data/04_Calendar",
-                "01_Project_Data/05_Cam_Info",
-                "01_Project_Data/06_Feedback",
-                
-                "02_2D_Projects/01_PSD",
-                "02_2D_Projects/02_Illustrator",
-                
-                "3D_Project/01_Softwares/01_Max/01_Pre-Prod/01_RND",
-                "3D_Project/01_Softwares/01_Max/01_Pre-Prod/02_Models",
-                "3D_Project/01_Softwares/01_Max/01_Pre-Prod/03_Rigging",
-                "3D_Project/01_Softwares/01_Max/01_Pre-Prod/04_Lookdev",
-                "3D_Project/01_Softwares/01_Max/01_Pre-Prod/05_Render",
-                "3D_Project/01_Softwares/01_Max/02_Prod/01_Scenes/Shot_Structure/Anim",
-                "3D_Project/01_Softwares/01_Max/02_Prod/01_Scenes/Shot_Structure/Render_Scenes",
-                "3D_Project/01_Softwares/01_Max/02_Prod/02_Render/Shot_Structure",
-                "3D_Project/01_Softwares/01_Max/03_Sims",
-                "3D_Project/01_Softwares/01_Max/04_Matlibs",
-                
-                "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/01_RND",
-                "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/02_Models",
-                "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/03_Rigging",
-                "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/04_Lookdev",
-                "3D_Project/01_Softwares/02_Maya/01_Pre-Prod/05_Render",
-                "3D_Project/01_Softwares/02_Maya/02_Prod/01_Scenes/Shot_Structure/Anim",
-                "3D_Project/01_Softwares/02_Maya/02_Prod/01_Scenes/Shot_Structure/Render_Scenes",
-                "3D_Project/01_Softwares/02_Maya/02_Prod/02_Renders/Shot_Structure",
-                
-                "3D_Project/01_Softwares/03_Houdini/01_Pre-prod/01_Scenes",
-                "3D_Project/01_Softwares/03_Houdini/01_Pre-prod/02_Collect",
-                "3D_Project/01_Softwares/03_Houdini/01_Pre-prod/03_Renders",
-                "3D_Project/01_Softwares/03_Houdini/02_Prod/01_Scenes",
-                "3D_Project/01_Softwares/03_Houdini/02_Prod/02_Collect",
-                "3D_Project/01_Softwares/03_Houdini/02_Prod/03_Renders",
-                
-                "3D_Project/01_Softwares/04_Unreal/01_Scenes/Shot_Structure",
-                "3D_Project/01_Softwares/04_Unreal/02_Render/Shot_Structure",
-                
-                "3D_Project/01_Softwares/05_ZBrush/01_Scenes",
-                "3D_Project/01_Softwares/05_ZBrush/02_Work_Images",
-                
-                "3D_Project/01_Softwares/06_Substance/01_Scenes",
-                "3D_Project/01_Softwares/06_Substance/02_Work_Images",
-                
-                "3D_Project/02_Export/01_Assets",
-                "3D_Project/02_Export/02_Shots/Shot_Structure",
-                
-                "3D_Project/03_Capture/01_Pre-prod",
-                "3D_Project/03_Capture/02_Prod/Shot_Structure",
-                
-                "3D_Project/04_Textures",
-                
-                "04_Tracking/01_PFTrack",
-                "04_Tracking/02_AE",
-                "04_Tracking/03_C4D",
-                "04_Tracking/004_SynthEyes",
-                "04_Tracking/005_PFTrack",
-                
-                "05_Compositing/01_Comp_Scenes/01_Slate",
-                "05_Compositing/02_PreComp_Renders",
-                "05_Compositing/03_Comp_Renders",
-                "05_Compositing/04_Edit/Output",
-                "05_Compositing/04_Edit/Work",
-                
-                "06_Internal_Review",
-                "07_Out_To_Client"
-            ]
+        if self.creation_thread is not None:
+            return
             
-            # Create all folders
-            for folder in folder_structure:
-                folder_path = os.path.join(root_path, folder)
-                os.makedirs(folder_path, exist_ok=True)
-                self.status_display.append(f"Created: {folder_path}")
-                
-            self.status_display.append("\nFolder structure created successfully!")
-            QMessageBox.information(self, 'Success', 'Folder structure created successfully!')
+        log_path = None
+        if self.log_to_file_checkbox.isChecked():
+            log_path, _ = QFileDialog.getSaveFileName(
+                self, 'Save Creation Log',
+                os.path.join(self.root_path, f"{self.root_name}_folders.log"),
+                'Log Files (*.log *.txt)')
+            if not log_path:
+                return
+            self.status_display.append(f"Writing log to {log_path}")
             
-        except Exception as e:
-            self.status_display.append(f"Error: {str(e)}")
-            QMessageBox.critical(self, 'Error', f'An error occurred: {str(e)}')
+        self.create_btn.setEnabled(False)
+        self.progress_bar.setRange(0, 0)
+        
+        self.creation_worker = FolderCreationWorker(root_path, DEFAULT_TEMPLATE, self.template_values, log_path)
+        self.creation_thread = QThread(self)
+        self.creation_worker.moveToThread(self.creation_thread)
+        self.creation_thread.started.connect(self.creation_worker.run)
+        self.creation_worker.progress.connect(self.on_creation_progress)
+        self.creation_worker.log.connect(self.status_display.append)
+        self.creation_worker.finished.connect(self.on_creation_finished)
+        self.creation_worker.failed.connect(self.on_creation_failed)
+        self.creation_thread.start()
+        
+    def on_creation_progress(self, done, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        
+    def finish_creation(self):
+        self.creation_thread.quit()
+        self.creation_thread.wait()
+        self.creation_thread = None
+        self.creation_worker = None
+        self.create_btn.setEnabled(True)
+        
+    def on_creation_finished(self, created_count):
+        self.finish_creation()
+        self.status_display.append(f"\nFolder structure created successfully! ({created_count} folders)")
+        QMessageBox.information(self, 'Success', 'Folder structure created successfully!')
+        
+    def on_creation_failed(self, error):
+        self.finish_creation()
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        QMessageBox.critical(self, 'Error', f'An error occurred: {error}')
+        
+    def closeEvent(self, event):
+        if self.creation_thread is not None:
+            self.creation_thread.quit()
+            self.creation_thread.wait()
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+import fileman_core
+from fileman_core import AttributeManager, PublishedExporter
+
+
+class ExportCacheMemoryTest(unittest.TestCase):
+    FILES_PER_DIR = 40
+    
+    def make_tree(self, dirs):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        for d in range(dirs):
+            dir_path = os.path.join(root, f"SH{d:04d}")
+            os.makedirs(dir_path)
+            for frame in range(self.FILES_PER_DIR):
+                open(os.path.join(dir_path, f"beauty.{frame:04d}.exr"), "w").close()
+            # Old enough for the export cache to trust
+            os.utime(dir_path, (0, 0))
+        # A published root publishes every file below it
+        AttributeManager(root).append_history(root, "publish", {"status": True, "timestamp": "", "user": "test"})
+        return root
+        
+    def export_peaks(self, root, dirs):
+        """Peak memory of a first export and of one reusing its cache"""
+        peaks = []
+        for cached_dirs in (0, dirs):
+            exporter = PublishedExporter(AttributeManager(root), "Test")
+            tracemalloc.start()
+            try:
+                _, file_count = exporter.export(root)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+            self.assertEqual(exporter.cached_dirs, cached_dirs)
+        return peaks, file_count
+        
+    # Serial walk: parallel walks hold a bounded window of directories ahead
+    @mock.patch.object(fileman_core, "SCAN_WORKERS", 1)
+    def test_memory_does_not_grow_with_published_files(self):
+        small_peaks, small_count = self.export_peaks(self.make_tree(20), 20)
+        large_peaks, large_count = self.export_peaks(self.make_tree(200), 200)
+        self.assertEqual((small_count, large_count), (20 * self.FILES_PER_DIR, 200 * self.FILES_PER_DIR))
+        # A few bytes per directory, nothing close to a record per file
+        for small, large in zip(small_peaks, large_peaks):
+            self.assertLess((large - small) / (large_count - small_count), 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
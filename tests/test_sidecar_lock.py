@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import errno
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import fileman_core
+from fileman_core import AttributeManager, sidecar_lock, SIDECAR_LOCK_SECONDS
+
+
+class SidecarLockTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "shot.exr")
+        open(self.path, "w").close()
+        self.sidecar_path = self.path + fileman_core.SIDECAR_SUFFIX
+        
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+        
+    def history(self):
+        with open(self.sidecar_path) as f:
+            return json.load(f)["publish"]
+        
+    @unittest.skipIf(fileman_core.fcntl is None, "needs fcntl")
+    def test_append_without_lock(self):
+        # NFS without a usable lock: writes go on, guarded by the version check
+        error = OSError(errno.EBADF, "Bad file descriptor")
+        with mock.patch.object(fileman_core.fcntl, "lockf", side_effect=error):
+            AttributeManager(self.dir).append_history(self.path, "publish", {"status": True})
+            AttributeManager(self.dir).append_history(self.path, "publish", {"status": False})
+        self.assertEqual([entry["status"] for entry in self.history()], [True, False])
+        
+    @unittest.skipIf(fileman_core.fcntl is None, "needs fcntl")
+    def test_threads_append_every_entry(self):
+        manager = AttributeManager(self.dir)
+        threads = [threading.Thread(target=manager.append_history, args=(self.path, "publish", {"n": n}))
+                   for n in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(entry["n"] for entry in self.history()), list(range(20)))
+        self.assertEqual([entry.name for entry in fileman_core.scan_directory(self.dir)[1]], ["shot.exr"])
+        
+    def stale_lock(self):
+        lock_path = self.sidecar_path + ".lock"
+        open(lock_path, "w").close()
+        old = time.time() - SIDECAR_LOCK_SECONDS - 1
+        os.utime(lock_path, (old, old))
+        return lock_path
+        
+    def test_stale_lock_is_taken_over(self):
+        lock_path = self.stale_lock()
+        with mock.patch.object(fileman_core, "fcntl", None):
+            with sidecar_lock(self.sidecar_path):
+                self.assertTrue(os.path.exists(lock_path))
+        self.assertFalse(os.path.exists(lock_path))
+        
+    def test_open_lock_is_not_broken(self):
+        # Windows raises PermissionError removing a file its writer still has open
+        lock_path = self.stale_lock()
+        remove = os.remove
+        released = time.time() + 0.2
+        
+        def held_remove(path):
+            if path == lock_path and time.time() < released:
+                raise PermissionError(errno.EACCES, "Access is denied", path)
+            remove(path)
+            
+        with mock.patch.object(fileman_core, "fcntl", None), mock.patch("os.remove", held_remove):
+            with sidecar_lock(self.sidecar_path):
+                self.assertGreaterEqual(time.time(), released)
+        self.assertFalse(os.path.exists(lock_path))
+
+
+if __name__ == "__main__":
+    unittest.main()